@@ -5,6 +5,8 @@ TraderAgent Main Entry Point
 
 import sys
 import argparse
+import copy
+import time
 from pathlib import Path
 
 # Add src directory to Python path
@@ -14,14 +16,38 @@ sys.path.insert(0, str(src_dir))
 
 from traderagent.data_fetcher import get_all_price_histories, get_all_price_and_volume_histories
 from traderagent.advanced_trader import AdvancedTrader
-from traderagent.ai_decision import get_ai_decision, get_ai_decision_with_volume
-from traderagent.config import TradingConfig
+from traderagent.ai_decision import (get_ai_decision, get_ai_decision_with_volume, set_async_client, set_client,
+                                     set_model_router, set_response_cache, set_telemetry, start_capture, stop_capture,
+                                     stream_ai_decision)
+from traderagent.config import CYCLE_DEADLINE_SECONDS, DEGRADED_ENGINE, STRUCTURED_DECISIONS, TradingConfig
+from traderagent.feature_store import FeatureStore
+from traderagent.volume_profile import VolumeProfile
+from traderagent.regime import RegimeDetector
+from traderagent.timeframes import build_feature_bundle
+from traderagent.response_cache import ResponseCache
+from traderagent.engines import ENGINES, LLM_ENGINES, get_engine
+from traderagent.backtesting import WARMUP_BARS, compare_engines, run_engine_backtest
+from traderagent.standin_server import StandInServer, build_responder
+from traderagent.async_client import AsyncLLMClient
+from traderagent.batching import BatchedLLMEngine
+from traderagent.telemetry import Telemetry
+from traderagent.deadlines import Deadline, ModelRouter, degraded_decisions, is_timeout
+from traderagent.gating import DecisionGate
+from traderagent.journal import DecisionJournal, feature_rows
 
-def run_backtest(paper_trading=False, use_volume=True):
-    """Run backtesting mode"""
+def run_backtest(paper_trading=False, use_volume=True, engine_name="llm", compare=False, batch_bars=1,
+                 prefetch_workers=0, requests_per_second=None):
+    """Run backtesting mode
+
+    ``engine_name`` selects the decision engine (see traderagent.engines);
+    with ``compare`` every local engine is also run on the same data. With
+    the LLM engine, ``batch_bars`` > 1 asks for that many bars per request.
+    ``prefetch_workers`` > 0 fetches all decisions concurrently against the
+    starting balance and then replays the trades in order.
+    """
     mode_text = "paper trading" if paper_trading else "live"
     volume_text = "with volume analysis" if use_volume else "price-only"
-    print(f"=== Starting {mode_text} backtest ({volume_text}) ===")
+    print(f"=== Starting {mode_text} backtest ({volume_text}, engine: {engine_name}) ===")
     
     # Create configuration
     config = TradingConfig(paper_trading=paper_trading)
@@ -33,71 +59,83 @@ def run_backtest(paper_trading=False, use_volume=True):
     balance = trader.load_balance()
     
     # Get market data with or without volume
+    context_fn = None
     if use_volume:
         market_data = get_all_price_and_volume_histories()
         print("Fetching price and volume data...")
     else:
+        # Price-only data gets zero volume, as get_ai_decision does
         price_data = get_all_price_histories()
+        market_data = {coin: [(t, p, 0) for t, p in history] for coin, history in price_data.items()}
         print("Fetching price data only...")
     
-    # Advanced backtest
-    if use_volume:
-        length = len(next(iter(market_data.values())))
-    else:
-        length = len(next(iter(price_data.values())))
-    total_runs = length - 30
-
-    for i in range(30, length):
-        if use_volume:
-            # Slice the market history up to this point
-            sliced_history = {coin: data[:i] for coin, data in market_data.items()}
-            current_prices = {coin: data[i][1] for coin, data in market_data.items()}
-            
-            # Get AI decision with volume analysis
-            decisions = get_ai_decision_with_volume(sliced_history, balance)
-        else:
-            # Slice the price history up to this point
-            sliced_history = {coin: data[:i] for coin, data in price_data.items()}
-            current_prices = {coin: data[i][1] for coin, data in price_data.items()}
-            
-            # Get AI decision with price only
-            decisions = get_ai_decision(sliced_history, balance)
-
-        # Check stop losses and take profits
-        trader.check_stop_losses_and_take_profits(balance, current_prices)
-
-        for coin, decision_data in decisions.items():
-            if coin in current_prices:
-                current_price = current_prices[coin]
-                
-                if len(decision_data) == 5:  # Advanced position
-                    action, percent, leverage, stop_loss, take_profit = decision_data
-                    trader.execute_trade(balance, action, coin, current_price, percent, leverage, stop_loss, take_profit)
-                
-                elif len(decision_data) == 2:  # Simple action
-                    action, percent = decision_data
-                    trader.execute_trade(balance, action, coin, current_price, percent)
-
-        # Progress bar
-        completed = i - 30 + 1
-        bar_length = 30
-        filled = int((completed / total_runs) * bar_length)
-        bar = "#" * filled + "_" * (bar_length - filled)
-        print(f"\r[{bar}] {completed}/{total_runs}", end="")
-
-    print()  # New line after progress bar
+    if use_volume and engine_name in LLM_ENGINES:
+        # Features for every bar are computed once up front, not per bar
+        feature_store = FeatureStore()
+        feature_store.update_market_data(market_data)
+        
+        # Volume profiles are rolled forward one candle per bar
+        volume_profiles = {coin: VolumeProfile() for coin in market_data}
+        for coin, data in market_data.items():
+            volume_profiles[coin].extend(data[:WARMUP_BARS - 1])
+        
+        def context_fn(i, sliced_history):
+            for coin, data in market_data.items():
+                _, price, volume = data[i - 1]
+                volume_profiles[coin].update(price, volume)
+            # Copies, so a prefetched request still sees the profile as of its own bar
+            return {"feature_store": feature_store,
+                    "volume_profiles": {coin: profile.copy() for coin, profile in volume_profiles.items()},
+                    "feature_bundle": build_feature_bundle(sliced_history)}
     
+    engine = get_engine(engine_name)
+    if engine_name == "llm" and batch_bars > 1:
+        engine = BatchedLLMEngine(batch_size=batch_bars)
+        print(f"📦 Batching {batch_bars} bars per model request")
+    
+    if prefetch_workers > 0:
+        print(f"⚡ Prefetching decisions on {prefetch_workers} workers (balance-independent mode)")
+    
+    result = run_engine_backtest(engine, market_data, balance, trader, context_fn=context_fn,
+                                 prefetch_workers=prefetch_workers, requests_per_second=requests_per_second)
     trader.save_balance(balance)
-    current_prices = {coin: data[-1][1] for coin, data in price_data.items()}
     
     print(f"Final Available Margin: ${balance['margin']['available']:.2f}")
     print(f"Realized P&L: ${balance['realized_pnl']:.2f}")
-    total_pnl = trader.calculate_total_pnl(balance, current_prices)
-    print(f"Total Unrealized P&L: ${total_pnl:.2f}")
+    print(f"Total Unrealized P&L: ${result['unrealized_pnl']:.2f}")
+    print(f"Trades: {result['trades']} over {result['bars']} bars in {result['elapsed_seconds']:.2f}s "
+          f"({result['engine_calls']} engine calls)")
+    
+    if compare:
+        print("\n=== Engine comparison (same data, same starting balance) ===")
+        local_engines = {}
+        for name in ENGINES:
+            if name == engine_name or name in LLM_ENGINES:
+                continue
+            try:
+                local_engines[name] = get_engine(name)
+            except FileNotFoundError as e:  # Trained engine without a model yet
+                print(f"  Skipping {name}: {e}")
+        results = compare_engines(local_engines, market_data, trader.load_balance())
+        results[engine_name] = result
+        for name, stats in results.items():
+            print(f"  {name:16s} P&L ${stats['total_pnl']:>10,.2f} | trades {stats['trades']:4d} | "
+                  f"{stats['elapsed_seconds']:.2f}s")
+    
     print(f"=== {mode_text.title()} backtest complete ===")
 
-def run_live(paper_trading=False, use_volume=True):
-    """Run live trading mode"""
+def run_live(paper_trading=False, use_volume=True, regime_gate=False, engine_name="llm", stream=False,
+             deadline_seconds=CYCLE_DEADLINE_SECONDS, change_gate=False, journal=False):
+    """Run live trading mode
+
+    With ``regime_gate`` the AI decision is skipped unless at least one coin
+    changed market regime since the previous run. The whole cycle runs
+    against a ``deadline_seconds`` deadline shared by fetching and the model
+    call; if the AI cannot answer in time a local engine decides instead.
+    With ``change_gate`` only coins whose price, volume regime or positions
+    moved materially since their last decision are sent to the engine.
+    With ``journal`` the cycle is appended to the decision journal.
+    """
     import os
     import datetime
     
@@ -110,6 +148,7 @@ def run_live(paper_trading=False, use_volume=True):
     print(f"🎯 Mode: {mode_text} ({volume_text})")
     print(f"🌍 Environment: {'CI/CD' if os.getenv('GITHUB_ACTIONS') else 'Local'}")
     print("=" * 50)
+    deadline = Deadline(deadline_seconds)
     
     # Create configuration
     config = TradingConfig(paper_trading=paper_trading)
@@ -120,15 +159,28 @@ def run_live(paper_trading=False, use_volume=True):
     
     # Get market data with or without volume
     print("📊 Fetching market data...")
+    feature_store = None
     if use_volume:
-        market_data = get_all_price_and_volume_histories()
+        market_data = get_all_price_and_volume_histories(deadline=deadline)
         current_prices = {coin: history[-1][1] for coin, history in market_data.items()}
         print("✅ Using price and volume data for AI decisions")
+        
+        feature_store = FeatureStore()
+        new_rows = feature_store.update_market_data(market_data)
+        print(f"🗃️ Feature store updated: {new_rows}")
     else:
         price_histories = get_all_price_histories()
         current_prices = {coin: history[-1][1] for coin, history in price_histories.items()}
         print("✅ Using price data only for AI decisions")
     
+    # Update market regimes (state persists between runs)
+    regime_detector = RegimeDetector.load()
+    regime_changes = regime_detector.update_market_data(market_data if use_volume else price_histories)
+    regime_detector.save()
+    print("🧭 Market regimes: " + ", ".join(f"{coin} {regime}" for coin, regime in regime_detector.regimes().items()))
+    for change in regime_changes:
+        print(f"  🔀 {change.coin}: {change.previous} → {change.current} at ${change.price:,.2f}")
+    
     # Display current market prices
     print("\n💰 Current Market Prices:")
     for coin, price in current_prices.items():
@@ -173,41 +225,134 @@ def run_live(paper_trading=False, use_volume=True):
     else:
         print("✅ No stop losses or take profits triggered")
 
+    def execute_decision(coin, decision_data):
+        """Print and execute one coin's decision; returns True if a trade executed"""
+        if coin not in current_prices:
+            return False
+        current_price = current_prices[coin]
+        
+        if len(decision_data) == 5:  # Advanced position
+            action, percent, leverage, stop_loss, take_profit = decision_data
+            print(f"  {coin}: {action} {int(percent * 100)}%", end="")
+            if stop_loss:
+                print(f" [SL: ${stop_loss:,.2f}]", end="")
+            if take_profit:
+                print(f" [TP: ${take_profit:,.2f}]", end="")
+            print()
+            
+            return trader.execute_trade(balance, action, coin, current_price, percent, leverage, stop_loss, take_profit)
+        
+        elif len(decision_data) == 2:  # Simple action
+            action, percent = decision_data
+            print(f"  {coin}: {action} {int(percent * 100)}%")
+            return trader.execute_trade(balance, action, coin, current_price, percent)
+        return False
+
     # Get AI decision with or without volume
-    print("\n🧠 Getting AI trading decision...")
-    if use_volume:
-        decisions = get_ai_decision_with_volume(market_data, balance)
+    trades_executed = False
+    executed_coins = set()
+    histories = market_data if use_volume else {coin: [(t, p, 0) for t, p in history]
+                                                for coin, history in price_histories.items()}
+    if change_gate:
+        print("\n🚦 Checking for material changes since the last decisions...")
+        gate = DecisionGate.load()
+        selected, gate_snapshots = gate.select(histories, balance)
+        histories = {coin: histories[coin] for coin in selected}
+    
+    # Journal: the cycle's inputs, prompts, replies and decisions for offline replay
+    decided_by = None
+    degraded = False
+    if journal:
+        balance_before = copy.deepcopy(balance)
+        cycle_started = time.perf_counter()
+        start_capture()
+    
+    if regime_gate and not regime_changes:
+        print("\n⏸️ No regime change since last run - skipping AI decision")
+        decisions = {}
+    elif change_gate and not histories:
+        print("\n⏸️ No material change since the last decisions - skipping AI decision")
+        decisions = {}
+    elif engine_name not in LLM_ENGINES:
+        print(f"\n🧮 Getting {engine_name} engine decision...")
+        decisions = get_engine(engine_name)(histories, balance)
+        decided_by = engine_name
+    elif deadline.expired():
+        decisions = degraded_decisions(histories, balance)
+        decided_by, degraded = DEGRADED_ENGINE, True
     else:
-        decisions = get_ai_decision(price_histories, balance)
-
+        print(f"\n⏳ {deadline.available():.0f}s left for the AI decision")
+        try:
+            if engine_name in ("llm_per_coin", "llm_ensemble"):
+                print(f"\n🧠 Getting AI trading decisions ({engine_name})...")
+                decisions = get_engine(engine_name)(histories, balance, feature_store=feature_store,
+                                                    feature_bundle=build_feature_bundle(histories) if use_volume else None,
+                                                    deadline=deadline)
+                decided_by = engine_name
+            elif stream:
+                # Each coin is traded as soon as its line of the reply is complete
+                print("\n🧠 Streaming AI trading decision...")
+                stream_started = time.perf_counter()
+                
+                def on_decision(coin, decision_data):
+                    nonlocal trades_executed
+                    print(f"⚡ {coin} decision after {time.perf_counter() - stream_started:.2f}s:")
+                    executed_coins.add(coin)
+                    if execute_decision(coin, decision_data):
+                        trades_executed = True
+                
+                decisions = stream_ai_decision(histories, balance, on_decision=on_decision,
+                                               feature_store=feature_store,
+                                               feature_bundle=build_feature_bundle(histories) if use_volume else None,
+                                               deadline=deadline)
+                decided_by = "stream"
+            elif use_volume:
+                print("\n🧠 Getting AI trading decision...")
+                feature_bundle = build_feature_bundle(histories)
+                decisions = get_ai_decision_with_volume(histories, balance, feature_store=feature_store,
+                                                        feature_bundle=feature_bundle, deadline=deadline)
+                decided_by = "llm"
+            else:
+                print("\n🧠 Getting AI trading decision...")
+                decisions = get_ai_decision({coin: price_histories[coin] for coin in histories}, balance,
+                                            deadline=deadline)
+                decided_by = "llm"
+        except Exception as e:
+            if not is_timeout(e):
+                raise
+            print(f"⏱️ AI decision did not finish in time: {e}")
+            decisions = degraded_decisions(histories, balance)
+            decided_by, degraded = DEGRADED_ENGINE, True
+    
     print(f"\n🎯 AI Decisions:")
-    trades_executed = False
     for coin, decision_data in decisions.items():
-        if coin in current_prices:
-            current_price = current_prices[coin]
-            
-            if len(decision_data) == 5:  # Advanced position
-                action, percent, leverage, stop_loss, take_profit = decision_data
-                print(f"  {coin}: {action} {int(percent * 100)}%", end="")
-                if stop_loss:
-                    print(f" [SL: ${stop_loss:,.2f}]", end="")
-                if take_profit:
-                    print(f" [TP: ${take_profit:,.2f}]", end="")
-                print()
-                
-                success = trader.execute_trade(balance, action, coin, current_price, percent, leverage, stop_loss, take_profit)
-                if success:
-                    trades_executed = True
-            
-            elif len(decision_data) == 2:  # Simple action
-                action, percent = decision_data
-                print(f"  {coin}: {action} {int(percent * 100)}%")
-                success = trader.execute_trade(balance, action, coin, current_price, percent)
-                if success:
-                    trades_executed = True
+        if coin in executed_coins:
+            continue  # Already executed while streaming
+        if execute_decision(coin, decision_data):
+            trades_executed = True
 
     if not trades_executed:
         print("  No trades executed this round")
+
+    if change_gate:
+        # Anchored to the positions after this cycle's trades; coins without a decision
+        # (e.g. missing from the reply) are retried next cycle
+        gate.commit(gate_snapshots, [coin for coin in histories if coin in decisions], balance)
+        gate.save()
+    
+    if journal:
+        exchanges = stop_capture()
+        if decided_by:
+            context = {"degraded": True} if degraded else {}
+            if decided_by in LLM_ENGINES or decided_by == "stream":
+                context["feature_bundle"] = use_volume
+                if decided_by != "stream":
+                    context["structured"] = STRUCTURED_DECISIONS
+                if feature_store is not None:
+                    context["feature_rows"] = feature_rows(feature_store, histories)
+            record = DecisionJournal().append(decided_by, histories, balance_before, balance, decisions, exchanges,
+                                              time.perf_counter() - cycle_started, context=context)
+            print(f"📓 Journaled cycle #{record['id']} (inputs {record['input_hash'][:12]})")
     
     print()
     trader.save_balance(balance)
@@ -223,6 +368,7 @@ def run_live(paper_trading=False, use_volume=True):
     print(f"📊 Unrealized P&L: ${total_pnl:,.2f}")
     print(f"🎯 Total P&L: ${final_balance['realized_pnl'] + total_pnl:,.2f}")
     print(f"📅 Completed: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"⏳ Deadline margin: {deadline.remaining():.1f}s")
     
     # Show recent trades
     recent_trades = final_balance.get('history', [])[-3:]  # Last 3 trades
@@ -241,6 +387,33 @@ def main():
     parser.add_argument("--paper", action="store_true", help="Use paper trading (simulation mode)")
     parser.add_argument("--live", action="store_true", help="Use live trading - BE CAREFUL!")
     parser.add_argument("--no-volume", action="store_true", help="Disable volume analysis (price-only trading)")
+    parser.add_argument("--regime-gate", action="store_true", help="Only call the AI when a market regime changed")
+    parser.add_argument("--change-gate", action="store_true",
+                        help="Only ask for decisions on coins whose inputs moved materially")
+    parser.add_argument("--journal", action="store_true",
+                        help="Append each decision cycle to the replay journal")
+    parser.add_argument("--llm-cache", action="store_true", help="Reuse cached model responses for identical prompts")
+    parser.add_argument("--llm-cache-ttl", type=float, default=None, help="Expire cached responses after N seconds")
+    parser.add_argument("--replay-only", action="store_true", help="Answer only from the response cache (no API calls)")
+    parser.add_argument("--engine", choices=list(ENGINES), default="llm", help="Decision engine (default: llm)")
+    parser.add_argument("--compare-engines", action="store_true", help="Backtest every local engine on the same data")
+    parser.add_argument("--stream", action="store_true", help="Live: stream the reply and trade each coin as it arrives")
+    parser.add_argument("--batch-bars", type=int, default=1, help="Backtest: bars per LLM request (default: 1)")
+    parser.add_argument("--prefetch", type=int, default=0, metavar="N",
+                        help="Backtest: fetch decisions on N concurrent workers against the starting balance")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Max model requests per second")
+    parser.add_argument("--standin", choices=["rule", "replay"], default=None,
+                        help="Answer model calls from a local stand-in server instead of OpenAI")
+    parser.add_argument("--standin-latency", type=float, default=0.0, help="Stand-in reply latency in seconds")
+    parser.add_argument("--telemetry", action="store_true", help="Record LLM call latency, tokens and fallbacks")
+    parser.add_argument("--latency-budget", type=float, default=None, help="Flag LLM calls slower than N seconds")
+    parser.add_argument("--token-budget", type=int, default=None, help="Flag LLM calls using more than N tokens")
+    parser.add_argument("--deadline", type=float, default=CYCLE_DEADLINE_SECONDS,
+                        help=f"Live: seconds for the whole cycle (default: {CYCLE_DEADLINE_SECONDS})")
+    parser.add_argument("--route-models", action="store_true",
+                        help="Pick the model by observed latency (seeded from the telemetry file)")
+    parser.add_argument("--async-client", action="store_true",
+                        help="Per-coin requests over one shared async connection pool with retries and deduplication")
     
     args = parser.parse_args()
     
@@ -268,17 +441,62 @@ def main():
     else:
         print("📊 Paper trading mode enabled (safe simulation)")
     
+    # Response cache: identical prompts (e.g. a re-run backtest) are answered locally
+    if args.llm_cache or args.replay_only:
+        cache = ResponseCache(ttl_seconds=args.llm_cache_ttl, replay_only=args.replay_only)
+        set_response_cache(cache)
+        print(f"♻️ LLM response cache enabled ({len(cache)} entries)")
+    
+    # Stand-in server: real HTTP round trips, no API key and no cost
+    if args.standin:
+        server = StandInServer(build_responder(args.standin), latency=args.standin_latency).start()
+        set_client(server.client())
+        print(f"🧪 Using {args.standin} stand-in server at {server.base_url}")
+    
+    # Telemetry: one metrics line per model call, summarized at exit
+    telemetry = None
+    if args.telemetry or args.latency_budget is not None or args.token_budget is not None:
+        telemetry = Telemetry(latency_budget=args.latency_budget, token_budget=args.token_budget)
+        set_telemetry(telemetry)
+        print(f"📈 LLM telemetry enabled ({telemetry.path})")
+    
+    # Model routing: fastest model first, based on latencies from earlier runs
+    if args.route_models:
+        router = ModelRouter().seed(Telemetry.load().records)
+        set_model_router(router)
+        print("🔀 Model routing: " + ", ".join(
+            f"{model} {router.latency(model):.1f}s" if router.latency(model) is not None else f"{model} (unmeasured)"
+            for model in router.ranked()))
+    
+    # Async client: per-coin requests share one connection pool, retries and deduplication
+    async_client = None
+    if args.async_client:
+        async_client = AsyncLLMClient(client=server.async_client(max_retries=0) if args.standin else None,
+                                      cache=cache if args.llm_cache or args.replay_only else None,
+                                      telemetry=telemetry)
+        set_async_client(async_client)
+        print(f"⚡ Async client enabled ({async_client.max_concurrency} requests in flight)")
+    
     # Run the appropriate mode
     try:
         if args.backtest:
-            run_backtest(paper_trading, use_volume)
+            run_backtest(paper_trading, use_volume, engine_name=args.engine, compare=args.compare_engines,
+                         batch_bars=args.batch_bars, prefetch_workers=args.prefetch,
+                         requests_per_second=args.rate_limit)
         else:
-            run_live(paper_trading, use_volume)
+            run_live(paper_trading, use_volume, regime_gate=args.regime_gate, engine_name=args.engine,
+                     stream=args.stream, deadline_seconds=args.deadline,
+                     change_gate=args.change_gate, journal=args.journal)
     except KeyboardInterrupt:
         print("\n  Trading stopped by user")
     except Exception as e:
         print(f"\n Error: {e}")
         sys.exit(1)
+    finally:
+        if async_client is not None:
+            async_client.close()
+        if telemetry is not None:
+            print(f"📈 {telemetry.summary()}")
 
 if __name__ == "__main__":
     main()
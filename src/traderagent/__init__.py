@@ -6,27 +6,45 @@ A sophisticated cryptocurrency trading bot with AI decision making
 __version__ = "1.0.0"
 __author__ = "TraderAgent"
 
-from .ai_decision import get_ai_decision, get_ai_decision_with_volume
-from .advanced_trader import AdvancedTrader
-from .data_fetcher import (
-    get_all_price_histories, 
-    get_price_history,
-    get_all_price_and_volume_histories,
-    get_price_and_volume_history,
-    get_volume_analysis
-)
-from .trader import load_balance, save_balance, calc_unrealized_pnl
+import importlib
 
-__all__ = [
-    'get_ai_decision',
-    'get_ai_decision_with_volume',
-    'AdvancedTrader', 
-    'get_all_price_histories',
-    'get_price_history',
-    'get_all_price_and_volume_histories',
-    'get_price_and_volume_history',
-    'get_volume_analysis',
-    'load_balance',
-    'save_balance',
-    'calc_unrealized_pnl'
-]
\ No newline at end of file
+# Public names and the submodule that defines them. Submodules are imported
+# on first attribute access, so `import traderagent` stays cheap for scripts
+# that only need part of the package.
+_EXPORTS = {
+    'get_ai_decision': 'ai_decision',
+    'get_ai_decision_with_volume': 'ai_decision',
+    'get_client': 'ai_decision',
+    'set_client': 'ai_decision',
+    'set_response_cache': 'ai_decision',
+    'set_telemetry': 'ai_decision',
+    'AdvancedTrader': 'advanced_trader',
+    'get_all_price_histories': 'data_fetcher',
+    'get_price_history': 'data_fetcher',
+    'get_all_price_and_volume_histories': 'data_fetcher',
+    'get_price_and_volume_history': 'data_fetcher',
+    'get_volume_analysis': 'data_fetcher',
+    'load_balance': 'trader',
+    'save_balance': 'trader',
+    'calc_unrealized_pnl': 'trader',
+    'FeatureStore': 'feature_store',
+    'ResponseCache': 'response_cache',
+    'Telemetry': 'telemetry',
+    'Decision': 'decisions',
+    'parse_reply': 'decisions',
+    'get_engine': 'engines',
+    'run_engine_backtest': 'backtesting',
+    'compare_engines': 'backtesting',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
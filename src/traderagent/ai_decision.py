@@ -1,16 +1,331 @@
-import openai
-from dotenv import load_dotenv
 import os
+import threading
+import time
 from .data_fetcher import get_volume_analysis
+from .feature_store import coin_symbol
+from .volume_profile import compute_volume_profile, format_volume_profile
+from .summarizer import SPARKLINE_POINTS, format_summary, sparkline, summarize_series
+from .decisions import RESPONSE_FORMAT, ParsedReply, iter_lines, parse_reply, parse_text, to_tuples
+from .config import (DECISION_MODELS, FANOUT_WORKERS, LLM_TIMEOUT_SECONDS, PROMPT_TOKEN_BUDGET,
+                     STRUCTURED_DECISIONS)
+from .prompts import render_coin_prompt, render_user_prompt, system_preamble
+from .concurrency import RateLimiter, map_bounded
+from .telemetry import usage_tokens
+from .deadlines import DeadlineExceeded, is_timeout
+from .journal import messages_hash
+from .prompt_budget import DETAIL_LEVELS, fit_to_budget
+from .portfolio_context import PortfolioContext
+from .async_client import RetryPolicy, is_model_unavailable, is_unsupported_format, status_code
 
-# Load .env file
-load_dotenv()
+def _create_client():
+    """Build the OpenAI client (deferred: importing openai is the slowest part of startup)"""
+    import openai
+    from dotenv import load_dotenv
 
-# Load the API key from the environment
-api_key = os.getenv("OPENAI_API_KEY")
-client = openai.OpenAI(api_key=api_key)
+    # Load .env file, then the API key from the environment
+    load_dotenv()
+    # Bounded timeout: a hung request must not consume the whole cycle. Retries are done by _create
+    return openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=LLM_TIMEOUT_SECONDS, max_retries=0)
 
-def get_ai_decision(price_histories, balance):
+def get_client():
+    """Return the shared OpenAI client, creating it on first use"""
+    global client
+    if "client" not in globals():
+        client = _create_client()
+    return client
+
+def set_client(new_client):
+    """Swap the client used for model calls (e.g. a stand-in or a mock); None restores the default"""
+    global client
+    if new_client is None:
+        globals().pop("client", None)
+    else:
+        client = new_client
+
+def __getattr__(name):
+    # Module attribute ``client`` is created lazily on first access
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Optional ResponseCache shared by every model call (see set_response_cache)
+_response_cache = None
+
+def set_response_cache(cache):
+    """Enable (or with None, disable) the LLM response cache for all model calls"""
+    global _response_cache
+    _response_cache = cache
+
+# Optional Telemetry recorder for every model call (see set_telemetry)
+_telemetry = None
+
+def set_telemetry(telemetry):
+    """Enable (or with None, disable) LLM call telemetry"""
+    global _telemetry
+    _telemetry = telemetry
+
+def _record_call(**fields):
+    if _telemetry is not None:
+        _telemetry.record("call", **fields)
+
+def _record_parse(parsed):
+    if _telemetry is not None:
+        _telemetry.record("parse", structured=parsed.structured, decisions=len(parsed.decisions),
+                          failures=len(parsed.errors))
+    return parsed
+
+# Optional ModelRouter choosing models by observed latency (see set_model_router)
+_model_router = None
+
+def set_model_router(router):
+    """Enable (or with None, disable) latency-based model routing"""
+    global _model_router
+    _model_router = router
+
+# Optional AsyncLLMClient for the per-coin fan-out (see set_async_client)
+_async_client = None
+
+def set_async_client(async_client):
+    """Send per-coin decision requests through an AsyncLLMClient (None: thread fan-out)"""
+    global _async_client
+    _async_client = async_client
+
+# Backoff for transient API errors on synchronous calls
+_retry_policy = RetryPolicy()
+
+# Positions and margin block, shared by every prompt built from the same balance
+_portfolio_context = PortfolioContext()
+
+# Model exchanges collected for the decision journal (see start_capture)
+_captured = None
+_capture_lock = threading.Lock()
+
+def start_capture():
+    """Start collecting every prompt and raw reply (for journaling one decision cycle)"""
+    global _captured
+    _captured = []
+
+def stop_capture():
+    """Stop collecting and return the exchanges since start_capture"""
+    global _captured
+    exchanges, _captured = _captured or [], None
+    return exchanges
+
+def _capture(model, messages, raw, cached=False):
+    if _captured is not None:
+        with _capture_lock:
+            _captured.append({"model": model, "messages_hash": messages_hash(messages),
+                              "prompt": messages[-1]["content"], "raw": raw, "cached": cached})
+
+def capture_exchange(prompt, raw, model="gpt-4o", system=None):
+    """Collect an exchange made with ``capture=False`` once the caller decides to use its reply"""
+    _capture(model, _messages(prompt, system), raw)
+
+def _messages(prompt, system=None):
+    messages = [{"role": "user", "content": prompt}]
+    if system:
+        messages.insert(0, {"role": "system", "content": system})
+    return messages
+
+def _create(model, messages, deadline=None, **params):
+    """One API call, bounded by the deadline and timed for the model router
+
+    Rate limits, 5xx and dropped connections are retried with jittered
+    backoff (honouring Retry-After) while the deadline leaves room; timeouts
+    are not, since the router fails them over instead. Returns (response,
+    number of retries).
+    """
+    attempt = 0
+    while True:
+        if deadline is not None:
+            params["timeout"] = deadline.timeout(LLM_TIMEOUT_SECONDS)
+        started = time.perf_counter()
+        try:
+            response = get_client().chat.completions.create(model=model, messages=messages, **params)
+        except Exception as e:
+            if _model_router is not None:
+                _model_router.observe(model, time.perf_counter() - started, ok=False)
+            if is_timeout(e) or not _retry_policy.should_retry(attempt, e):
+                raise
+            delay = _retry_policy.delay(attempt, e)
+            if deadline is not None and delay >= deadline.available():
+                raise
+            print(f"🔁 {model}: {status_code(e) or type(e).__name__} - retry {attempt + 1} in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+            continue
+        if _model_router is not None:
+            _model_router.observe(model, time.perf_counter() - started)
+        return response, attempt
+
+def request_completion(prompt, model="gpt-4o", fallback_model="gpt-4", response_format=None, system=None,
+                       deadline=None, temperature=None, capture=True):
+    """Send a prompt to the model and return the raw reply text (see request_completion_with_model)"""
+    return request_completion_with_model(prompt, model, fallback_model, response_format, system, deadline,
+                                         temperature, capture)[0]
+
+def request_completion_with_model(prompt, model="gpt-4o", fallback_model="gpt-4", response_format=None, system=None,
+                                  deadline=None, temperature=None, capture=True):
+    """Send a prompt to the model and return (raw reply text, model that answered)
+
+    Identical requests are answered from the response cache when one is set.
+    Falls back to ``fallback_model`` when the primary model is unavailable,
+    and drops ``response_format`` when the model does not support it. A
+    ``system`` message goes first so providers can cache it as a prefix.
+    Each call is recorded (time, tokens, model used, retries) when telemetry
+    is enabled. With a ``deadline`` every attempt gets a timeout that ends
+    before it; with a model router the models are picked by observed
+    latency and a timed-out call fails over to the next one. ``temperature``
+    is only sent when given (otherwise the model default applies). With
+    ``capture=False`` the exchange is left out of the journal capture (see
+    capture_exchange).
+    """
+    messages = _messages(prompt, system)
+    sampling = {"temperature": temperature} if temperature is not None else {}
+    params = {"response_format": response_format} if response_format else {}
+    params.update(sampling)
+    if _model_router is not None:
+        model, fallback_model = _model_router.route(deadline.available() if deadline is not None else None)
+
+    cache_key = None
+    if _response_cache is not None:
+        cache_key = _response_cache.make_key(model, messages, params or None)
+        cached = _response_cache.get(cache_key)
+        if cached is not None:
+            print("♻️ Using cached model response")
+            _record_call(model=model, model_used=model, cached=True, wall_seconds=0.0, retries=0)
+            if capture:
+                _capture(model, messages, cached, cached=True)
+            return cached, model
+
+    used_model = model
+    retries = 0
+    started = time.perf_counter()
+    try:
+        try:
+            response, retries = _create(model, messages, deadline, **params)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            # Fallback if the primary model or structured output is not available
+            retries += 1
+            failover = _model_router is not None and is_timeout(e)
+            if response_format and is_unsupported_format(e):
+                response, fallback_retries = _create(model, messages, deadline, **sampling)
+            elif fallback_model and (is_model_unavailable(e) or failover):
+                used_model = fallback_model
+                if failover:
+                    print(f"⏱️ {model} timed out - failing over to {fallback_model}")
+                response, fallback_retries = _create(fallback_model, messages, deadline, **sampling)
+            else:
+                raise e
+            retries += fallback_retries
+    except Exception as e:
+        _record_call(model=model, model_used=used_model, fallback=used_model != model, retries=retries,
+                     wall_seconds=time.perf_counter() - started, error=str(e))
+        raise
+
+    _record_call(model=model, model_used=used_model, fallback=used_model != model, retries=retries,
+                 wall_seconds=time.perf_counter() - started, **usage_tokens(response))
+    content = response.choices[0].message.content
+    if capture:
+        _capture(used_model, messages, content)
+    if cache_key is not None and content is not None:
+        _response_cache.put(cache_key, content, model=used_model)
+    return content, used_model
+
+def stream_completion(prompt, model="gpt-4o", fallback_model="gpt-4", system=None, deadline=None):
+    """Yield the reply text chunk by chunk as the model streams it
+
+    A cached reply is yielded whole; a streamed reply is cached once complete.
+    Opening the stream is retried like any call (and bounded by the
+    ``deadline``); models are picked by the router when one is set. If the
+    stream fails before its first chunk the request goes through
+    request_completion instead - fallback model, format and timeout
+    failover included - and its reply is yielded whole.
+    """
+    messages = _messages(prompt, system)
+    if _model_router is not None:
+        model, fallback_model = _model_router.route(deadline.available() if deadline is not None else None)
+
+    cache_key = None
+    if _response_cache is not None:
+        cache_key = _response_cache.make_key(model, messages, {"stream": True})
+        cached = _response_cache.get(cache_key)
+        if cached is not None:
+            print("♻️ Using cached model response")
+            _record_call(model=model, model_used=model, cached=True, stream=True, wall_seconds=0.0, retries=0)
+            _capture(model, messages, cached, cached=True)
+            yield cached
+            return
+
+    parts = []
+    started = time.perf_counter()
+    first_token = None
+    retries = 0
+    try:
+        stream, retries = _create(model, messages, deadline, stream=True)
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                parts.append(text)
+                yield text
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        _record_call(model=model, model_used=model, stream=True, retries=retries,
+                     wall_seconds=time.perf_counter() - started, error=str(e))
+        if parts:
+            raise
+        print(f"⚠️ Stream from {model} failed ({status_code(e) or type(e).__name__}) - requesting without streaming")
+        yield request_completion(prompt, model=model, fallback_model=fallback_model, system=system,
+                                 deadline=deadline)
+        return
+    _record_call(model=model, model_used=model, stream=True, retries=retries, first_token_seconds=first_token,
+                 wall_seconds=time.perf_counter() - started)
+    _capture(model, messages, "".join(parts))
+
+    if cache_key is not None and parts:
+        _response_cache.put(cache_key, "".join(parts), model=model)
+
+def stream_ai_decision(price_volume_histories, balance, on_decision=None, feature_store=None,
+                       volume_profiles=None, feature_bundle=None, deadline=None):
+    """Like get_ai_decision_with_volume, but acts on each coin as soon as its line arrives
+
+    The reply is streamed in the "COIN: ACTION params" text format and
+    ``on_decision(coin, decision_tuple)`` is called the moment a line is
+    complete, so the first coins can be traded while later ones are still
+    being generated. Returns all decisions once the stream ends; malformed
+    lines and coins left without a decision are recorded as parse failures.
+    """
+    system, prompt = build_budgeted_prompt(price_volume_histories, balance, structured=False,
+                                           feature_store=feature_store, volume_profiles=volume_profiles,
+                                           feature_bundle=feature_bundle)
+
+    print("=== PROMPT STREAMED TO GPT ===")
+    print(prompt)
+    print("==============================")
+
+    decisions = {}
+    parsed = ParsedReply({}, False, [])
+    for line in iter_lines(stream_completion(prompt, system=system, deadline=deadline)):
+        line_parsed = parse_text(line)
+        parsed.errors.extend(line_parsed.errors)
+        for coin, decision in line_parsed.decisions.items():
+            parsed.decisions[coin] = decision
+            decisions[coin] = decision.as_tuple()
+            if on_decision is not None:
+                on_decision(coin, decisions[coin])
+    parsed.errors.extend(f"{coin}: no decision in the reply" for coin in price_volume_histories
+                         if coin.upper() not in parsed.decisions)
+    _record_parse(parsed)
+    return decisions
+
+def get_ai_decision(price_histories, balance, deadline=None):
     """Legacy function for backward compatibility - calls new function with volume data"""
     # Convert price histories to price+volume format with empty volume data
     price_volume_histories = {}
@@ -18,150 +333,224 @@ def get_ai_decision(price_histories, balance):
         # Convert (timestamp, price) to (timestamp, price, volume=0)
         price_volume_histories[coin] = [(t, p, 0) for t, p in history]
     
-    return get_ai_decision_with_volume(price_volume_histories, balance)
-
-def get_ai_decision_with_volume(price_volume_histories, balance):
-    """Enhanced AI decision making with volume analysis"""
-    # Format price and volume data for AI
-    market_analysis = []
-    for coin, history in price_volume_histories.items():
-        # Extract price and volume data
-        prices = [p for _, p, _ in history]
-        volumes = [v for _, _, v in history if v > 0]  # Filter out zero volumes
-        
-        # Price trend
-        price_text = f"{coin} price trend (1h intervals, past 3 days):\n{[(t, round(p, 2)) for t, p, _ in history]}"
-        
-        # Volume analysis (only if we have real volume data)
-        volume_text = ""
-        if volumes and sum(volumes) > 0:  # Check if we have meaningful volume data
-            volume_analysis = get_volume_analysis(volumes)
-            recent_volumes = volumes[-5:] if len(volumes) >= 5 else volumes
-            volume_text = f"\n{coin} volume analysis: {volume_analysis}\nRecent volumes: {[round(v, 2) for v in recent_volumes]}"
-        
-        market_analysis.append(price_text + volume_text)
-    
-    market_text = "\n\n".join(market_analysis)
-
-    # Format current positions for AI context
-    positions_text = ""
-    if "positions" in balance:
-        for coin in balance["positions"]:
-            long_pos = balance["positions"][coin]["long"]
-            short_pos = balance["positions"][coin]["short"]
-            if long_pos["amount"] > 0:
-                positions_text += f"\n{coin} LONG: {long_pos['amount']:.6f} @ {long_pos['avg_price']:.2f}"
-            if short_pos["amount"] > 0:
-                positions_text += f"\n{coin} SHORT: {short_pos['amount']:.6f} @ {short_pos['avg_price']:.2f}"
-
-    margin_info = ""
-    if "margin" in balance:
-        margin_info = f"\nMargin Available: ${balance['margin']['available']:.2f}, Used: ${balance['margin']['used']:.2f}"
-
-    prompt = f"""
-You are an advanced crypto trading AI with access to short selling and risk management tools. 
-IMPORTANT: You cannot use leverage - all positions are 1:1 (no amplification).
-
-Here are the market analysis data for each coin:
-{market_text}
-
-Your current balance and holdings:
-USD: ${balance.get('USD', 0):.2f}
-Realized P&L: ${balance.get('realized_pnl', 0):.2f}{margin_info}
-
-Current Positions:{positions_text if positions_text else " None"}
-
-For each coin (BTC and SOL), what is your recommended action?
-
-TRADING GUIDELINES:
-- Consider volume analysis when making decisions:
-  * HIGH volume = Strong conviction moves, good for trend following
-  * ELEVATED volume = Moderate conviction, suitable for smaller positions
-  * NORMAL volume = Standard market activity, use regular position sizing
-  * LOW volume = Weak conviction, consider smaller positions or waiting
-- Volume spikes often precede significant price movements
-- Low volume in trending markets may indicate weakening momentum
-
-Available Actions:
-- BUY_LONG [percent] [stop_loss] [take_profit] - Open long position (no leverage)
-- SELL_SHORT [percent] [stop_loss] [take_profit] - Open short position (no leverage)
-- CLOSE_LONG [percent] - Close long position (partial or full)
-- CLOSE_SHORT [percent] - Close short position (partial or full)
-- BUY [percent] - Simple spot buy (legacy)
-- SELL [percent] - Simple spot sell (legacy)
-- HOLD - Do nothing
-
-Examples:
-BTC: BUY_LONG 50% 58000 70000
-SOL: SELL_SHORT 25% 180 120
-BTC: CLOSE_LONG 100%
-
-The reply should adhere strictly to the following format:
-BTC: [ACTION] [parameters]
-SOL: [ACTION] [parameters]
-
-Set stop losses and take profits to manage risk. No leverage is available.
-"""
+    return get_ai_decision_with_volume(price_volume_histories, balance, deadline=deadline)
+
+def get_ai_decision_with_volume(price_volume_histories, balance, feature_store=None, volume_profiles=None,
+                                feature_bundle=None, structured=STRUCTURED_DECISIONS, deadline=None,
+                                token_budget=PROMPT_TOKEN_BUDGET):
+    """Enhanced AI decision making with volume analysis
+
+    Each coin's history is condensed into a fixed-size summary block, so the
+    prompt does not grow with the history window, and the blocks lose detail
+    as needed to keep the prompt within ``token_budget`` however many coins
+    there are. When a FeatureStore is
+    given, indicators for the latest candle of each coin are read from it
+    instead of being recomputed. ``volume_profiles``
+    maps coins to incrementally maintained VolumeProfile objects; coins
+    without one get a profile computed from their history. A FeatureBundle
+    built once per cycle adds one line per higher timeframe. With
+    ``structured`` the model is asked for JSON matching DECISION_SCHEMA;
+    free-text replies are still parsed as a fallback. A ``deadline`` bounds
+    the model call (see request_completion).
+    """
+    system, prompt = build_budgeted_prompt(price_volume_histories, balance, structured=structured,
+                                           token_budget=token_budget, feature_store=feature_store,
+                                           volume_profiles=volume_profiles, feature_bundle=feature_bundle)
 
     print("=== PROMPT SENT TO GPT ===")
     print(prompt)
     print("==========================")
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",  # Use GPT-4o which supports more parameters
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-            # Remove temperature parameter - use model default
-        )
-    except Exception as e:
-        # Fallback to GPT-4 if GPT-4o is not available
-        if "model" in str(e).lower():
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-        else:
-            raise e
-
-    raw = response.choices[0].message.content.strip().upper()
+    raw = request_completion(prompt, response_format=RESPONSE_FORMAT if structured else None, system=system,
+                             deadline=deadline)
+    raw = raw.strip()
     print("=== RAW GPT RESPONSE ===")
     print(raw)
     print("========================")
 
+    return parse_decisions(raw)
+
+def get_ai_decision_per_coin(price_volume_histories, balance, feature_store=None, volume_profiles=None,
+                             feature_bundle=None, structured=STRUCTURED_DECISIONS, max_workers=FANOUT_WORKERS,
+                             requests_per_second=None, deadline=None):
+    """Fan out one compact request per coin and merge the decisions
+
+    Each prompt carries only that coin's market data plus the shared
+    portfolio, so prompt size stays flat as the coin list grows. Requests run
+    concurrently on at most ``max_workers`` threads. Only the requested
+    coin's decision is taken from each reply, and a failed or unparseable
+    request leaves just that coin without a decision. With an async client
+    set (see set_async_client) all requests share its connection pool,
+    retries and deduplication instead of a thread pool.
+    """
+    portfolio = format_portfolio(balance)
+    system = system_preamble(structured)
+    coins = list(price_volume_histories)
+    if _async_client is not None:
+        return _decide_per_coin_async(coins, price_volume_histories, portfolio, system, feature_store,
+                                      volume_profiles, feature_bundle, structured, deadline)
+
+    def decide(coin):
+        raw = request_completion(_coin_prompt(coin, price_volume_histories, portfolio, system, feature_store,
+                                              volume_profiles, feature_bundle),
+                                 response_format=RESPONSE_FORMAT if structured else None, system=system,
+                                 deadline=deadline)
+        return _record_parse(parse_reply(raw)).decisions.get(coin.upper())
+
+    print(f"=== {len(coins)} PER-COIN PROMPTS SENT TO GPT ({max_workers} workers) ===")
     decisions = {}
-    for line in raw.splitlines():
-        if ":" not in line or not line.strip():
-            continue  # Skip bad or empty lines
+    for coin, result in zip(coins, map_bounded(decide, coins, max_workers=max_workers,
+                                               rate_limiter=RateLimiter(requests_per_second))):
+        if result.error is not None:
+            print(f"⚠️ {coin}: decision request failed ({result.error}) - no action")
+        elif result.value is None:
+            print(f"⚠️ {coin}: no decision for this coin in the reply - no action")
+        else:
+            decisions[coin] = result.value.as_tuple()
+            print(f"  {coin}: {result.value.action} ({result.seconds:.2f}s)")
+    return decisions
 
-        try:
-            coin, action_info = line.strip().split(":", 1)
-            parts = action_info.strip().split()
-            if not parts:
-                continue
-            
-            action = parts[0]
-            
-            # Parse parameters based on action type
-            if action in ["BUY_LONG", "SELL_SHORT"]:
-                percent = float(parts[1].replace('%', '')) / 100 if len(parts) > 1 else 0.0
-                leverage = 1.0  # Force leverage to 1x (no leverage allowed)
-                stop_loss = float(parts[2]) if len(parts) > 2 and parts[2] != 'NULL' else None
-                take_profit = float(parts[3]) if len(parts) > 3 and parts[3] != 'NULL' else None
-                decisions[coin.strip()] = (action, percent, leverage, stop_loss, take_profit)
-            
-            elif action in ["CLOSE_LONG", "CLOSE_SHORT", "BUY", "SELL"]:
-                percent = float(parts[1].replace('%', '')) / 100 if len(parts) > 1 else 0.0
-                decisions[coin.strip()] = (action, percent)
-            
-            elif action == "HOLD":
-                decisions[coin.strip()] = (action, 0.0)
-            
-        except Exception as e:
-            print(f"Skipping malformed line: '{line}' — {e}")
+def _coin_prompt(coin, price_volume_histories, portfolio, system, feature_store, volume_profiles, feature_bundle):
+    market_text = fit_market_text({coin: price_volume_histories[coin]},
+                                  lambda text: system + "\n" + render_coin_prompt(coin, text, portfolio),
+                                  feature_store=feature_store, volume_profiles=volume_profiles,
+                                  feature_bundle=feature_bundle)
+    return render_coin_prompt(coin, market_text, portfolio)
+
+def _decide_per_coin_async(coins, price_volume_histories, portfolio, system, feature_store, volume_profiles,
+                           feature_bundle, structured, deadline):
+    if _model_router is not None:
+        model, fallback_model = _model_router.route(deadline.available() if deadline is not None else None)
+    else:
+        model, fallback_model = DECISION_MODELS
+    requests = []
+    for coin in coins:
+        prompt = _coin_prompt(coin, price_volume_histories, portfolio, system, feature_store, volume_profiles,
+                              feature_bundle)
+        request = {"messages": _messages(prompt, system), "model": model, "fallback_model": fallback_model}
+        if structured:
+            request["response_format"] = RESPONSE_FORMAT
+        if deadline is not None:
+            request["deadline"] = deadline
+        requests.append(request)
+
+    print(f"=== {len(coins)} PER-COIN PROMPTS SENT TO GPT (async, {_async_client.max_concurrency} in flight) ===")
+    started = time.perf_counter()
+    before = dict(_async_client.stats)
+    decisions = {}
+    for coin, request, reply in zip(coins, requests, _async_client.run_many(requests)):
+        if isinstance(reply, BaseException):
+            print(f"⚠️ {coin}: decision request failed ({reply}) - no action")
             continue
+        _capture(request["model"], request["messages"], reply)
+        decision = _record_parse(parse_reply(reply)).decisions.get(coin.upper())
+        if decision is None:
+            print(f"⚠️ {coin}: no decision for this coin in the reply - no action")
+        else:
+            decisions[coin] = decision.as_tuple()
+            print(f"  {coin}: {decision.action}")
+    stats = {key: value - before[key] for key, value in _async_client.stats.items()}
+    print(f"⚡ {len(requests)} requests in {time.perf_counter() - started:.2f}s: {stats['api_calls']} API calls, "
+          f"{stats['retries']} retries, {stats['cache_hits']} cached, {stats['deduplicated']} deduplicated")
+    return decisions
+
+def format_market_text(price_volume_histories, feature_store=None, volume_profiles=None, feature_bundle=None,
+                       detail=None):
+    """Render the per-coin market analysis blocks of the decision prompt
+
+    ``detail`` maps coins to a level of prompt_budget.DETAIL_LEVELS (full
+    detail for coins not in it).
+    """
+    return "\n\n".join(format_coin_block(coin, history, feature_store=feature_store, volume_profiles=volume_profiles,
+                                          feature_bundle=feature_bundle, detail=(detail or {}).get(coin, 0))
+                        for coin, history in price_volume_histories.items())
+
+def format_coin_block(coin, history, feature_store=None, volume_profiles=None, feature_bundle=None, detail=0):
+    """Render one coin's market analysis block at a detail level (0 = full, see DETAIL_LEVELS)"""
+    # Extract price and volume data
+    prices = [p for _, p, _ in history]
+    volumes = [v for _, _, v in history if v > 0]  # Filter out zero volumes
+    
+    # Price trend, summarized (reuse precomputed features when the store has this candle)
+    features = None
+    if feature_store is not None and history:
+        features = feature_store.get_row(coin_symbol(coin), history[-1][0])
+    summary = summarize_series(history, features=features)
+    if summary and detail >= 2:
+        summary["sparkline"] = sparkline(prices, SPARKLINE_POINTS // 2)
+    price_text = format_summary(coin, summary, minimal=detail >= 3) if summary else f"{coin} price trend: no data"
+    
+    # Volume analysis (only if we have real volume data)
+    volume_text = ""
+    if volumes and sum(volumes) > 0:  # Check if we have meaningful volume data
+        volume_analysis = get_volume_analysis(volumes)
+        if detail >= 3:
+            return price_text + f"\n{coin} volume: {volume_analysis.split()[0]}"
+        volume_text = f"\n{coin} volume analysis: {volume_analysis}"
+        if detail < 1:
+            recent_volumes = volumes[-5:] if len(volumes) >= 5 else volumes
+            volume_text += f"\nRecent volumes: {[round(v, 2) for v in recent_volumes]}"
+        
+        # Volume-by-price support/resistance levels
+        if detail < 2:
+            if volume_profiles and coin in volume_profiles:
+                levels = volume_profiles[coin].levels()
+            else:
+                levels = compute_volume_profile(prices, [v for _, _, v in history])
+            if levels:
+                volume_text += f"\n{coin} volume profile: {format_volume_profile(levels, prices[-1])}"
+    
+    # Higher timeframe context from the shared per-cycle bundle
+    timeframe_text = ""
+    if feature_bundle is not None and detail < 1:
+        timeframe_lines = feature_bundle.format_coin(coin, exclude=(feature_bundle.base_interval,))
+        if timeframe_lines:
+            timeframe_text = f"\n{coin} other timeframes:\n{timeframe_lines}"
+    
+    return price_text + volume_text + timeframe_text
+
+def format_portfolio(balance):
+    """Render the balance, margin and open positions section of the decision prompt
+
+    Rendered once per balance state and reused by every prompt built from
+    it (see PortfolioContext).
+    """
+    return _portfolio_context.text(balance)
+
+def build_decision_prompt(market_text, balance, structured=False, coins=()):
+    """Return (system, user) messages: a static preamble and the per-call market data"""
+    return system_preamble(structured), render_user_prompt(market_text, format_portfolio(balance), coins)
+
+def build_budgeted_prompt(price_volume_histories, balance, structured=False, token_budget=PROMPT_TOKEN_BUDGET,
+                          feature_store=None, volume_profiles=None, feature_bundle=None):
+    """Return (system, user) messages for any number of coins within ``token_budget`` estimated tokens"""
+    system = system_preamble(structured)
+    portfolio = format_portfolio(balance)
+    coins = list(price_volume_histories)
+    market_text = fit_market_text(price_volume_histories,
+                                  lambda text: system + "\n" + render_user_prompt(text, portfolio, coins),
+                                  token_budget, feature_store=feature_store, volume_profiles=volume_profiles,
+                                  feature_bundle=feature_bundle)
+    return system, render_user_prompt(market_text, portfolio, coins)
+
+def fit_market_text(price_volume_histories, frame, token_budget=PROMPT_TOKEN_BUDGET, feature_store=None,
+                    volume_profiles=None, feature_bundle=None):
+    """Market text whose full prompt ``frame(market_text)`` fits ``token_budget`` estimated tokens
+
+    Coin blocks are stepped down in detail, largest first, until it fits
+    (see prompt_budget.fit_to_budget).
+    """
+    def render_block(coin, level):
+        return format_coin_block(coin, price_volume_histories[coin], feature_store=feature_store,
+                                 volume_profiles=volume_profiles, feature_bundle=feature_bundle, detail=level)
+
+    coins = list(price_volume_histories)
+    levels, blocks = fit_to_budget(coins, render_block, lambda blocks: frame("\n\n".join(blocks)), token_budget)
+    reduced = {coin: DETAIL_LEVELS[level] for coin, level in levels.items() if level}
+    if reduced:
+        print(f"✂️ Prompt fitted to {token_budget} tokens: " + ", ".join(f"{c} {l}" for c, l in reduced.items()))
+    return "\n\n".join(blocks)
 
-    return decisions
\ No newline at end of file
+def parse_decisions(raw):
+    """Parse a reply (structured JSON or "COIN: ACTION params" text) into decision tuples"""
+    return to_tuples(_record_parse(parse_reply(raw)).decisions)
@@ -0,0 +1,308 @@
+"""
+Retrying, deduplicating async OpenAI client
+
+``AsyncLLMClient`` wraps one shared ``openai.AsyncOpenAI`` (one HTTP
+connection pool for every request) and adds what the bare client lacks
+for many concurrent decision requests:
+
+- a bounded number of requests in flight,
+- jittered exponential retries for 429, 5xx and connection errors that
+  honour the server's ``Retry-After`` and stop at the cycle deadline,
+- an idempotent cache of successful replies keyed like ResponseCache, and
+- in-flight deduplication: identical concurrent requests share one call,
+  so a burst of the same prompt is paid for once.
+
+The client and its connection pool are bound to the event loop they were
+first used on, so synchronous callers (``run_many``) go through one event
+loop that runs on a background thread for the life of the client.
+
+Errors are classified by status code and exception type rather than by
+matching the message text. ``RetryPolicy`` is also used by the synchronous
+request path in ai_decision.
+"""
+
+import asyncio
+import inspect
+import random
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+
+from .config import ASYNC_MAX_CONCURRENCY, LLM_MAX_RETRIES, LLM_TIMEOUT_SECONDS
+from .deadlines import is_timeout
+from .response_cache import ResponseCache
+from .telemetry import usage_tokens
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+def status_code(error: Exception) -> Optional[int]:
+    """HTTP status of an API error, if it carries one"""
+    status = getattr(error, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _is_connection_error(error: Exception) -> bool:
+    # openai.APIConnectionError, matched by name so openai is not imported
+    return any(cls.__name__ == "APIConnectionError" for cls in type(error).__mro__)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Transient failures worth retrying: 408/409/429, any 5xx, dropped connections
+
+    Timeouts (including openai.APITimeoutError, a connection error subclass)
+    are not: another attempt would just spend the same time again.
+    """
+    if is_timeout(error):
+        return False
+    status = status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    return _is_connection_error(error)
+
+
+def is_model_unavailable(error: Exception) -> bool:
+    """The requested model does not exist or is not available to this key"""
+    status = status_code(error)
+    if status is not None:
+        return status == 404 or (status in (400, 403) and getattr(error, "code", None) == "model_not_found")
+    return "model" in str(error).lower()
+
+
+def is_unsupported_format(error: Exception) -> bool:
+    """The model rejected the ``response_format`` parameter"""
+    return getattr(error, "param", None) == "response_format" or "response_format" in str(error).lower()
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait (Retry-After / retry-after-ms headers), if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff with jitter, overridden by the server's Retry-After
+
+    Attempt ``n`` (0-based) waits a random time between half and all of
+    ``min(max_delay, base_delay * 2**n)``.
+    """
+
+    def __init__(self, max_retries: int = LLM_MAX_RETRIES, base_delay: float = 0.5, max_delay: float = 20.0,
+                 seed: Optional[int] = None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._random = random.Random(seed)
+
+    def delay(self, attempt: int, error: Optional[Exception] = None) -> float:
+        requested = retry_after(error) if error is not None else None
+        if requested is not None:
+            return min(requested, self.max_delay)
+        ceiling = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return self._random.uniform(ceiling / 2, ceiling)
+
+    def should_retry(self, attempt: int, error: Exception) -> bool:
+        return attempt < self.max_retries and is_retryable(error)
+
+
+class AsyncLLMClient:
+    """Shared-pool async client with retries, caching and in-flight deduplication
+
+    The ``max_replies`` most recent replies are kept in memory; older ones
+    are only found in the optional ResponseCache. ``close`` (or leaving a
+    ``with`` block) closes the HTTP pool and stops the background loop.
+    """
+
+    def __init__(self, client=None, max_concurrency: int = ASYNC_MAX_CONCURRENCY, retry_policy: Optional[RetryPolicy] = None,
+                 cache: Optional[ResponseCache] = None, timeout: float = LLM_TIMEOUT_SECONDS, telemetry=None,
+                 max_replies: int = 256):
+        self._client = client
+        self._owns_client = client is None
+        self.telemetry = telemetry
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.cache = cache
+        self.max_replies = max_replies
+        self._replies: "OrderedDict[str, str]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._semaphores: Dict[int, asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+        self.stats = {"requests": 0, "api_calls": 0, "retries": 0, "cache_hits": 0, "deduplicated": 0}
+
+    @property
+    def client(self):
+        """The shared AsyncOpenAI client (created on first use; our retries replace its own)"""
+        if self._client is None:
+            import os
+            import openai
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            self._client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=self.timeout,
+                                              max_retries=0)
+        return self._client
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # One semaphore per event loop (asyncio primitives are bound to the loop they are used on)
+        loop_id = id(asyncio.get_running_loop())
+        if loop_id not in self._semaphores:
+            self._semaphores[loop_id] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop_id]
+
+    def _remember(self, key: str, content: str):
+        self._replies[key] = content
+        self._replies.move_to_end(key)
+        while len(self._replies) > self.max_replies:
+            self._replies.popitem(last=False)
+
+    async def complete(self, messages: List[Dict], model: str = "gpt-4o", fallback_model: Optional[str] = "gpt-4",
+                       deadline=None, **params) -> str:
+        """Reply text for one chat request; identical requests are only paid for once
+
+        Like request_completion, an unavailable model falls back to
+        ``fallback_model`` and a rejected ``response_format`` is dropped. A
+        ``timeout`` in ``params`` bounds each attempt but is not part of the
+        request's identity. With a ``deadline`` each attempt's timeout is
+        taken from it and no retry is started that would not fit before it.
+        """
+        self.stats["requests"] += 1
+        key = ResponseCache.make_key(model, messages, {k: v for k, v in params.items() if k != "timeout"} or None)
+        if key in self._replies:
+            self.stats["cache_hits"] += 1
+            self._replies.move_to_end(key)
+            return self._replies[key]
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.stats["cache_hits"] += 1
+                self._remember(key, cached)
+                return cached
+        if key in self._in_flight:
+            self.stats["deduplicated"] += 1
+            return await asyncio.shield(self._in_flight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            content = await self._call_with_fallbacks(model, fallback_model, messages, params, deadline)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved: waiters re-raise it, nobody else needs to
+            raise
+        else:
+            future.set_result(content)
+            if content is not None:
+                self._remember(key, content)
+            if self.cache is not None and content is not None:
+                self.cache.put(key, content, model=model)
+            return content
+        finally:
+            del self._in_flight[key]
+
+    async def _call_with_fallbacks(self, model: str, fallback_model: Optional[str], messages: List[Dict],
+                                   params: Dict, deadline=None) -> str:
+        try:
+            return await self._call_with_retries(model, messages, params, deadline)
+        except Exception as e:
+            if params.get("response_format") and is_unsupported_format(e):
+                params = {k: v for k, v in params.items() if k != "response_format"}
+                return await self._call_with_retries(model, messages, params, deadline)
+            if fallback_model and fallback_model != model and is_model_unavailable(e):
+                print(f"🔀 {model} unavailable - falling back to {fallback_model}")
+                params = {k: v for k, v in params.items() if k != "response_format"}
+                return await self._call_with_retries(fallback_model, messages, params, deadline)
+            raise
+
+    async def _call_with_retries(self, model: str, messages: List[Dict], params: Dict, deadline=None) -> str:
+        attempt = 0
+        started = time.perf_counter()
+        params = dict(params)
+        cap = params.get("timeout", self.timeout)
+        while True:
+            if deadline is not None:
+                params["timeout"] = deadline.timeout(cap)
+            try:
+                async with self._semaphore():
+                    self.stats["api_calls"] += 1
+                    response = await self.client.chat.completions.create(model=model, messages=messages, **params)
+            except Exception as e:
+                if not self.retry_policy.should_retry(attempt, e):
+                    self._record(model=model, model_used=model, retries=attempt, asynchronous=True,
+                                 wall_seconds=time.perf_counter() - started, error=str(e))
+                    raise
+                delay = self.retry_policy.delay(attempt, e)
+                if deadline is not None and delay >= deadline.available():
+                    self._record(model=model, model_used=model, retries=attempt, asynchronous=True,
+                                 wall_seconds=time.perf_counter() - started, error=str(e))
+                    raise
+                self.stats["retries"] += 1
+                print(f"🔁 {model}: {status_code(e) or type(e).__name__} - retry {attempt + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._record(model=model, model_used=model, retries=attempt, asynchronous=True,
+                         wall_seconds=time.perf_counter() - started, **usage_tokens(response))
+            return response.choices[0].message.content
+
+    def _record(self, **fields):
+        if self.telemetry is not None:
+            self.telemetry.record("call", **fields)
+
+    async def complete_many(self, requests: List[Dict]) -> List:
+        """Run many ``complete`` requests concurrently; failures are returned as exceptions in place"""
+        return await asyncio.gather(*(self.complete(**request) for request in requests), return_exceptions=True)
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever, name="async-llm-client",
+                                                     daemon=True)
+                self._loop_thread.start()
+            return self._loop
+
+    def run_many(self, requests: List[Dict]) -> List:
+        """Synchronous entry point for ``complete_many``, on the client's long-lived event loop"""
+        return asyncio.run_coroutine_threadsafe(self.complete_many(requests), self._background_loop()).result()
+
+    def close(self):
+        """Close the HTTP pool (on the loop it is bound to) and stop the background loop"""
+        with self._loop_lock:
+            loop, thread = self._loop, self._loop_thread
+            self._loop = self._loop_thread = None
+        close = getattr(self._client, "close", None)
+        if inspect.iscoroutinefunction(close):
+            if loop is not None:
+                asyncio.run_coroutine_threadsafe(close(), loop).result()
+            else:
+                asyncio.run(close())
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+        self._semaphores.clear()
+        if self._owns_client:
+            self._client = None  # Recreated on next use
+
+    def __enter__(self) -> "AsyncLLMClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,200 @@
+"""
+Engine-agnostic backtesting for TraderAgent
+
+Replays a market history bar by bar through any decision engine (see
+engines.py) and an AdvancedTrader, so the LLM and the local rule-based
+engines can be run and compared on exactly the same data.
+"""
+
+import copy
+import time
+from typing import Callable, Dict, List, Optional
+
+from .advanced_trader import AdvancedTrader
+from .concurrency import RateLimiter, map_bounded
+from .engines import DecisionEngine
+
+WARMUP_BARS = 30
+
+
+def execute_decisions(trader: AdvancedTrader, balance: Dict, decisions: Dict[str, tuple],
+                      current_prices: Dict[str, float]) -> bool:
+    """Execute a decision dict against the balance; returns True if any trade executed"""
+    trades_executed = False
+    for coin, decision_data in decisions.items():
+        if coin not in current_prices:
+            continue
+        current_price = current_prices[coin]
+
+        if len(decision_data) == 5:  # Advanced position
+            action, percent, leverage, stop_loss, take_profit = decision_data
+            success = trader.execute_trade(balance, action, coin, current_price, percent, leverage,
+                                           stop_loss, take_profit)
+        elif len(decision_data) == 2:  # Simple action
+            action, percent = decision_data
+            success = trader.execute_trade(balance, action, coin, current_price, percent)
+        else:
+            continue
+
+        if success:
+            trades_executed = True
+    return trades_executed
+
+
+def _print_progress(completed: int, total: int):
+    bar_length = 30
+    filled = int((completed / total) * bar_length)
+    bar = "#" * filled + "_" * (bar_length - filled)
+    print(f"\r[{bar}] {completed}/{total}", end="")
+
+
+def _is_batched(engine: DecisionEngine) -> bool:
+    return hasattr(engine, "decide_batch") and getattr(engine, "batch_size", 1) > 1
+
+
+def _bar_blocks(engine: DecisionEngine, market_data: Dict[str, List[tuple]], start: int, stop: int,
+                context_fn: Optional[Callable]):
+    """Yield (bars, request) in bar order; context_fn is called once per bar, in order
+
+    ``request`` is what one engine call needs: a list of snapshots for a
+    batched engine, otherwise a (sliced_history, context) pair.
+    """
+    bar_times = [entry[0] for entry in next(iter(market_data.values()))]
+    step = engine.batch_size if _is_batched(engine) else 1
+    for i in range(start, stop, step):
+        bars = list(range(i, min(i + step, stop)))
+        requests = []
+        for j in bars:
+            sliced_history = {coin: data[:j] for coin, data in market_data.items()}
+            context = context_fn(j, sliced_history) if context_fn else {}
+            if _is_batched(engine):
+                requests.append(engine.snapshot(sliced_history, bar_time=bar_times[j], **context))
+            else:
+                requests.append((sliced_history, context))
+        yield bars, (requests if _is_batched(engine) else requests[0])
+
+
+def _call_engine(engine: DecisionEngine, request, balance: Dict) -> List[Dict[str, tuple]]:
+    """Decisions for every bar of one request"""
+    if _is_batched(engine):
+        return engine.decide_batch(request, balance)
+    sliced_history, context = request
+    return [engine(sliced_history, balance, **context)]
+
+
+def prefetch_decisions(engine: DecisionEngine, market_data: Dict[str, List[tuple]], balance: Dict,
+                       warmup: int = WARMUP_BARS, context_fn: Optional[Callable] = None, max_workers: int = 4,
+                       requests_per_second: Optional[float] = None) -> Dict:
+    """Fetch decisions for every bar concurrently, against a frozen copy of ``balance``
+
+    Only valid for strategies that do not need the evolving balance: every
+    request sees the portfolio as it was before the backtest. Contexts are
+    still built in bar order on the calling thread, so they must not change
+    after ``context_fn`` returns them. A failed request holds for its bars.
+    """
+    frozen = copy.deepcopy(balance)
+    blocks = list(_bar_blocks(engine, market_data, warmup, len(next(iter(market_data.values()))), context_fn))
+    results = map_bounded(lambda block: _call_engine(engine, block[1], frozen), blocks,
+                          max_workers=max_workers, rate_limiter=RateLimiter(requests_per_second))
+
+    decisions = []
+    failures = 0
+    for (bars, _), result in zip(blocks, results):
+        if result.error is not None:
+            failures += 1
+            print(f"⚠️ Decision request for bar {bars[0]} failed: {result.error} - holding")
+            decisions.extend({} for _ in bars)
+        else:
+            decisions.extend(result.value)
+    return {"decisions": decisions, "engine_calls": len(blocks), "failed_calls": failures}
+
+
+def run_engine_backtest(engine: DecisionEngine, market_data: Dict[str, List[tuple]], balance: Dict,
+                        trader: Optional[AdvancedTrader] = None, warmup: int = WARMUP_BARS,
+                        context_fn: Optional[Callable[[int, Dict[str, List[tuple]]], Dict]] = None,
+                        show_progress: bool = True, prefetch_workers: int = 0,
+                        requests_per_second: Optional[float] = None) -> Dict:
+    """Run one engine over ``market_data`` and return a result summary
+
+    At bar ``i`` the engine only sees candles ``[0, i)`` and trades execute
+    at the close of candle ``i``. ``context_fn(i, sliced_history)`` may
+    return extra keyword arguments for the engine at each bar. P&L figures
+    are for this run only, not the balance's earlier history.
+
+    Engines with a ``decide_batch`` method and ``batch_size`` above one
+    (see batching.py) are asked for a whole block of bars at once; each
+    bar's snapshot is still built from its own slice and context.
+
+    With ``prefetch_workers`` > 0 the decisions are fetched up front on that
+    many threads (see prefetch_decisions) and trades are then replayed in
+    bar order; wall time drops roughly by the worker count.
+    """
+    trader = trader or AdvancedTrader(paper_trading=True)
+    length = len(next(iter(market_data.values())))
+    total_runs = max(length - warmup, 0)
+    decision_count = 0
+    trade_count = 0
+    engine_calls = 0
+    failed_calls = 0
+    starting_pnl = balance.get("realized_pnl", 0.0)
+    started = time.perf_counter()
+
+    if prefetch_workers > 0:
+        prefetched = prefetch_decisions(engine, market_data, balance, warmup, context_fn,
+                                        max_workers=prefetch_workers, requests_per_second=requests_per_second)
+        decisions_by_bar = iter(prefetched["decisions"])
+        engine_calls = prefetched["engine_calls"]
+        failed_calls = prefetched["failed_calls"]
+    else:
+        def sequential():
+            nonlocal engine_calls
+            for _, request in _bar_blocks(engine, market_data, warmup, length, context_fn):
+                engine_calls += 1
+                yield from _call_engine(engine, request, balance)
+        decisions_by_bar = sequential()
+
+    for i in range(warmup, length):
+        current_prices = {coin: data[i][1] for coin, data in market_data.items()}
+        decisions = next(decisions_by_bar)
+        decision_count += len(decisions)
+
+        # Check stop losses and take profits
+        trader.check_stop_losses_and_take_profits(balance, current_prices)
+
+        history_before = len(balance.get("history", []))
+        execute_decisions(trader, balance, decisions, current_prices)
+        trade_count += sum(1 for entry in balance.get("history", [])[history_before:] if " HELD " not in entry)
+
+        if show_progress:
+            _print_progress(i - warmup + 1, total_runs)
+
+    if show_progress:
+        print()  # New line after progress bar
+
+    final_prices = {coin: data[-1][1] for coin, data in market_data.items()}
+    unrealized_pnl = trader.calculate_total_pnl(balance, final_prices)
+    realized_pnl = balance.get("realized_pnl", 0.0) - starting_pnl
+    return {
+        "balance": balance,
+        "bars": total_runs,
+        "decisions": decision_count,
+        "engine_calls": engine_calls,
+        "failed_calls": failed_calls,
+        "trades": trade_count,
+        "realized_pnl": round(realized_pnl, 2),
+        "unrealized_pnl": unrealized_pnl,
+        "total_pnl": round(realized_pnl + unrealized_pnl, 2),
+        "elapsed_seconds": time.perf_counter() - started,
+    }
+
+
+def compare_engines(engines: Dict[str, DecisionEngine], market_data: Dict[str, List[tuple]],
+                    balance: Dict, warmup: int = WARMUP_BARS) -> Dict[str, Dict]:
+    """Backtest several engines head-to-head, each from a copy of the same balance"""
+    results = {}
+    for name, engine in engines.items():
+        result = run_engine_backtest(engine, market_data, copy.deepcopy(balance), warmup=warmup,
+                                     show_progress=False)
+        result.pop("balance")
+        results[name] = result
+    return results
@@ -0,0 +1,136 @@
+"""
+Batched LLM decisions for backtests
+
+Instead of one chat completion per backtest bar, K consecutive bar
+snapshots are packed into one request and K decision sets are parsed back,
+cutting round trips K-fold.
+
+Lookahead safeguards: each snapshot is rendered only from candles before
+its own bar, and the renderer refuses a history that reaches past it.
+Snapshots carry opaque ids instead of timestamps, appear in a shuffled
+order and are told to be judged independently, so the model cannot read
+one bar's future off the next snapshot. All bars in a batch are decided
+against the portfolio as it stood at the start of the batch; trades are
+still executed bar by bar in the backtest.
+
+The prompt reuses the rules and action grammar of the regular decision
+prompt (see prompts) as a static system preamble, and snapshots are
+rendered at every detail level up front so the batch can be fitted to the
+token budget without re-rendering from later market state.
+"""
+
+import random
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .ai_decision import format_market_text, format_portfolio, parse_decisions, request_completion
+from .config import PROMPT_TOKEN_BUDGET
+from .feature_store import to_open_time
+from .prompt_budget import DETAIL_LEVELS, fit_to_budget
+from .prompts import BATCH_SYSTEM_PREAMBLE, render_batch_prompt
+
+DEFAULT_BATCH_SIZE = 8
+
+_SNAPSHOT_HEADER = re.compile(r"^\s*\[?\s*(S\d+)\s*\]?\s*:?\s*$")
+_TIME_IN_HEADER = re.compile(r" to \d{4}-\d{2}-\d{2} \d{2}:\d{2}\)")
+
+
+def render_snapshot(price_volume_histories: Dict[str, List[tuple]], bar_time=None, detail: int = 0,
+                    **context) -> str:
+    """Render one bar's market text at a detail level, with timestamps stripped
+
+    ``bar_time`` is the open time of the bar being decided; a history with
+    a candle at or after it would leak the future and raises ValueError.
+    """
+    if bar_time is not None:
+        bar_open = to_open_time(bar_time)
+        for coin, history in price_volume_histories.items():
+            if history and to_open_time(history[-1][0]) >= bar_open:
+                raise ValueError(f"Lookahead: {coin} history reaches {history[-1][0]} for bar {bar_time}")
+    levels = {coin: detail for coin in price_volume_histories}
+    return _TIME_IN_HEADER.sub(")", format_market_text(price_volume_histories, detail=levels, **context))
+
+
+def build_batch_prompt(snapshots: Dict[str, Sequence[str]], balance: Dict, coins: Sequence[str],
+                       token_budget: int = PROMPT_TOKEN_BUDGET) -> Tuple[str, str]:
+    """Return (system, user) messages asking for a decision set per snapshot id
+
+    ``snapshots`` maps ids to the snapshot text at each detail level (or
+    to a single text); the largest snapshots lose detail first until the
+    prompt fits ``token_budget`` estimated tokens.
+    """
+    texts = {snapshot_id: [text] if isinstance(text, str) else list(text) for snapshot_id, text in snapshots.items()}
+    portfolio = format_portfolio(balance)
+
+    def render_block(snapshot_id: str, level: int) -> str:
+        return f"[{snapshot_id}]\n{texts[snapshot_id][min(level, len(texts[snapshot_id]) - 1)]}"
+
+    levels, blocks = fit_to_budget(list(texts), render_block,
+                                   lambda blocks: BATCH_SYSTEM_PREAMBLE + "\n" +
+                                   render_batch_prompt(blocks, portfolio, coins), token_budget)
+    reduced = sum(1 for level in levels.values() if level)
+    if reduced:
+        print(f"✂️ Batch prompt fitted to {token_budget} tokens: {reduced} of {len(levels)} snapshots reduced")
+    return BATCH_SYSTEM_PREAMBLE, render_batch_prompt(blocks, portfolio, coins)
+
+
+def parse_batch_reply(raw: str) -> Dict[str, Dict[str, tuple]]:
+    """Split a batched reply into decision sets keyed by snapshot id (none for an empty reply)"""
+    sections: Dict[str, List[str]] = {}
+    current = None
+    for line in (raw or "").strip().upper().splitlines():
+        header = _SNAPSHOT_HEADER.match(line)
+        if header:
+            current = header.group(1)
+            sections[current] = []
+        elif current is not None:
+            sections[current].append(line)
+    return {snapshot_id: parse_decisions("\n".join(lines)) for snapshot_id, lines in sections.items()}
+
+
+class BatchedLLMEngine:
+    """LLM decision engine that answers ``batch_size`` backtest bars per request
+
+    Backtests call ``snapshot`` once per bar (in order, so per-bar context
+    such as rolling volume profiles is captured at the right moment) and
+    ``decide_batch`` once per block of bars. Called directly it behaves as
+    a batch of one.
+    """
+
+    name = "llm_batch"
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, seed: Optional[int] = 0):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.batch_size = batch_size
+        self._random = random.Random(seed)
+
+    def snapshot(self, price_volume_histories: Dict[str, List[tuple]], bar_time=None, **context) -> Dict:
+        return {"coins": list(price_volume_histories),
+                "texts": [render_snapshot(price_volume_histories, bar_time=bar_time, detail=level, **context)
+                          for level in range(len(DETAIL_LEVELS))]}
+
+    def decide_batch(self, snapshots: List[Dict], balance: Dict, deadline=None) -> List[Dict[str, tuple]]:
+        """Return one decision dict per snapshot, in the order given (missing sets are empty)
+
+        A ``deadline`` bounds the request like in the other decision paths.
+        """
+        if not snapshots:
+            return []
+        ids = [f"S{index + 1}" for index in range(len(snapshots))]
+        order = list(range(len(snapshots)))
+        self._random.shuffle(order)
+        shuffled = {ids[index]: snapshots[index]["texts"] for index in order}
+
+        system, prompt = build_batch_prompt(shuffled, balance, snapshots[0]["coins"])
+        print(f"=== BATCHED PROMPT ({len(snapshots)} bars) SENT TO GPT ===")
+        decision_sets = parse_batch_reply(request_completion(prompt, system=system, deadline=deadline))
+
+        missing = [snapshot_id for snapshot_id in ids if snapshot_id not in decision_sets]
+        if missing:
+            print(f"⚠️ No decisions returned for {len(missing)} of {len(ids)} bars - holding")
+        return [decision_sets.get(snapshot_id, {}) for snapshot_id in ids]
+
+    def __call__(self, price_volume_histories: Dict[str, List[tuple]], balance: Dict, deadline=None,
+                 **context) -> Dict[str, tuple]:
+        return self.decide_batch([self.snapshot(price_volume_histories, **context)], balance, deadline=deadline)[0]
@@ -0,0 +1,72 @@
+"""
+Bounded concurrency helpers for model calls
+
+Model requests spend almost all their time waiting on the network, so
+independent requests can overlap on a small thread pool. ``RateLimiter``
+spaces request starts to stay under a provider's requests-per-second
+limit and ``map_bounded`` runs calls on a bounded pool, returning results
+in input order with failures captured instead of raised.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional, Sequence
+
+
+class RateLimiter:
+    """Thread-safe limiter allowing at most ``rate`` acquisitions per second
+
+    Tokens refill continuously up to ``burst``; ``acquire`` blocks until one
+    is available. A rate of None or 0 disables limiting.
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CallResult(NamedTuple):
+    """Outcome of one call: ``value`` on success, ``error`` otherwise"""
+    value: object
+    error: Optional[BaseException]
+    seconds: float
+
+
+def map_bounded(fn: Callable, items: Sequence, max_workers: int = 4,
+                rate_limiter: Optional[RateLimiter] = None) -> List[CallResult]:
+    """Call ``fn(item)`` for every item on at most ``max_workers`` threads
+
+    Results come back in the order of ``items``. Exceptions are captured in
+    the CallResult so one failed call does not abort the others.
+    """
+    def run(item):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        started = time.perf_counter()
+        try:
+            return CallResult(fn(item), None, time.perf_counter() - started)
+        except Exception as e:
+            return CallResult(None, e, time.perf_counter() - started)
+
+    if max_workers <= 1 or len(items) <= 1:
+        return [run(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(run, items))
@@ -16,13 +16,62 @@ TESTS_DIR = PROJECT_ROOT / "tests"
 BALANCE_FILE = DATA_DIR / "balance.json"
 PAPER_BALANCE_FILE = DATA_DIR / "paper_balance.json"
 
+# Feature store (columnar per-candle features)
+FEATURE_STORE_DIR = DATA_DIR / "features"
+
+# Market regime detector state, carried between runs
+REGIME_STATE_FILE = DATA_DIR / "regime_state.json"
+
+# LLM response cache (content-addressed, LRU-bounded)
+LLM_CACHE_FILE = DATA_DIR / "llm_cache.sqlite"
+LLM_CACHE_MAX_ENTRIES = 5000
+
+# Append-only LLM call metrics (latency, tokens, fallbacks, parse failures)
+LLM_METRICS_FILE = DATA_DIR / "llm_metrics.jsonl"
+
+# Change gate: last decision inputs per coin, carried between runs
+DECISION_GATE_FILE = DATA_DIR / "decision_gate.json"
+GATE_PRICE_THRESHOLD = 0.005  # Re-decide a coin after a 0.5% move since its last decision
+GATE_MAX_SKIPS = 6  # ...or after this many skipped cycles
+
+# Append-only journal of decision cycles (inputs, prompts, replies, decisions)
+DECISION_JOURNAL_FILE = DATA_DIR / "decision_journal.jsonl"
+
+# Local surrogate of the LLM strategy, trained from the journal
+SURROGATE_MODEL_FILE = DATA_DIR / "surrogate_model.json"
+
+# Stored prompt benchmark results that later runs are compared against
+PROMPT_BENCH_BASELINE_FILE = DATA_DIR / "prompt_bench_baseline.json"
+
 # Trading configuration
 DEFAULT_COINS = ["BTC", "SOL"]
+QUOTE_ASSET = "USDT"
 BINANCE_API_URL = "https://api.binance.com/api/v3/klines"
 
 # AI configuration
 DEFAULT_AI_MODEL = "gpt-5"
 DEFAULT_AI_TEMPERATURE = 0
+STRUCTURED_DECISIONS = True  # Ask for JSON decisions (text replies are still parsed)
+FANOUT_WORKERS = 4  # Concurrent requests in per-coin decision mode
+ENSEMBLE_BUDGET_SECONDS = 45  # Ensemble mode votes with whatever answered by then
+PROMPT_TOKEN_BUDGET = 4000  # Decision prompts (system + user) are fitted to this many estimated tokens
+
+# Deadlines (the scheduled workflow is killed after 10 minutes)
+CYCLE_DEADLINE_SECONDS = 480  # Whole live cycle: fetch, decide, execute
+LLM_TIMEOUT_SECONDS = 90  # Upper bound for a single model call
+LLM_MAX_RETRIES = 3  # Retries of rate-limited (429), 5xx and dropped model calls, with jittered backoff
+ASYNC_MAX_CONCURRENCY = 8  # Requests in flight at once on the shared async client
+DEADLINE_RESERVE_SECONDS = 30  # Kept back for executing trades and saving state
+DEGRADED_ENGINE = "ma_crossover"  # Local engine when the LLM cannot answer in time (None = HOLD)
+ROUTER_MODELS = ("gpt-4o", "gpt-4")  # Candidates for latency-based model routing
+DECISION_MODELS = ("gpt-4o", "gpt-4")  # Decision model and its fallback when no router picks them
+# USD per million (prompt, completion) tokens, for call cost telemetry; dated model names match by prefix
+MODEL_PRICES = {
+    "gpt-5": (1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4": (30.00, 60.00),
+}
 
 # Trading limits
 MAX_LEVERAGE = 1.0  # No leverage allowed
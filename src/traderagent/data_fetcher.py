@@ -67,8 +67,12 @@ def get_fallback_price_data(symbol, limit):
     
     return prices
 
-def get_price_and_volume_history(symbol="BTCUSDT", interval="1h", limit=72):
-    """Get price and volume history for a symbol with error handling"""
+def get_price_and_volume_history(symbol="BTCUSDT", interval="1h", limit=72, deadline=None):
+    """Get price and volume history for a symbol with error handling
+
+    With a ``deadline`` each request's timeout is cut to the time left, and
+    no further attempts are made once it has passed.
+    """
     url = "https://api.binance.com/api/v3/klines"
     params = {
         "symbol": symbol,
@@ -78,8 +82,12 @@ def get_price_and_volume_history(symbol="BTCUSDT", interval="1h", limit=72):
 
     # Try multiple times with backoff
     for attempt in range(3):
+        if deadline is not None and deadline.expired():
+            print(f"⏱️ No time left to fetch {symbol}. Using fallback data.")
+            return get_fallback_volume_data(symbol, limit)
         try:
-            response = requests.get(url, params=params, timeout=10)
+            timeout = deadline.timeout(10) if deadline is not None else 10
+            response = requests.get(url, params=params, timeout=timeout)
             
             if response.status_code == 451:
                 print(f"⚠️ Binance API blocked (Error 451) for {symbol}. Using fallback data.")
@@ -145,11 +153,11 @@ def get_all_price_histories():
         "SOL": get_price_history("SOLUSDT")
     }
 
-def get_all_price_and_volume_histories():
+def get_all_price_and_volume_histories(deadline=None):
     """Get price and volume histories for all supported coins"""
     return {
-        "BTC": get_price_and_volume_history("BTCUSDT"),
-        "SOL": get_price_and_volume_history("SOLUSDT")
+        "BTC": get_price_and_volume_history("BTCUSDT", deadline=deadline),
+        "SOL": get_price_and_volume_history("SOLUSDT", deadline=deadline)
     }
 
 def get_volume_analysis(volumes):
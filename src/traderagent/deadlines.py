@@ -0,0 +1,138 @@
+"""
+Cycle deadlines and latency-based model routing
+
+A trading cycle runs inside a fixed budget (the scheduled workflow is
+killed after 10 minutes). A ``Deadline`` is created when the cycle starts
+and passed down through fetch → decide → execute; every network call takes
+its timeout from it, so no single hung request can eat the whole budget.
+``ModelRouter`` keeps a rolling window of observed latencies per model and
+orders models fastest-first, skipping those that cannot answer before the
+deadline. When too little time is left for any model call, the cycle
+degrades to a local engine (or HOLD).
+"""
+
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from .config import DEADLINE_RESERVE_SECONDS, DEGRADED_ENGINE, LLM_TIMEOUT_SECONDS, ROUTER_MODELS
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a stage cannot start or finish before the cycle deadline"""
+
+
+class Deadline:
+    """A point in time by which the cycle must be done
+
+    ``reserve`` seconds are held back for the stages after the model call
+    (executing trades, saving the balance), so ``timeout`` never hands them
+    out.
+    """
+
+    def __init__(self, seconds: float, reserve: float = DEADLINE_RESERVE_SECONDS, clock=time.monotonic):
+        self._clock = clock
+        self.seconds = seconds
+        self.reserve = reserve
+        self.expires_at = clock() + seconds
+
+    def remaining(self) -> float:
+        """Seconds until the deadline (negative once it has passed)"""
+        return self.expires_at - self._clock()
+
+    def available(self) -> float:
+        """Seconds that may still be spent before the reserve"""
+        return self.remaining() - self.reserve
+
+    def expired(self) -> bool:
+        return self.available() <= 0
+
+    def timeout(self, cap: float) -> float:
+        """A call timeout: ``cap`` seconds, or less if the deadline is closer
+
+        Raises DeadlineExceeded when no time is left for the call at all.
+        """
+        available = self.available()
+        if available <= 0:
+            raise DeadlineExceeded(f"cycle deadline reached ({self.remaining():.1f}s left, "
+                                   f"{self.reserve:.0f}s reserved)")
+        return min(cap, available)
+
+    def check(self, stage: str) -> None:
+        """Print the time left for a stage, raising DeadlineExceeded if there is none"""
+        if self.expired():
+            raise DeadlineExceeded(f"no time left for {stage}")
+        print(f"⏳ {stage}: {self.available():.1f}s left before deadline")
+
+
+def is_timeout(error: Exception) -> bool:
+    """Whether an exception is a timeout (ours, the socket's or the OpenAI client's)"""
+    return (isinstance(error, TimeoutError) or "timeout" in type(error).__name__.lower()
+            or "timed out" in str(error).lower())
+
+
+class ModelRouter:
+    """Orders models by observed rolling latency
+
+    Each model keeps its last ``window`` call durations; failed calls count
+    as ``LLM_TIMEOUT_SECONDS`` so a model that keeps timing out drops to the
+    back. Models without observations rank first (in configured order) so
+    each one gets measured.
+    """
+
+    def __init__(self, models: Iterable[str] = ROUTER_MODELS, window: int = 20,
+                 failure_seconds: float = LLM_TIMEOUT_SECONDS):
+        self.models = list(models)
+        self.window = window
+        self.failure_seconds = failure_seconds
+        self._latencies: Dict[str, Deque[float]] = {model: deque(maxlen=window) for model in self.models}
+        self._lock = threading.Lock()
+
+    def observe(self, model: str, seconds: float, ok: bool = True) -> None:
+        """Record one call duration"""
+        with self._lock:
+            window = self._latencies.setdefault(model, deque(maxlen=self.window))
+            window.append(seconds if ok else max(seconds, self.failure_seconds))
+
+    def seed(self, records: Iterable[Dict]) -> "ModelRouter":
+        """Warm the windows from telemetry call records (e.g. earlier runs' metrics file)"""
+        for record in records:
+            if record.get("event") == "call" and not record.get("cached") and not record.get("stream") \
+                    and record.get("model_used") and record.get("wall_seconds") is not None:
+                self.observe(record["model_used"], record["wall_seconds"], ok=not record.get("error"))
+        return self
+
+    def latency(self, model: str) -> Optional[float]:
+        """Rolling median call duration, or None before the first call"""
+        with self._lock:
+            window = self._latencies.get(model)
+            return statistics.median(window) if window else None
+
+    def ranked(self) -> List[str]:
+        """Models fastest-first, unobserved ones first"""
+        # sorted() is stable, so ties keep the configured order
+        return sorted(self.models, key=lambda model: self.latency(model) or 0.0)
+
+    def route(self, available: Optional[float] = None) -> Tuple[str, Optional[str]]:
+        """Pick (model, fallback) for a call with ``available`` seconds left
+
+        Models whose rolling latency exceeds the time available are dropped
+        (the fastest one is always kept), so there is no fallback when only
+        one model can still answer in time.
+        """
+        ranked = self.ranked()
+        if available is not None:
+            ranked = [m for m in ranked if (self.latency(m) or 0.0) <= available] or ranked[:1]
+        return ranked[0], (ranked[1] if len(ranked) > 1 else None)
+
+
+def degraded_decisions(price_volume_histories, balance, engine_name: Optional[str] = DEGRADED_ENGINE):
+    """Decisions when the LLM cannot answer in time: a local engine, or HOLD for every coin"""
+    if engine_name:
+        from .engines import get_engine
+        print(f"🛟 Deadline near - using local {engine_name} engine instead of the LLM")
+        return get_engine(engine_name)(price_volume_histories, balance)
+    print("🛟 Deadline near - holding all positions")
+    return {coin: ("HOLD", 0.0) for coin in price_volume_histories}
@@ -0,0 +1,191 @@
+"""
+Typed trading decisions and reply parsing
+
+Model replies are parsed into ``Decision`` objects. The preferred format is
+structured JSON matching ``DECISION_SCHEMA`` (requested through the API's
+``response_format``), which is validated in one pass with ``json.loads``
+and dictionary lookups - no regular expressions, no line splitting. Free
+text "COIN: ACTION params" replies are still understood as a fallback.
+
+Decisions convert to the tuples the traders execute via ``as_tuple``:
+``(action, percent, leverage, stop_loss, take_profit)`` for new positions,
+``(action, percent)`` for everything else.
+"""
+
+import json
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+ENTRY_ACTIONS = ("BUY_LONG", "SELL_SHORT")
+PERCENT_ACTIONS = ("CLOSE_LONG", "CLOSE_SHORT", "BUY", "SELL")
+ACTIONS = ENTRY_ACTIONS + PERCENT_ACTIONS + ("HOLD",)
+
+DECISION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "decisions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "coin": {"type": "string", "description": "Coin symbol, e.g. BTC"},
+                    "action": {"type": "string", "enum": list(ACTIONS)},
+                    "percent": {"type": "number", "description": "Percent of available margin or position, 0-100"},
+                    "stop_loss": {"type": ["number", "null"]},
+                    "take_profit": {"type": ["number", "null"]},
+                },
+                "required": ["coin", "action", "percent", "stop_loss", "take_profit"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["decisions"],
+    "additionalProperties": False,
+}
+
+# Passed as ``response_format`` to chat.completions.create
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "trading_decisions", "strict": True, "schema": DECISION_SCHEMA},
+}
+
+
+class DecisionParseError(ValueError):
+    """Raised when a structured reply is not valid decision JSON"""
+
+
+class Decision(NamedTuple):
+    """One coin's decision; ``percent`` is a fraction (0.25 = 25%)"""
+    coin: str
+    action: str
+    percent: float = 0.0
+    leverage: float = 1.0
+    stop_loss: Optional[float] = None
+    take_profit: Optional[float] = None
+
+    def as_tuple(self) -> tuple:
+        if self.action in ENTRY_ACTIONS:
+            return (self.action, self.percent, self.leverage, self.stop_loss, self.take_profit)
+        return (self.action, self.percent)
+
+
+class ParsedReply(NamedTuple):
+    """Decisions from one reply, whether it was structured, and skipped entries"""
+    decisions: Dict[str, Decision]
+    structured: bool
+    errors: List[str]
+
+
+def _number(value, field: str) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{field} must be a number, got {value!r}")
+    return float(value)
+
+
+def _decision_from_entry(entry: Dict) -> Decision:
+    coin = str(entry["coin"]).strip().upper()
+    action = str(entry["action"]).strip().upper()
+    if not coin:
+        raise ValueError("empty coin")
+    if action not in ACTIONS:
+        raise ValueError(f"unknown action {action!r}")
+    if action == "HOLD":
+        return Decision(coin, action)
+
+    percent = _number(entry.get("percent"), "percent") or 0.0
+    if not 0 <= percent <= 100:
+        raise ValueError(f"percent out of range: {percent}")
+    if action in PERCENT_ACTIONS:
+        return Decision(coin, action, percent / 100)
+    # Leverage is always forced to 1x (no leverage allowed)
+    return Decision(coin, action, percent / 100, 1.0,
+                    _number(entry.get("stop_loss"), "stop_loss"), _number(entry.get("take_profit"), "take_profit"))
+
+
+def parse_structured(raw: str) -> ParsedReply:
+    """Validate a JSON reply in one pass; invalid entries are skipped and reported"""
+    try:
+        payload = json.loads(raw)
+    except ValueError as e:
+        raise DecisionParseError(f"reply is not JSON: {e}") from e
+    entries = payload.get("decisions") if isinstance(payload, dict) else None
+    if not isinstance(entries, list):
+        raise DecisionParseError("reply has no 'decisions' list")
+
+    decisions = {}
+    errors = []
+    for entry in entries:
+        try:
+            decision = _decision_from_entry(entry)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            errors.append(f"{entry!r}: {e}")
+            continue
+        decisions[decision.coin] = decision
+    return ParsedReply(decisions, True, errors)
+
+
+def parse_text(raw: str) -> ParsedReply:
+    """Parse free-text "COIN: ACTION params" lines, skipping malformed lines"""
+    decisions = {}
+    errors = []
+    for line in raw.strip().upper().splitlines():
+        if ":" not in line or not line.strip():
+            continue  # Skip bad or empty lines
+
+        try:
+            coin, action_info = line.strip().split(":", 1)
+            coin = coin.strip()
+            parts = action_info.strip().split()
+            if not parts:
+                continue
+
+            action = parts[0]
+
+            # Parse parameters based on action type
+            if action in ENTRY_ACTIONS:
+                percent = float(parts[1].replace('%', '')) / 100 if len(parts) > 1 else 0.0
+                stop_loss = float(parts[2]) if len(parts) > 2 and parts[2] != 'NULL' else None
+                take_profit = float(parts[3]) if len(parts) > 3 and parts[3] != 'NULL' else None
+                decisions[coin] = Decision(coin, action, percent, 1.0, stop_loss, take_profit)
+
+            elif action in PERCENT_ACTIONS:
+                percent = float(parts[1].replace('%', '')) / 100 if len(parts) > 1 else 0.0
+                decisions[coin] = Decision(coin, action, percent)
+
+            elif action == "HOLD":
+                decisions[coin] = Decision(coin, action)
+
+        except Exception as e:
+            print(f"Skipping malformed line: '{line}' — {e}")
+            errors.append(f"{line!r}: {e}")
+            continue
+
+    return ParsedReply(decisions, False, errors)
+
+
+def parse_reply(raw: str) -> ParsedReply:
+    """Parse a reply as structured JSON when it looks like JSON, otherwise as text"""
+    stripped = raw.strip()
+    if stripped.startswith("{"):
+        try:
+            return parse_structured(stripped)
+        except DecisionParseError as e:
+            print(f"⚠️ Structured reply rejected ({e}) - falling back to text parser")
+    return parse_text(stripped)
+
+
+def to_tuples(decisions: Dict[str, Decision]) -> Dict[str, tuple]:
+    """Convert typed decisions to the tuples AdvancedTrader.execute_trade expects"""
+    return {coin: decision.as_tuple() for coin, decision in decisions.items()}
+
+
+def iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Re-assemble streamed text chunks into complete lines as soon as each one ends"""
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split("\n")
+        yield from lines
+    if buffer:
+        yield buffer
@@ -0,0 +1,202 @@
+"""
+Decision engines for TraderAgent
+
+A decision engine is any callable that takes ``(price_volume_histories,
+balance, **context)`` and returns the usual decision dict, e.g.
+``{"BTC": ("BUY_LONG", 0.25, 1.0, 58000.0, 70000.0), "SOL": ("HOLD", 0.0)}``.
+``get_ai_decision_with_volume`` is the LLM engine; the rule-based engines
+below return the same tuples from local computation only, so strategies
+can be backtested at CPU speed and compared against the LLM.
+"""
+
+from typing import Callable, Dict, List, Optional, Protocol
+
+from .feature_store import compute_features
+
+
+class DecisionEngine(Protocol):
+    """Callable that turns market histories and a balance into per-coin decisions"""
+
+    def __call__(self, price_volume_histories: Dict[str, List[tuple]], balance: Dict,
+                 **context) -> Dict[str, tuple]:
+        ...
+
+
+def open_positions(balance: Dict, coin: str):
+    """Return (long_amount, short_amount) for a coin, tolerating partial balances"""
+    positions = balance.get("positions", {}).get(coin, {})
+    return positions.get("long", {}).get("amount", 0), positions.get("short", {}).get("amount", 0)
+
+
+class RuleEngine:
+    """Base class for local engines: turns a per-coin signal into decision tuples
+
+    Subclasses implement ``signal(history)`` returning +1 (go long), -1 (go
+    short) or 0 (no signal). An opposite open position is closed first, an
+    existing position in the signal direction is held.
+    """
+
+    name = "rule"
+
+    def __init__(self, percent: float = 0.25, stop_loss_pct: Optional[float] = 0.03,
+                 take_profit_pct: Optional[float] = 0.06):
+        self.percent = percent
+        self.stop_loss_pct = stop_loss_pct
+        self.take_profit_pct = take_profit_pct
+
+    def signal(self, history: List[tuple]) -> int:
+        raise NotImplementedError
+
+    def _entry(self, action: str, price: float) -> tuple:
+        direction = 1 if action == "BUY_LONG" else -1
+        stop_loss = round(price * (1 - direction * self.stop_loss_pct), 2) if self.stop_loss_pct else None
+        take_profit = round(price * (1 + direction * self.take_profit_pct), 2) if self.take_profit_pct else None
+        return (action, self.percent, 1.0, stop_loss, take_profit)
+
+    def decide_coin(self, coin: str, history: List[tuple], balance: Dict) -> tuple:
+        if not history:
+            return ("HOLD", 0.0)
+        signal = self.signal(history)
+        long_amount, short_amount = open_positions(balance, coin)
+        price = history[-1][1]
+
+        if signal > 0:
+            if short_amount > 0:
+                return ("CLOSE_SHORT", 1.0)
+            if long_amount <= 0:
+                return self._entry("BUY_LONG", price)
+        elif signal < 0:
+            if long_amount > 0:
+                return ("CLOSE_LONG", 1.0)
+            if short_amount <= 0:
+                return self._entry("SELL_SHORT", price)
+        return ("HOLD", 0.0)
+
+    def __call__(self, price_volume_histories: Dict[str, List[tuple]], balance: Dict,
+                 **context) -> Dict[str, tuple]:
+        return {coin: self.decide_coin(coin, history, balance)
+                for coin, history in price_volume_histories.items()}
+
+
+class MovingAverageCrossoverEngine(RuleEngine):
+    """Long when the fast SMA crosses above the slow SMA, short on the opposite cross"""
+
+    name = "ma_crossover"
+
+    def __init__(self, fast: int = 12, slow: int = 26, **kwargs):
+        super().__init__(**kwargs)
+        self.fast = fast
+        self.slow = slow
+
+    def signal(self, history: List[tuple]) -> int:
+        if len(history) < self.slow + 1:
+            return 0
+        closes = [entry[1] for entry in history[-(self.slow + 1):]]
+        fast_now = sum(closes[-self.fast:]) / self.fast
+        slow_now = sum(closes[-self.slow:]) / self.slow
+        fast_prev = sum(closes[-self.fast - 1:-1]) / self.fast
+        slow_prev = sum(closes[:-1]) / self.slow
+        if fast_prev <= slow_prev and fast_now > slow_now:
+            return 1
+        if fast_prev >= slow_prev and fast_now < slow_now:
+            return -1
+        return 0
+
+
+class BreakoutEngine(RuleEngine):
+    """Long on a close above the prior ``lookback`` high, short below the prior low"""
+
+    name = "breakout"
+
+    def __init__(self, lookback: int = 24, **kwargs):
+        super().__init__(**kwargs)
+        self.lookback = lookback
+
+    def signal(self, history: List[tuple]) -> int:
+        if len(history) < self.lookback + 1:
+            return 0
+        prior = [entry[1] for entry in history[-(self.lookback + 1):-1]]
+        close = history[-1][1]
+        if close > max(prior):
+            return 1
+        if close < min(prior):
+            return -1
+        return 0
+
+
+class VolumeMomentumEngine(RuleEngine):
+    """Follow ``lookback``-candle momentum only when volume confirms it
+
+    Uses the same recent-vs-older volume ratio as the feature store
+    (last 5 candles against the 15 before them).
+    """
+
+    name = "volume_momentum"
+
+    def __init__(self, lookback: int = 12, min_return: float = 0.01, min_volume_ratio: float = 1.2, **kwargs):
+        super().__init__(**kwargs)
+        self.lookback = lookback
+        self.min_return = min_return
+        self.min_volume_ratio = min_volume_ratio
+
+    def signal(self, history: List[tuple]) -> int:
+        window = max(self.lookback + 1, 20)
+        if len(history) < window:
+            return 0
+        tail = history[-window:]
+        features = compute_features([entry[1] for entry in tail],
+                                    [entry[2] if len(entry) > 2 else 0.0 for entry in tail])
+        volume_ratio = features["volume_ratio"][-1]
+        if not volume_ratio >= self.min_volume_ratio:  # also rejects NaN (no volume data)
+            return 0
+        momentum = tail[-1][1] / tail[-1 - self.lookback][1] - 1
+        if momentum > self.min_return:
+            return 1
+        if momentum < -self.min_return:
+            return -1
+        return 0
+
+
+def _llm_engine(price_volume_histories, balance, **context):
+    # Imported here so local-only runs never load the LLM code path
+    from .ai_decision import get_ai_decision_with_volume
+    return get_ai_decision_with_volume(price_volume_histories, balance, **context)
+
+
+def _llm_per_coin_engine(price_volume_histories, balance, **context):
+    from .ai_decision import get_ai_decision_per_coin
+    return get_ai_decision_per_coin(price_volume_histories, balance, **context)
+
+
+def _llm_ensemble_engine():
+    from .ensemble import EnsembleEngine
+    return EnsembleEngine()
+
+
+def _surrogate_engine():
+    from .surrogate import SurrogateEngine
+    return SurrogateEngine()
+
+
+# Engines that call the model and accept the prompt context (feature store, profiles, bundle)
+LLM_ENGINES = ("llm", "llm_per_coin", "llm_ensemble")
+
+# Local engines that need a trained model file before they can be created
+TRAINED_ENGINES = ("surrogate",)
+
+ENGINES: Dict[str, Callable[[], DecisionEngine]] = {
+    "llm": lambda: _llm_engine,
+    "llm_per_coin": lambda: _llm_per_coin_engine,
+    "llm_ensemble": _llm_ensemble_engine,
+    MovingAverageCrossoverEngine.name: MovingAverageCrossoverEngine,
+    BreakoutEngine.name: BreakoutEngine,
+    VolumeMomentumEngine.name: VolumeMomentumEngine,
+    "surrogate": _surrogate_engine,
+}
+
+
+def get_engine(name: str) -> DecisionEngine:
+    """Create a decision engine by name (see ENGINES)"""
+    if name not in ENGINES:
+        raise ValueError(f"Unknown decision engine '{name}'. Choose from: {', '.join(ENGINES)}")
+    return ENGINES[name]()
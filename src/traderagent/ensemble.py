@@ -0,0 +1,177 @@
+"""
+Ensemble LLM decisions with voting under a latency budget
+
+A single completion is a noisy sample. The ensemble engine sends one
+decision request per member (a model, temperature and reply format)
+concurrently, keeps whatever answers arrive within ``budget_seconds`` and
+votes per coin. Wall-clock time is that of the slowest member that made
+the budget, not the sum. Each call also reports how strongly the members
+agreed, per coin and per member. Every member request is bounded by the
+budget, and replies that miss it are discarded - they never reach the
+vote or the journal capture.
+
+Voting:
+- ``majority``: the action with the most votes wins; ties HOLD.
+- ``weighted``: votes count with the member's ``weight`` (e.g. set from
+  each member's historical agreement with the consensus).
+Percent, stop loss and take profit of the winning action are the medians
+over the members that voted for it.
+"""
+
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from .ai_decision import build_budgeted_prompt, capture_exchange, request_completion_with_model
+from .config import ENSEMBLE_BUDGET_SECONDS
+from .deadlines import Deadline
+from .decisions import RESPONSE_FORMAT, Decision, parse_reply
+
+VOTING_MODES = ("majority", "weighted")
+
+
+class EnsembleMember(NamedTuple):
+    """One ensemble request: model, sampling temperature and reply format"""
+    model: str = "gpt-4o"
+    temperature: Optional[float] = None
+    structured: bool = True
+    weight: float = 1.0
+
+    @property
+    def name(self) -> str:
+        temperature = "default" if self.temperature is None else f"t={self.temperature}"
+        return f"{self.model}/{temperature}/{'json' if self.structured else 'text'}"
+
+
+DEFAULT_MEMBERS = (
+    EnsembleMember("gpt-4o"),
+    EnsembleMember("gpt-4o", temperature=0.7),
+    EnsembleMember("gpt-4o", temperature=0.7, structured=False),
+)
+
+
+def _median(values: List[Optional[float]]) -> Optional[float]:
+    present = [value for value in values if value is not None]
+    return float(statistics.median(present)) if present else None
+
+
+def vote(ballots: Dict[str, Dict[str, Decision]], weights: Optional[Dict[str, float]] = None) -> Dict:
+    """Merge per-member decisions into one per coin
+
+    ``ballots`` maps member names to their parsed decisions. Returns
+    ``{"decisions": {coin: tuple}, "agreement": {coin: share of the vote}}``.
+    """
+    coins = sorted({coin for decisions in ballots.values() for coin in decisions})
+    decisions, agreement = {}, {}
+    for coin in coins:
+        votes = {member: member_decisions[coin] for member, member_decisions in ballots.items()
+                 if coin in member_decisions}
+        tally: Dict[str, float] = {}
+        for member, decision in votes.items():
+            tally[decision.action] = tally.get(decision.action, 0.0) + (weights or {}).get(member, 1.0)
+
+        best = max(tally.values())
+        leaders = [action for action, score in tally.items() if score == best]
+        action = leaders[0] if len(leaders) == 1 else "HOLD"
+        agreement[coin] = best / sum(tally.values()) if len(leaders) == 1 else 0.0
+
+        backers = [decision for decision in votes.values() if decision.action == action]
+        if not backers:  # A tie resolved to HOLD that nobody voted for
+            decisions[coin] = ("HOLD", 0.0)
+            continue
+        merged = Decision(coin, action, round(_median([d.percent for d in backers]), 4),
+                          stop_loss=_median([d.stop_loss for d in backers]),
+                          take_profit=_median([d.take_profit for d in backers]))
+        decisions[coin] = merged.as_tuple()
+    return {"decisions": decisions, "agreement": agreement}
+
+
+class EnsembleEngine:
+    """LLM decision engine voting over concurrent member requests
+
+    ``last_report`` holds the latest call's members, timing and agreement
+    metrics; ``reports`` keeps them all for the run.
+    """
+
+    name = "llm_ensemble"
+
+    def __init__(self, members: Sequence[EnsembleMember] = DEFAULT_MEMBERS, voting: str = "majority",
+                 budget_seconds: float = ENSEMBLE_BUDGET_SECONDS, min_responses: int = 1):
+        if voting not in VOTING_MODES:
+            raise ValueError(f"Unknown voting mode '{voting}'. Choose from: {', '.join(VOTING_MODES)}")
+        self.members = list(members)
+        self.voting = voting
+        self.budget_seconds = budget_seconds
+        self.min_responses = min_responses
+        self.last_report: Optional[Dict] = None
+        self.reports: List[Dict] = []
+
+    def _ask(self, member: EnsembleMember, prompts: Dict[bool, tuple], deadline: Deadline) -> tuple:
+        system, prompt = prompts[member.structured]
+        return request_completion_with_model(prompt, model=member.model, system=system,
+                                             temperature=member.temperature,
+                                             response_format=RESPONSE_FORMAT if member.structured else None,
+                                             deadline=deadline, capture=False)
+
+    def __call__(self, price_volume_histories: Dict[str, List[tuple]], balance: Dict, feature_store=None,
+                 volume_profiles=None, feature_bundle=None, deadline=None, **context) -> Dict[str, tuple]:
+        prompts = {structured: build_budgeted_prompt(price_volume_histories, balance, structured=structured,
+                                                     feature_store=feature_store, volume_profiles=volume_profiles,
+                                                     feature_bundle=feature_bundle)
+                   for structured in {member.structured for member in self.members}}
+
+        budget = self.budget_seconds
+        if deadline is not None:
+            budget = min(budget, deadline.available())
+        call_deadline = Deadline(budget, reserve=0)
+
+        print(f"=== ENSEMBLE: {len(self.members)} REQUESTS, {budget:.0f}s BUDGET, {self.voting} vote ===")
+        started = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=len(self.members))
+        futures = {executor.submit(self._ask, member, prompts, call_deadline): member for member in self.members}
+        done, late = wait(futures, timeout=budget)
+        executor.shutdown(wait=False, cancel_futures=True)
+        elapsed = time.perf_counter() - started
+
+        ballots, failed = {}, []
+        for future in done:
+            member = futures[future]
+            if future.exception() is not None:
+                failed.append(member.name)
+                print(f"⚠️ {member.name}: {future.exception()}")
+            else:
+                raw, answered_by = future.result()
+                system, prompt = prompts[member.structured]
+                capture_exchange(prompt, raw, model=answered_by, system=system)
+                ballots[member.name] = parse_reply(raw).decisions
+        if len(ballots) < self.min_responses:
+            raise TimeoutError(f"Only {len(ballots)} of {len(self.members)} ensemble members answered "
+                               f"within {budget:.0f}s")
+
+        weights = {member.name: member.weight for member in self.members} if self.voting == "weighted" else None
+        result = vote(ballots, weights)
+        decisions = result["decisions"]
+
+        member_agreement = {}
+        for member_name, member_decisions in ballots.items():
+            shared = [coin for coin in decisions if coin in member_decisions]
+            matches = sum(member_decisions[coin].action == decisions[coin][0] for coin in shared)
+            member_agreement[member_name] = matches / len(shared) if shared else 0.0
+
+        self.last_report = {
+            "members": len(self.members),
+            "responded": len(ballots),
+            "failed": failed,
+            "late": [futures[future].name for future in late],
+            "seconds": elapsed,
+            "agreement": result["agreement"],
+            "mean_agreement": statistics.fmean(result["agreement"].values()) if result["agreement"] else 0.0,
+            "unanimous": sum(1 for share in result["agreement"].values() if share == 1.0),
+            "member_agreement": member_agreement,
+        }
+        self.reports.append(self.last_report)
+
+        print(f"🗳️ {len(ballots)}/{len(self.members)} members in {elapsed:.2f}s | " + ", ".join(
+            f"{coin} {decisions[coin][0]} ({share:.0%})" for coin, share in result["agreement"].items()))
+        return decisions
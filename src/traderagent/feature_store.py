@@ -0,0 +1,262 @@
+"""
+Persistent per-candle feature store for TraderAgent
+
+Features are keyed by (symbol, interval, open_time, feature_version) and kept
+as numpy columns in one ``.npz`` file per (symbol, interval, version). New
+candles only get features computed for the new rows, so the live loop,
+backtests and prompt building can all read the same precomputed columns.
+"""
+
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .config import DEFAULT_INTERVAL, FEATURE_STORE_DIR, QUOTE_ASSET
+
+# Bump whenever compute_features changes so stale columns are never reused
+FEATURE_VERSION = 1
+
+# Longest trailing window any feature needs (sma_26)
+LOOKBACK = 26
+
+FEATURE_COLUMNS = [
+    "return_1",
+    "return_24",
+    "sma_12",
+    "sma_26",
+    "volatility_24",
+    "rsi_14",
+    "volume_ratio",
+    "range_position_24",
+]
+
+BASE_COLUMNS = ["open_time", "close", "volume"]
+
+
+def coin_symbol(coin: str) -> str:
+    """Map a coin (e.g. BTC) to its exchange symbol (e.g. BTCUSDT)"""
+    return f"{coin}{QUOTE_ASSET}"
+
+
+def to_open_time(timestamp) -> int:
+    """Convert a history timestamp to an open time in epoch milliseconds"""
+    if isinstance(timestamp, (int, float, np.integer, np.floating)):
+        return int(timestamp)
+    return int(datetime.strptime(timestamp, "%Y-%m-%d %H:%M").timestamp() * 1000)
+
+
+_UNIT_MS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000}
+
+
+def interval_ms(interval: str) -> int:
+    """Length of an interval such as 15m, 1h or 1d in milliseconds"""
+    return int(interval[:-1]) * _UNIT_MS[interval[-1]]
+
+
+def candle_problem(open_times: Sequence[int], step: int, last_time: Optional[int] = None) -> Optional[str]:
+    """Why a series of open times is not a run of ``step``-spaced candles, or None if it is
+
+    Open times must strictly increase in whole steps (gaps allowed) and
+    line up with the stored tail ``last_time``. Generated fallback data,
+    which stamps every candle with the current time, fails this.
+    """
+    for previous, current in zip(open_times, open_times[1:]):
+        if current <= previous:
+            return "open times not strictly increasing"
+        if (current - previous) % step:
+            return "open times not whole candles apart"
+    if last_time is not None and open_times and (open_times[0] - last_time) % step:
+        return "open times not aligned with the stored candles"
+    return None
+
+
+def _rolling(values: np.ndarray, window: int, func) -> np.ndarray:
+    """Apply ``func`` over trailing windows, NaN-padded to the input length"""
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window)
+        out[window - 1:] = func(windows, axis=1)
+    return out
+
+
+def _shifted_return(closes: np.ndarray, periods: int) -> np.ndarray:
+    out = np.full(len(closes), np.nan)
+    if len(closes) > periods:
+        out[periods:] = closes[periods:] / closes[:-periods] - 1
+    return out
+
+
+def compute_features(closes: Sequence[float], volumes: Sequence[float]) -> Dict[str, np.ndarray]:
+    """Compute all feature columns for a close/volume series
+
+    Every feature only looks at the trailing ``LOOKBACK`` candles, which is
+    what makes incremental updates produce the same values as a full pass.
+    Rows without enough history are NaN.
+    """
+    closes = np.asarray(closes, dtype=float)
+    volumes = np.asarray(volumes, dtype=float)
+    n = len(closes)
+
+    returns = _shifted_return(closes, 1)
+
+    # RSI over simple averages of gains and losses (finite window, no smoothing state)
+    deltas = np.full(n, np.nan)
+    deltas[1:] = np.diff(closes)
+    gains = _rolling(np.nan_to_num(np.clip(deltas, 0, None)), 14, np.mean)
+    losses = _rolling(np.nan_to_num(np.clip(-deltas, 0, None)), 14, np.mean)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(losses == 0, 100.0, 100 - 100 / (1 + gains / losses))
+    if n:
+        rsi[:min(n, 14)] = np.nan
+
+    # Same split as get_volume_analysis: last 5 candles vs the 15 before them
+    recent_volume = _rolling(volumes, 5, np.mean)
+    older_volume = np.full(n, np.nan)
+    if n > 5:
+        older_volume[5:] = _rolling(volumes, 15, np.mean)[:-5]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        volume_ratio = np.where(older_volume > 0, recent_volume / older_volume, np.nan)
+
+    low_24 = _rolling(closes, 24, np.min)
+    high_24 = _rolling(closes, 24, np.max)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        range_position = np.where(high_24 > low_24, (closes - low_24) / (high_24 - low_24), 0.5)
+    range_position[np.isnan(low_24)] = np.nan
+
+    volatility = np.full(n, np.nan)
+    if n > 1:
+        volatility[1:] = _rolling(returns[1:], 24, np.std)
+
+    return {
+        "return_1": returns,
+        "return_24": _shifted_return(closes, 24),
+        "sma_12": _rolling(closes, 12, np.mean),
+        "sma_26": _rolling(closes, 26, np.mean),
+        "volatility_24": volatility,
+        "rsi_14": rsi,
+        "volume_ratio": volume_ratio,
+        "range_position_24": range_position,
+    }
+
+
+def _empty_table() -> Dict[str, np.ndarray]:
+    table = {"open_time": np.empty(0, dtype=np.int64)}
+    for column in BASE_COLUMNS[1:] + FEATURE_COLUMNS:
+        table[column] = np.empty(0, dtype=float)
+    return table
+
+
+class FeatureStore:
+    """Columnar on-disk store of per-candle features"""
+
+    def __init__(self, root: Optional[Path] = None, feature_version: int = FEATURE_VERSION):
+        self.root = Path(root) if root is not None else FEATURE_STORE_DIR
+        self.feature_version = feature_version
+        self._tables: Dict[tuple, Dict[str, np.ndarray]] = {}
+
+    def _path(self, symbol: str, interval: str) -> Path:
+        return self.root / f"{symbol}_{interval}_v{self.feature_version}.npz"
+
+    def _table(self, symbol: str, interval: str) -> Dict[str, np.ndarray]:
+        key = (symbol, interval)
+        if key not in self._tables:
+            path = self._path(symbol, interval)
+            if path.exists():
+                with np.load(path) as data:
+                    self._tables[key] = {column: data[column] for column in data.files}
+            else:
+                self._tables[key] = _empty_table()
+        return self._tables[key]
+
+    def save(self, symbol: str, interval: str = DEFAULT_INTERVAL):
+        """Write one (symbol, interval) table to disk"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        np.savez(self._path(symbol, interval), **self._table(symbol, interval))
+
+    def update(self, symbol: str, history: List[tuple], interval: str = DEFAULT_INTERVAL,
+               persist: bool = True) -> int:
+        """Append new candles from a (timestamp, price, volume) history
+
+        Only rows newer than the stored tail get features computed. A candle
+        with the same open time as the stored tail replaces it, since the
+        latest kline from the exchange is still forming. Histories that are
+        not strictly increasing, whole-interval candles (such as generated
+        fallback data) are rejected. Returns the number of rows written.
+        """
+        table = self._table(symbol, interval)
+        stored_times = table["open_time"]
+        last_time = int(stored_times[-1]) if len(stored_times) else None
+
+        open_times = [to_open_time(entry[0]) for entry in history]
+        problem = candle_problem(open_times, interval_ms(interval), last_time)
+        if problem is not None:
+            # Never persist malformed (e.g. generated fallback) data: it would hide real candles
+            print(f"⚠️ Not storing {symbol} {interval} history: {problem}")
+            return 0
+
+        new_rows = []
+        for open_time, entry in zip(open_times, history):
+            volume = entry[2] if len(entry) > 2 else 0.0
+            if last_time is not None and open_time < last_time:
+                continue
+            new_rows.append((open_time, float(entry[1]), float(volume)))
+
+        if not new_rows:
+            return 0
+
+        keep = len(stored_times)
+        if last_time is not None and new_rows[0][0] == last_time:
+            keep -= 1
+
+        start = max(0, keep - LOOKBACK)
+        closes = np.concatenate([table["close"][start:keep], [row[1] for row in new_rows]])
+        volumes = np.concatenate([table["volume"][start:keep], [row[2] for row in new_rows]])
+        features = compute_features(closes, volumes)
+        offset = keep - start
+
+        updated = {
+            "open_time": np.concatenate([stored_times[:keep],
+                                         np.array([row[0] for row in new_rows], dtype=np.int64)]),
+            "close": np.concatenate([table["close"][:keep], closes[offset:]]),
+            "volume": np.concatenate([table["volume"][:keep], volumes[offset:]]),
+        }
+        for column in FEATURE_COLUMNS:
+            updated[column] = np.concatenate([table[column][:keep], features[column][offset:]])
+
+        self._tables[(symbol, interval)] = updated
+        if persist:
+            self.save(symbol, interval)
+        return len(new_rows)
+
+    def update_market_data(self, market_data: Dict[str, List[tuple]], interval: str = DEFAULT_INTERVAL,
+                           persist: bool = True) -> Dict[str, int]:
+        """Update the store from a {coin: history} mapping as returned by data_fetcher"""
+        return {coin: self.update(coin_symbol(coin), history, interval, persist)
+                for coin, history in market_data.items()}
+
+    def get_columns(self, symbol: str, interval: str = DEFAULT_INTERVAL,
+                    until: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Return all columns, optionally only rows with open_time <= ``until``"""
+        table = self._table(symbol, interval)
+        if until is None:
+            return dict(table)
+        end = int(np.searchsorted(table["open_time"], until, side="right"))
+        return {column: values[:end] for column, values in table.items()}
+
+    def get_row(self, symbol: str, open_time, interval: str = DEFAULT_INTERVAL) -> Optional[Dict[str, float]]:
+        """Return the feature row for one candle, or None if it is not stored"""
+        table = self._table(symbol, interval)
+        open_time = to_open_time(open_time)
+        index = int(np.searchsorted(table["open_time"], open_time))
+        if index >= len(table["open_time"]) or table["open_time"][index] != open_time:
+            return None
+        return {column: values[index].item() for column, values in table.items()}
+
+    def latest(self, symbol: str, interval: str = DEFAULT_INTERVAL) -> Optional[Dict[str, float]]:
+        """Return the most recent feature row for a symbol"""
+        table = self._table(symbol, interval)
+        if not len(table["open_time"]):
+            return None
+        return {column: values[-1].item() for column, values in table.items()}
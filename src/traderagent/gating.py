@@ -0,0 +1,158 @@
+"""
+Change-gated decision calls
+
+Most hourly cycles see nearly the same market as the previous one. The
+gate keeps, per coin, a snapshot of the inputs the last decision was made
+on - last price, volume regime and open positions - and only lets a coin
+through to the decision engine when one of them moved past a threshold
+(or after ``max_skips`` skipped cycles, so no coin goes stale). Coins that
+did not change HOLD. The state is persisted between runs like the regime
+detector's.
+
+A skipped coin HOLDs rather than repeating its previous decision: every
+decision opens or closes a position, so replaying it would trade again.
+"""
+
+import hashlib
+import json
+import math
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .config import DECISION_GATE_FILE, GATE_MAX_SKIPS, GATE_PRICE_THRESHOLD
+from .data_fetcher import get_volume_analysis
+from .engines import DecisionEngine, open_positions
+
+
+def volume_regime(history: List[tuple]) -> Optional[str]:
+    """HIGH / ELEVATED / NORMAL / LOW from the history's volumes, None without volume data"""
+    volumes = [entry[2] for entry in history if len(entry) > 2 and entry[2] > 0]
+    if len(volumes) < 2:
+        return None
+    return get_volume_analysis(volumes).split()[0]
+
+
+def positions(balance: Dict, coin: str) -> List[float]:
+    """[long amount, short amount] of a coin, rounded so float noise is not a change"""
+    return [round(amount, 8) for amount in open_positions(balance, coin)]
+
+
+def snapshot(coin: str, history: List[tuple], balance: Dict) -> Dict:
+    """The decision inputs the gate compares: price, volume regime, positions"""
+    return {
+        "time": history[-1][0] if history else None,
+        "price": float(history[-1][1]) if history else None,
+        "volume": volume_regime(history),
+        "positions": positions(balance, coin),
+    }
+
+
+def fingerprint(state: Dict, price_threshold: float = GATE_PRICE_THRESHOLD) -> str:
+    """Short hash of a snapshot with the price quantized to threshold-sized steps"""
+    price_bucket = round(math.log(state["price"]) / math.log1p(price_threshold)) if state.get("price") else None
+    quantized = [price_bucket, state.get("volume"), state.get("positions")]
+    return hashlib.sha1(json.dumps(quantized).encode()).hexdigest()[:10]
+
+
+class DecisionGate:
+    """Decides which coins need a fresh decision this cycle"""
+
+    def __init__(self, price_threshold: float = GATE_PRICE_THRESHOLD, max_skips: int = GATE_MAX_SKIPS):
+        self.price_threshold = price_threshold
+        self.max_skips = max_skips
+        self._anchors: Dict[str, Dict] = {}
+        self._skips: Dict[str, int] = {}
+        self.calls = 0
+        self.skipped = 0
+
+    def change_reason(self, coin: str, current: Dict) -> Optional[str]:
+        """Why a coin needs a new decision, or None if its inputs have not materially moved"""
+        anchor = self._anchors.get(coin)
+        if anchor is None:
+            return "no previous decision"
+        if current["positions"] != anchor["positions"]:
+            return "positions changed"
+        if current["volume"] != anchor["volume"]:
+            return f"volume {anchor['volume']} → {current['volume']}"
+        if anchor["price"] and current["price"] is not None:
+            move = current["price"] / anchor["price"] - 1
+            if abs(move) >= self.price_threshold:
+                return f"price {move:+.2%}"
+        if self._skips.get(coin, 0) >= self.max_skips:
+            return f"refresh after {self._skips[coin]} skipped cycles"
+        return None
+
+    def select(self, price_volume_histories: Dict[str, List[tuple]], balance: Dict) -> Tuple[List[str], Dict]:
+        """Return (coins to decide, {coin: snapshot}) and log the gating of every coin"""
+        snapshots = {coin: snapshot(coin, history, balance) for coin, history in price_volume_histories.items()}
+        selected = []
+        for coin, current in snapshots.items():
+            reason = self.change_reason(coin, current)
+            if reason is None:
+                anchor = self._anchors[coin]
+                move = current["price"] / anchor["price"] - 1 if anchor["price"] and current["price"] else 0.0
+                print(f"🚦 {coin}: unchanged since {anchor['time']} (price {move:+.2%}, volume {current['volume']}, "
+                      f"fp {fingerprint(current, self.price_threshold)}) - HOLD")
+            else:
+                print(f"🚦 {coin}: {reason} - deciding")
+                selected.append(coin)
+        return selected, snapshots
+
+    def commit(self, snapshots: Dict[str, Dict], decided: List[str], balance: Optional[Dict] = None) -> None:
+        """Anchor the decided coins to this cycle's inputs and count skips for the rest
+
+        Pass the ``balance`` after the decisions were executed: the decided
+        coins are anchored to the positions they left, so the next cycle
+        does not count this cycle's own trades as a change.
+        """
+        for coin, current in snapshots.items():
+            if coin in decided:
+                if balance is not None:
+                    current = dict(current, positions=positions(balance, coin))
+                self._anchors[coin] = current
+                self._skips[coin] = 0
+            else:
+                self._skips[coin] = self._skips.get(coin, 0) + 1
+        self.calls += 1 if decided else 0
+        self.skipped += len(snapshots) - len(decided)
+
+    def save(self, path: Optional[Path] = None):
+        """Persist gate state as JSON"""
+        path = Path(path) if path is not None else DECISION_GATE_FILE
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"anchors": self._anchors, "skips": self._skips}, f, indent=2)
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None, **kwargs) -> "DecisionGate":
+        """Load gate state, starting fresh if no state file exists"""
+        path = Path(path) if path is not None else DECISION_GATE_FILE
+        gate = cls(**kwargs)
+        if path.exists():
+            with open(path, "r") as f:
+                data = json.load(f)
+            gate._anchors = data.get("anchors", {})
+            gate._skips = data.get("skips", {})
+        return gate
+
+
+class GatedEngine:
+    """Wraps a decision engine so it only sees coins whose inputs changed
+
+    Unchanged coins HOLD; when no coin changed the engine is not called at
+    all. Usable anywhere an engine is (e.g. backtests, to count saved calls).
+    Coins the engine returned no decision for are asked again next cycle.
+    """
+
+    def __init__(self, engine: DecisionEngine, gate: Optional[DecisionGate] = None):
+        self.engine = engine
+        self.gate = gate if gate is not None else DecisionGate()
+
+    def __call__(self, price_volume_histories: Dict[str, List[tuple]], balance: Dict, **context) -> Dict[str, tuple]:
+        selected, snapshots = self.gate.select(price_volume_histories, balance)
+        decisions = {coin: ("HOLD", 0.0) for coin in price_volume_histories if coin not in selected}
+        if selected:
+            decisions.update(self.engine({coin: price_volume_histories[coin] for coin in selected}, balance,
+                                         **context))
+        self.gate.commit(snapshots, [coin for coin in selected if coin in decisions])
+        return decisions
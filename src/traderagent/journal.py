@@ -0,0 +1,309 @@
+"""
+Decision replay journal
+
+Every decision cycle is appended to a JSON-lines journal as one compact
+record: a hash of the inputs, the inputs themselves (histories and the
+balance without its trade history), per-coin features, every prompt and raw
+model reply, the parsed decisions, the trades they produced, a hash of the
+resulting balance and timings. A small index file maps record ids and bar
+times to byte offsets, so a period can be read without scanning the whole
+journal.
+
+``replay`` re-runs journaled cycles through the same prompt building,
+parsing and trade execution code with a client that answers from the
+journal instead of the API, and checks that prompts, decisions and the
+resulting balance come out identical.
+"""
+
+import argparse
+import copy
+import datetime
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional
+
+from .config import DECISION_JOURNAL_FILE
+
+
+def canonical_hash(value) -> str:
+    """SHA-256 of a value's canonical JSON form"""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def messages_hash(messages: List[Dict]) -> str:
+    return canonical_hash(messages)[:16]
+
+
+def strip_history(balance: Dict) -> Dict:
+    """Balance without its trade history (which only grows and never feeds a decision)"""
+    return {key: copy.deepcopy(value) for key, value in balance.items() if key != "history"}
+
+
+def coin_features(price_volume_histories: Dict[str, List[tuple]]) -> Dict[str, Dict]:
+    """Per-coin summary features of the decision inputs (as used by the surrogate model)"""
+    from .gating import volume_regime
+    from .summarizer import summarize_series
+
+    features = {}
+    for coin, history in price_volume_histories.items():
+        summary = summarize_series(history)
+        if summary is None:
+            continue
+        features[coin] = {
+            "last_price": summary["last_price"],
+            "returns": summary["returns"],
+            "range_position": summary["range_position"],
+            "volatility": summary["volatility"],
+            "indicators": summary["indicators"],
+            "volume": volume_regime(history),
+        }
+    return features
+
+
+def feature_rows(feature_store, price_volume_histories: Dict[str, List[tuple]]) -> Dict[str, Dict]:
+    """The feature store rows a decision reads (last candle per coin), for journaling"""
+    from .feature_store import coin_symbol
+
+    rows = {}
+    for coin, history in price_volume_histories.items():
+        row = feature_store.get_row(coin_symbol(coin), history[-1][0]) if history else None
+        if row is not None:
+            rows[coin_symbol(coin)] = row
+    return rows
+
+
+class RecordedFeatureStore:
+    """Read-only stand-in for FeatureStore serving journaled rows"""
+
+    def __init__(self, rows: Dict[str, Dict]):
+        self.rows = rows
+
+    def get_row(self, symbol: str, open_time, interval: str = None) -> Optional[Dict[str, float]]:
+        return self.rows.get(symbol)
+
+
+class DecisionJournal:
+    """Append-only JSON-lines journal of decision cycles with a byte-offset index"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path is not None else DECISION_JOURNAL_FILE
+        self.index_path = self.path.with_suffix(".idx.jsonl")
+        self._lock = threading.Lock()
+
+    def append(self, mode: str, price_volume_histories: Dict[str, List[tuple]], balance_before: Dict,
+               balance_after: Dict, decisions: Dict[str, tuple], exchanges: List[Dict], seconds: float,
+               **extra) -> Dict:
+        """Write one cycle and return its record
+
+        ``balance_before`` is the balance the decision saw, ``balance_after``
+        the balance once the decisions were executed.
+        """
+        before = strip_history(balance_before)
+        histories = {coin: [list(entry) for entry in history] for coin, history in price_volume_histories.items()}
+        new_trades = balance_after.get("history", [])[len(balance_before.get("history", [])):]
+        record = {
+            "recorded_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "bar_time": max((history[-1][0] for history in histories.values() if history), default=None),
+            "mode": mode,
+            "input_hash": canonical_hash({"histories": histories, "balance": before}),
+            "histories": histories,
+            "balance": before,
+            "features": coin_features(price_volume_histories),
+            "exchanges": exchanges,
+            "decisions": {coin: list(decision) for coin, decision in decisions.items()},
+            "trades": list(new_trades),
+            "state_hash": canonical_hash(strip_history(balance_after)),
+            "seconds": round(seconds, 3),
+            **extra,
+        }
+
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            ids = self._read_index()
+            record = {"id": len(ids), **record}
+            line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write(line)
+            with open(self.index_path, "a") as f:
+                f.write(json.dumps({"id": record["id"], "bar_time": record["bar_time"],
+                                    "input_hash": record["input_hash"], "offset": offset,
+                                    "length": len(line)}) + "\n")
+        return record
+
+    def _read_index(self) -> List[Dict]:
+        if not self.index_path.exists():
+            return self.rebuild_index() if self.path.exists() else []
+        with open(self.index_path) as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        # The journal can change under a local index (e.g. a pulled commit): rebuild unless it still ends there
+        indexed_size = entries[-1]["offset"] + entries[-1]["length"] if entries else 0
+        if indexed_size != (self.path.stat().st_size if self.path.exists() else 0):
+            return self.rebuild_index() if self.path.exists() else []
+        return entries
+
+    def rebuild_index(self) -> List[Dict]:
+        """Recreate the index by scanning the journal (e.g. after the index was lost)"""
+        entries = []
+        with open(self.path, "rb") as f:
+            offset = 0
+            for line in f:
+                record = json.loads(line)
+                entries.append({"id": record["id"], "bar_time": record["bar_time"],
+                                "input_hash": record["input_hash"], "offset": offset, "length": len(line)})
+                offset += len(line)
+        with open(self.index_path, "w") as f:
+            f.writelines(json.dumps(entry) + "\n" for entry in entries)
+        return entries
+
+    def index(self) -> List[Dict]:
+        with self._lock:
+            return self._read_index()
+
+    def _read_at(self, f, entry: Dict) -> Dict:
+        f.seek(entry["offset"])
+        return json.loads(f.read(entry["length"]))
+
+    def get(self, record_id: int) -> Dict:
+        """One record by id"""
+        entry = next((e for e in self.index() if e["id"] == record_id), None)
+        if entry is None:
+            raise KeyError(f"No journal record {record_id}")
+        with open(self.path, "rb") as f:
+            return self._read_at(f, entry)
+
+    def records(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict]:
+        """Records whose bar time lies in [start, end] ('YYYY-MM-DD HH:MM' strings, either optional)"""
+        entries = [e for e in self.index()
+                   if (start is None or (e["bar_time"] or "") >= start)
+                   and (end is None or (e["bar_time"] or "") <= end)]
+        if not entries:
+            return
+        with open(self.path, "rb") as f:
+            for entry in entries:
+                yield self._read_at(f, entry)
+
+    def __len__(self) -> int:
+        return len(self.index())
+
+
+class ReplayClient:
+    """OpenAI-compatible client answering from a record's journaled exchanges
+
+    Requests are matched by message hash; a request whose prompt differs
+    from every journaled one takes the next unused reply and is counted as
+    a prompt divergence.
+    """
+
+    def __init__(self, exchanges: List[Dict]):
+        self._unused = list(exchanges)
+        self.divergences = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, stream=False, **kwargs):
+        key = messages_hash(messages)
+        with self._lock:
+            self.requests += 1
+            exchange = next((e for e in self._unused if e["messages_hash"] == key), None)
+            if exchange is None:
+                if not self._unused:
+                    raise RuntimeError("Replay requested more model calls than were journaled")
+                self.divergences += 1
+                exchange = self._unused[0]
+            self._unused.remove(exchange)
+
+        content = exchange["raw"]
+        if stream:
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+def replay_record(record: Dict) -> Dict:
+    """Re-run one journaled cycle offline and compare it with what was recorded"""
+    from . import ai_decision
+    from .advanced_trader import AdvancedTrader
+    from .backtesting import execute_decisions
+    from .engines import get_engine
+    from .timeframes import build_feature_bundle
+
+    histories = {coin: [tuple(entry) for entry in history] for coin, history in record["histories"].items()}
+    balance = copy.deepcopy(record["balance"])
+    balance["history"] = []
+    replay_client = ReplayClient(record["exchanges"])
+
+    previous_client = vars(ai_decision).get("client")
+    previous_cache = ai_decision._response_cache
+    previous_async_client = ai_decision._async_client
+    ai_decision.set_client(replay_client)
+    ai_decision.set_response_cache(None)
+    ai_decision.set_async_client(None)
+    try:
+        mode = record["mode"]
+        context = dict(record.get("context", {}))
+        if context.pop("feature_bundle", False):
+            # Deterministic from the histories, so it is rebuilt rather than stored
+            context["feature_bundle"] = build_feature_bundle(histories)
+        if "feature_rows" in context:
+            context["feature_store"] = RecordedFeatureStore(context.pop("feature_rows"))
+        if mode == "stream":
+            decisions = ai_decision.stream_ai_decision(histories, balance, **context)
+        else:
+            decisions = get_engine(mode)(histories, balance, **context)
+    finally:
+        ai_decision.set_client(previous_client)
+        ai_decision.set_response_cache(previous_cache)
+        ai_decision.set_async_client(previous_async_client)
+
+    prices = {coin: history[-1][1] for coin, history in histories.items() if history}
+    execute_decisions(AdvancedTrader(paper_trading=True), balance, decisions, prices)
+
+    replayed = {coin: list(decision) for coin, decision in decisions.items()}
+    return {
+        "id": record["id"],
+        "bar_time": record["bar_time"],
+        "decisions_match": replayed == record["decisions"],
+        "state_match": canonical_hash(strip_history(balance)) == record["state_hash"],
+        "prompt_divergences": replay_client.divergences,
+        "decisions": replayed,
+    }
+
+
+def replay(journal: DecisionJournal, start: Optional[str] = None, end: Optional[str] = None) -> Dict:
+    """Replay every record in a bar-time period without calling the API"""
+    started = time.perf_counter()
+    results = [replay_record(record) for record in journal.records(start, end)]
+    return {
+        "cycles": len(results),
+        "decisions_matched": sum(r["decisions_match"] for r in results),
+        "states_matched": sum(r["state_match"] for r in results),
+        "prompt_divergences": sum(r["prompt_divergences"] for r in results),
+        "mismatched_ids": [r["id"] for r in results if not (r["decisions_match"] and r["state_match"])],
+        "elapsed_seconds": time.perf_counter() - started,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay journaled decision cycles without calling the API")
+    parser.add_argument("--journal", type=Path, default=None, help="Journal file (default: data/decision_journal.jsonl)")
+    parser.add_argument("--start", default=None, help="First bar time, e.g. '2025-10-01 00:00'")
+    parser.add_argument("--end", default=None, help="Last bar time")
+    args = parser.parse_args()
+
+    report = replay(DecisionJournal(args.journal), args.start, args.end)
+    for result in report["results"]:
+        status = "✅" if result["decisions_match"] and result["state_match"] else "❌"
+        print(f"{status} #{result['id']} {result['bar_time']}: {result['decisions']}")
+    print(f"🔁 Replayed {report['cycles']} cycles in {report['elapsed_seconds']:.2f}s: "
+          f"{report['decisions_matched']} decisions and {report['states_matched']} balances identical, "
+          f"{report['prompt_divergences']} prompt divergences")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Cached portfolio context for decision prompts
+
+Every decision prompt carries the same block: USD, realized P&L, margin
+and open positions. Per-coin and ensemble modes build many prompts per
+cycle from one balance, so the block is rendered once per balance state
+and reused. States are keyed by a fingerprint of exactly the values the
+block shows, so a trade, a stop loss or a margin change invalidates it
+however the balance was mutated (in place included).
+"""
+
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+
+class PortfolioContext:
+    """Renders the positions and margin block, once per distinct balance state"""
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._rendered: "OrderedDict[Tuple, str]" = OrderedDict()
+        self.renders = 0
+        self.hits = 0
+
+    @staticmethod
+    def fingerprint(balance: Dict) -> Tuple:
+        """The balance values the block shows; equal fingerprints render identical text"""
+        positions = tuple(
+            (coin, sides["long"]["amount"], sides["long"]["avg_price"],
+             sides["short"]["amount"], sides["short"]["avg_price"])
+            for coin, sides in balance.get("positions", {}).items()
+            if sides["long"]["amount"] > 0 or sides["short"]["amount"] > 0
+        )
+        margin = balance.get("margin")
+        return (balance.get("USD", 0), balance.get("realized_pnl", 0),
+                (margin["available"], margin["used"]) if margin is not None else None, positions)
+
+    @staticmethod
+    def render(balance: Dict) -> str:
+        """Render the balance, margin and open positions section of the decision prompt"""
+        positions_text = ""
+        for coin, sides in balance.get("positions", {}).items():
+            long_pos, short_pos = sides["long"], sides["short"]
+            if long_pos["amount"] > 0:
+                positions_text += f"\n{coin} LONG: {long_pos['amount']:.6f} @ {long_pos['avg_price']:.2f}"
+            if short_pos["amount"] > 0:
+                positions_text += f"\n{coin} SHORT: {short_pos['amount']:.6f} @ {short_pos['avg_price']:.2f}"
+
+        margin_info = ""
+        if "margin" in balance:
+            margin_info = f"\nMargin Available: ${balance['margin']['available']:.2f}, Used: ${balance['margin']['used']:.2f}"
+
+        return f"""Your current balance and holdings:
+USD: ${balance.get('USD', 0):.2f}
+Realized P&L: ${balance.get('realized_pnl', 0):.2f}{margin_info}
+
+Current Positions:{positions_text if positions_text else " None"}"""
+
+    def text(self, balance: Dict) -> str:
+        """The block for a balance, rendered only if this balance state was not seen recently"""
+        key = self.fingerprint(balance)
+        if key in self._rendered:
+            self.hits += 1
+            self._rendered.move_to_end(key)
+            return self._rendered[key]
+        text = self.render(balance)
+        self.renders += 1
+        self._rendered[key] = text
+        if len(self._rendered) > self.max_entries:
+            self._rendered.popitem(last=False)
+        return text
+
+    def invalidate(self):
+        """Forget every rendered block"""
+        self._rendered.clear()
@@ -0,0 +1,308 @@
+"""
+Offline prompt/response regression benchmark
+
+Runs a fixed corpus of market snapshots through the decision layer -
+prompt building, a model that answers locally, reply parsing - and
+measures per prompt variant:
+
+- estimated prompt tokens (mean and max),
+- prompt build time and reply parse time (best of ``repeat`` runs),
+- decision time (build + model + parse), and
+- parse-failure rate (coins without a decision in the reply).
+
+The corpus is either synthetic (seeded, so identical on every run) and
+answered by the stand-in RuleResponder, or read from the decision journal
+and answered with the replies recorded there. A report is compared with a
+stored baseline and token or parse-failure regressions past the
+tolerances fail the run, so a prompt change that bloats the prompt or
+breaks parsing is caught before it ships. Timings depend on the machine
+and its load, so they are only reported:
+
+    python -m traderagent.prompt_bench --save-baseline   # after an intended change
+    python -m traderagent.prompt_bench                   # exits 1 on a regression
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .ai_decision import _coin_prompt, build_budgeted_prompt, format_portfolio
+from .config import PROMPT_BENCH_BASELINE_FILE, PROMPT_TOKEN_BUDGET
+from .decisions import parse_reply, parse_text
+from .journal import DecisionJournal, ReplayClient
+from .prompt_budget import estimate_tokens
+from .prompts import system_preamble
+from .standin_server import RuleResponder
+
+VARIANTS = ("text", "json", "per_coin")
+
+# Journal modes and the prompt variant they used
+_JOURNAL_VARIANTS = {"llm": None, "stream": "text", "llm_per_coin": "per_coin"}
+
+SYNTHETIC_COINS = ["BTC", "SOL", "ETH", "ADA", "XRP", "DOGE", "DOT", "LINK", "AVAX", "ATOM", "LTC", "UNI"]
+
+
+def _balance(coins: Sequence[str], open_positions: bool = False) -> Dict:
+    """A paper balance holding ``coins``, with a long and a short open when ``open_positions``"""
+    positions = {coin: {side: {"amount": 0.0, "avg_price": 0.0, "stop_loss": None, "take_profit": None}
+                        for side in ("long", "short")} for coin in coins}
+    if open_positions:
+        positions[coins[0]]["long"].update(amount=0.05, avg_price=100.0)
+        positions[coins[-1]]["short"].update(amount=1.5, avg_price=20.0)
+    return {"USD": 10000.0, "coins": {coin: {"amount": 0.0, "avg_price": 0.0} for coin in coins},
+            "positions": positions, "margin": {"available": 9000.0, "used": 1000.0 if open_positions else 0.0},
+            "history": [], "realized_pnl": 0.0, "paper_trading": True}
+
+
+def _history(rng: np.random.Generator, start: float, drift: float, volatility: float, length: int = 168,
+             volume: bool = True) -> List[tuple]:
+    prices = start * np.exp(np.cumsum(rng.normal(drift, volatility, length)))
+    volumes = rng.lognormal(7.0, 0.4, length) if volume else np.zeros(length)
+    return [(f"2025-10-{1 + i // 24:02d} {i % 24:02d}:00", round(float(p), 4), round(float(v), 2))
+            for i, (p, v) in enumerate(zip(prices, volumes))]
+
+
+def synthetic_corpus(seed: int = 7) -> List[Dict]:
+    """Deterministic snapshots covering trends, volatility, missing volume, positions and many coins"""
+    rng = np.random.default_rng(seed)
+    pair = ["BTC", "SOL"]
+
+    def snapshot(name, coins, drift=0.0, volatility=0.01, open_positions=False, **history_kwargs):
+        histories = {coin: _history(rng, 10.0 * (i + 1) ** 2, drift, volatility, **history_kwargs)
+                     for i, coin in enumerate(coins)}
+        return {"name": name, "histories": histories, "balance": _balance(coins, open_positions)}
+
+    return [
+        snapshot("trend_up", pair, drift=0.002),
+        snapshot("trend_down", pair, drift=-0.002),
+        snapshot("flat", pair, volatility=0.002),
+        snapshot("volatile", pair, volatility=0.04),
+        snapshot("no_volume", pair, volume=False),
+        snapshot("short_history", pair, length=12),
+        snapshot("open_positions", pair, drift=0.001, open_positions=True),
+        snapshot("many_coins", SYNTHETIC_COINS, drift=0.0005, volatility=0.015),
+    ]
+
+
+def journal_corpus(journal: DecisionJournal, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+    """Snapshots from journaled cycles, answered with their recorded replies"""
+    corpus = []
+    for record in journal.records(start, end):
+        if record["mode"] not in _JOURNAL_VARIANTS or not record["exchanges"]:
+            continue
+        variant = _JOURNAL_VARIANTS[record["mode"]]
+        if variant is None:
+            variant = "json" if record.get("context", {}).get("structured", True) else "text"
+        corpus.append({
+            "name": f"journal#{record['id']}",
+            "histories": {coin: [tuple(entry) for entry in history] for coin, history in record["histories"].items()},
+            "balance": record["balance"],
+            "exchanges": record["exchanges"],
+            "variant": variant,
+        })
+    return corpus
+
+
+def _as_json(reply: Optional[str]) -> Optional[str]:
+    """Re-encode a text reply as schema JSON (the stand-in only writes text)"""
+    if reply is None:
+        return None
+    entries = [{"coin": d.coin, "action": d.action, "percent": round(d.percent * 100, 4),
+                "stop_loss": d.stop_loss, "take_profit": d.take_profit}
+               for d in parse_text(reply).decisions.values()]
+    return json.dumps({"decisions": entries})
+
+
+def build_prompts(snapshot: Dict, variant: str, token_budget: int = PROMPT_TOKEN_BUDGET) -> List[tuple]:
+    """(system, user) messages the decision layer sends for a snapshot in one variant"""
+    histories, balance = snapshot["histories"], snapshot["balance"]
+    if variant == "per_coin":
+        system = system_preamble(True)
+        portfolio = format_portfolio(balance)
+        return [(system, _coin_prompt(coin, histories, portfolio, system, None, None, None)) for coin in histories]
+    return [build_budgeted_prompt(histories, balance, structured=variant == "json", token_budget=token_budget)]
+
+
+def _best_of(repeat: int, call: Callable):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = call()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_case(snapshot: Dict, variant: str, responder: Callable = None, token_budget: int = PROMPT_TOKEN_BUDGET,
+             repeat: int = 5) -> Dict:
+    """Build, answer and parse one snapshot in one variant"""
+    build_seconds, prompts = _best_of(repeat, lambda: build_prompts(snapshot, variant, token_budget))
+
+    replay = ReplayClient(snapshot["exchanges"]) if "exchanges" in snapshot else None
+    responder = responder or RuleResponder()
+    replies = []
+    started = time.perf_counter()
+    for system, user in prompts:
+        messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
+        if replay is not None:
+            try:
+                reply = replay.create("gpt-4o", messages).choices[0].message.content
+            except RuntimeError:  # Fewer recorded replies than prompts
+                reply = None
+        else:
+            reply = responder("gpt-4o", messages)
+            reply = _as_json(reply) if variant != "text" else reply
+        replies.append(reply or "")
+    model_seconds = time.perf_counter() - started
+
+    parse_seconds, parsed = _best_of(repeat, lambda: [parse_reply(reply) for reply in replies])
+    decided = set()
+    for result in parsed:
+        decided.update(result.decisions)
+    coins = [coin.upper() for coin in snapshot["histories"]]
+    failed = [coin for coin in coins if coin not in decided]
+
+    return {
+        "snapshot": snapshot["name"],
+        "variant": variant,
+        "prompts": len(prompts),
+        "prompt_tokens": sum(estimate_tokens(system + "\n" + user) for system, user in prompts),
+        "build_ms": build_seconds * 1000,
+        "model_ms": model_seconds * 1000,
+        "parse_ms": parse_seconds * 1000,
+        "coins": len(coins),
+        "failed": failed,
+        "prompt_divergences": replay.divergences if replay is not None else 0,
+    }
+
+
+def summarize(cases: List[Dict]) -> Dict:
+    """Aggregate metrics over the cases of one variant"""
+    coins = sum(case["coins"] for case in cases)
+    return {
+        "cases": len(cases),
+        "prompt_tokens_mean": statistics.fmean(case["prompt_tokens"] for case in cases),
+        "prompt_tokens_max": max(case["prompt_tokens"] for case in cases),
+        "build_ms_mean": statistics.fmean(case["build_ms"] for case in cases),
+        "parse_ms_mean": statistics.fmean(case["parse_ms"] for case in cases),
+        "decision_ms_mean": statistics.fmean(case["build_ms"] + case["model_ms"] + case["parse_ms"] for case in cases),
+        "parse_failure_rate": sum(len(case["failed"]) for case in cases) / coins if coins else 0.0,
+        "prompt_divergences": sum(case["prompt_divergences"] for case in cases),
+    }
+
+
+def run_benchmark(corpus: List[Dict], variants: Sequence[str] = VARIANTS, responder: Callable = None,
+                  token_budget: int = PROMPT_TOKEN_BUDGET, repeat: int = 5) -> Dict:
+    """Run every snapshot in every variant (journaled snapshots only in the variant they were recorded in)"""
+    cases = []
+    for snapshot in corpus:
+        for variant in variants:
+            if snapshot.get("variant", variant) == variant:
+                cases.append(run_case(snapshot, variant, responder, token_budget, repeat))
+    summary = {variant: summarize([case for case in cases if case["variant"] == variant])
+               for variant in variants if any(case["variant"] == variant for case in cases)}
+    return {"token_budget": token_budget, "cases": cases, "summary": summary}
+
+
+def compare(report: Dict, baseline: Dict, token_tolerance: float = 0.05, failure_tolerance: float = 0.0) -> List[str]:
+    """Regressions of a report against a baseline
+
+    Tokens may grow by ``token_tolerance`` (relative) and the parse-failure
+    rate by ``failure_tolerance`` (absolute).
+    """
+    regressions = []
+    for variant, current in report["summary"].items():
+        previous = baseline.get("summary", {}).get(variant)
+        if previous is None:
+            continue
+        for key in ("prompt_tokens_mean", "prompt_tokens_max"):
+            if current[key] > previous[key] * (1 + token_tolerance):
+                regressions.append(f"{variant}: {key} {previous[key]:.0f} → {current[key]:.0f}")
+        if current["parse_failure_rate"] > previous["parse_failure_rate"] + failure_tolerance:
+            regressions.append(f"{variant}: parse failures {previous['parse_failure_rate']:.1%} → "
+                               f"{current['parse_failure_rate']:.1%}")
+    return regressions
+
+
+def slowdowns(report: Dict, baseline: Dict, time_tolerance: float = 1.0, min_ms: float = 1.0) -> List[str]:
+    """Timings more than ``time_tolerance`` (relative) and ``min_ms`` slower than the baseline
+
+    Informational only: sub-millisecond timings are mostly scheduler noise.
+    """
+    slower = []
+    for variant, current in report["summary"].items():
+        previous = baseline.get("summary", {}).get(variant)
+        if previous is None:
+            continue
+        for key in ("build_ms_mean", "parse_ms_mean"):
+            if current[key] > previous[key] * (1 + time_tolerance) and current[key] - previous[key] >= min_ms:
+                slower.append(f"{variant}: {key} {previous[key]:.2f} → {current[key]:.2f}")
+    return slower
+
+
+def save_baseline(report: Dict, path: Optional[Path] = None):
+    """Store a report's summary as the baseline"""
+    path = Path(path) if path is not None else PROMPT_BENCH_BASELINE_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"token_budget": report["token_budget"], "summary": report["summary"]}, f, indent=2)
+
+
+def load_baseline(path: Optional[Path] = None) -> Optional[Dict]:
+    path = Path(path) if path is not None else PROMPT_BENCH_BASELINE_FILE
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prompt building and reply parsing against a baseline")
+    parser.add_argument("--journal", type=Path, default=None,
+                        help="Use journaled cycles and their recorded replies instead of the synthetic corpus")
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument("--budget", type=int, default=PROMPT_TOKEN_BUDGET, help="Prompt token budget")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs per case (best is kept)")
+    parser.add_argument("--baseline", type=Path, default=None, help="Baseline file (default: data/prompt_bench_baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    args = parser.parse_args()
+
+    corpus = journal_corpus(DecisionJournal(args.journal)) if args.journal else synthetic_corpus()
+    report = run_benchmark(corpus, args.variants, token_budget=args.budget, repeat=args.repeat)
+
+    for case in report["cases"]:
+        status = "✅" if not case["failed"] else f"❌ no decision for {', '.join(case['failed'])}"
+        print(f"{case['snapshot']:16s} {case['variant']:9s} {case['prompt_tokens']:6d} tokens | "
+              f"build {case['build_ms']:6.2f}ms | parse {case['parse_ms']:6.3f}ms | {status}")
+    for variant, stats in report["summary"].items():
+        print(f"📏 {variant}: {stats['prompt_tokens_mean']:.0f} tokens (max {stats['prompt_tokens_max']}) | "
+              f"build {stats['build_ms_mean']:.2f}ms | parse {stats['parse_ms_mean']:.3f}ms | "
+              f"decision {stats['decision_ms_mean']:.2f}ms | failures {stats['parse_failure_rate']:.1%}")
+
+    if args.save_baseline:
+        save_baseline(report, args.baseline)
+        print("💾 Baseline saved")
+        return
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print("ℹ️ No baseline yet - store one with --save-baseline")
+        return
+    for slowdown in slowdowns(report, baseline):
+        print(f"🐢 Slower than the baseline (not a failure): {slowdown}")
+    regressions = compare(report, baseline)
+    if regressions:
+        print("🚨 Regressions against the baseline:")
+        for regression in regressions:
+            print(f"  • {regression}")
+        sys.exit(1)
+    print("✅ No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Token-budgeted decision prompts
+
+A prompt grows with every coin added to the watch list. Each coin's market
+block can be rendered at several detail levels, and ``fit_to_budget``
+starts every coin at full detail and steps the largest blocks down one
+level at a time until the whole prompt (system preamble, market data and
+portfolio) fits the token budget. Tokens are estimated locally, so fitting
+costs no API call, and prompt size - and with it latency - stays bounded
+however many symbols are traded.
+"""
+
+import math
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# What each coin block keeps, from most to least detailed
+DETAIL_LEVELS = (
+    "full",           # Summary, volume analysis and recent volumes, volume profile, other timeframes
+    "no_timeframes",  # Without other timeframes and the recent volume list
+    "compact",        # Without the volume profile, sparkline downsampled to half the points
+    "minimal",        # Price header, last price and returns, volume regime
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Conservative local token count
+
+    About four ASCII characters per token; every other character (e.g. the
+    sparkline blocks, which tokenizers split byte-wise) counts as a token.
+    """
+    non_ascii = sum(1 for char in text if ord(char) > 127)
+    return max(1, math.ceil((len(text) - non_ascii) / 4) + non_ascii)
+
+
+def fit_to_budget(coins: Sequence[str], render_block: Callable[[str, int], str],
+                  assemble: Callable[[List[str]], str], budget: int) -> Tuple[Dict[str, int], List[str]]:
+    """Pick a detail level per coin so the assembled prompt fits ``budget`` tokens
+
+    ``render_block(coin, level)`` renders one coin's market block and
+    ``assemble(blocks)`` the full prompt around them (in ``coins`` order).
+    Returns ({coin: level}, blocks). When even the minimal blocks do not
+    fit, a warning is printed and the minimal prompt is returned anyway: an
+    over-budget prompt is better than no decision.
+    """
+    levels = {coin: 0 for coin in coins}
+    rendered: Dict[Tuple[str, int], str] = {}
+
+    def block(coin: str) -> str:
+        key = (coin, levels[coin])
+        if key not in rendered:
+            rendered[key] = render_block(coin, levels[coin])
+        return rendered[key]
+
+    while True:
+        blocks = [block(coin) for coin in coins]
+        tokens = estimate_tokens(assemble(blocks))
+        if tokens <= budget:
+            return levels, blocks
+        reducible = [coin for coin in coins if levels[coin] < len(DETAIL_LEVELS) - 1]
+        if not reducible:
+            print(f"⚠️ Prompt for {len(coins)} coins needs {tokens} tokens at minimal detail, "
+                  f"over the {budget} token budget - sending it anyway")
+            return levels, blocks
+        # Shrink the largest block first: it frees the most tokens per lost detail
+        largest = max(reducible, key=lambda coin: estimate_tokens(block(coin)))
+        levels[largest] += 1
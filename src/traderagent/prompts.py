@@ -0,0 +1,113 @@
+"""
+Decision prompt templates laid out for provider prefix caching
+
+Providers cache the longest prompt prefix shared between requests, so
+everything that never changes - role, rules, guidelines, action grammar,
+examples and reply format - lives in a system preamble that is byte-for-
+byte identical on every call. Market data and positions follow in the user
+message. The preambles are rendered once at import; the user message is a
+precompiled ``string.Template``.
+"""
+
+from string import Template
+from typing import Sequence
+
+_RULES = """You are an advanced crypto trading AI with access to short selling and risk management tools.
+IMPORTANT: You cannot use leverage - all positions are 1:1 (no amplification).
+
+For each coin in the market data, recommend an action.
+
+TRADING GUIDELINES:
+- Consider volume analysis when making decisions:
+  * HIGH volume = Strong conviction moves, good for trend following
+  * ELEVATED volume = Moderate conviction, suitable for smaller positions
+  * NORMAL volume = Standard market activity, use regular position sizing
+  * LOW volume = Weak conviction, consider smaller positions or waiting
+- Volume spikes often precede significant price movements
+- Low volume in trending markets may indicate weakening momentum
+
+Available Actions:
+- BUY_LONG [percent] [stop_loss] [take_profit] - Open long position (no leverage)
+- SELL_SHORT [percent] [stop_loss] [take_profit] - Open short position (no leverage)
+- CLOSE_LONG [percent] - Close long position (partial or full)
+- CLOSE_SHORT [percent] - Close short position (partial or full)
+- BUY [percent] - Simple spot buy (legacy)
+- SELL [percent] - Simple spot sell (legacy)
+- HOLD - Do nothing"""
+
+_TEXT_EXAMPLES = """Examples:
+BTC: BUY_LONG 50% 58000 70000
+SOL: SELL_SHORT 25% 180 120
+ETH: CLOSE_LONG 100%"""
+
+_TEXT_REPLY_FORMAT = f"""{_TEXT_EXAMPLES}
+
+The reply should adhere strictly to the following format, one line per coin in the market data:
+COIN: [ACTION] [parameters]"""
+
+# Backtest batches: several bar snapshots per request, one decision set each
+_BATCH_REPLY_FORMAT = """The market data holds independent snapshots, each headed by an id such as [S1], in no particular order.
+Judge each snapshot ONLY from its own data - do not compare snapshots or infer one from another.
+
+For every snapshot, reply with its id on its own line followed by one line per coin in the market data:
+[S1]
+COIN: [ACTION] [parameters]"""
+
+_JSON_REPLY_FORMAT = """Reply with JSON only, one entry per coin:
+{"decisions": [{"coin": "BTC", "action": "BUY_LONG", "percent": 50, "stop_loss": 58000, "take_profit": 70000},
+               {"coin": "SOL", "action": "HOLD", "percent": 0, "stop_loss": null, "take_profit": null}]}"""
+
+_CLOSING = "Set stop losses and take profits to manage risk. No leverage is available."
+
+SYSTEM_PREAMBLES = {
+    False: f"{_RULES}\n\n{_TEXT_REPLY_FORMAT}\n\n{_CLOSING}",
+    True: f"{_RULES}\n\n{_JSON_REPLY_FORMAT}\n\n{_CLOSING}",
+}
+
+BATCH_SYSTEM_PREAMBLE = f"{_RULES}\n\n{_TEXT_EXAMPLES}\n\n{_BATCH_REPLY_FORMAT}\n\n{_CLOSING}"
+
+USER_TEMPLATE = Template("""Here are the market analysis data for each coin:
+$market_text
+
+$portfolio
+
+For each coin$coin_list, what is your recommended action?""")
+
+# Per-coin fan-out: the shared portfolio goes first so the concurrent calls
+# of one cycle also share it as a cached prefix
+COIN_USER_TEMPLATE = Template("""$portfolio
+
+Here are the market analysis data for $coin:
+$market_text
+
+What is your recommended action for $coin? Reply for $coin only.""")
+
+
+BATCH_USER_TEMPLATE = Template("""Here are $count independent market snapshots:
+$snapshots
+
+$portfolio
+
+For each snapshot and each coin ($coin_list), what is your recommended action?""")
+
+
+def system_preamble(structured: bool = False) -> str:
+    """The static system message for text or structured (JSON) replies"""
+    return SYSTEM_PREAMBLES[bool(structured)]
+
+
+def render_user_prompt(market_text: str, portfolio: str, coins: Sequence[str] = ()) -> str:
+    """The per-call user message: market data first, then the portfolio (and the coins to decide)"""
+    coin_list = f" ({', '.join(coins)})" if coins else ""
+    return USER_TEMPLATE.substitute(market_text=market_text, portfolio=portfolio, coin_list=coin_list)
+
+
+def render_coin_prompt(coin: str, market_text: str, portfolio: str) -> str:
+    """The user message for a single-coin decision request"""
+    return COIN_USER_TEMPLATE.substitute(coin=coin, market_text=market_text, portfolio=portfolio)
+
+
+def render_batch_prompt(snapshots: Sequence[str], portfolio: str, coins: Sequence[str]) -> str:
+    """The user message for a batch of id-headed bar snapshots (see batching)"""
+    return BATCH_USER_TEMPLATE.substitute(count=len(snapshots), snapshots="\n\n".join(snapshots),
+                                          portfolio=portfolio, coin_list=", ".join(coins))
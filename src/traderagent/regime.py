@@ -0,0 +1,248 @@
+"""
+Market regime detection for TraderAgent
+
+Classifies each coin as trending, ranging or high-volatility from rolling
+return statistics. Each candle is an O(1) update (running sums over a
+fixed window plus an exponentially weighted volatility baseline), and the
+state is persisted between runs so the hourly job can tell whether the
+regime actually changed since the last cycle.
+"""
+
+import json
+import math
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from .config import REGIME_STATE_FILE
+from .feature_store import to_open_time
+
+TREND_UP = "TREND_UP"
+TREND_DOWN = "TREND_DOWN"
+RANGE = "RANGE"
+HIGH_VOL = "HIGH_VOL"
+UNKNOWN = "UNKNOWN"
+
+
+class RegimeChange(NamedTuple):
+    """A confirmed switch from one regime to another"""
+    coin: str
+    previous: str
+    current: str
+    price: float
+
+
+class _CoinState:
+    """Rolling statistics for one coin"""
+
+    # Fields restored as they were when the last candle is undone
+    _SCALARS = ("baseline_var", "last_price", "last_open_time", "regime", "candidate", "candidate_count")
+
+    def __init__(self, window: int):
+        self.returns = deque(maxlen=window)
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self.baseline_var = None
+        self.last_price = None
+        self.last_open_time = None
+        self.regime = UNKNOWN
+        self.candidate = UNKNOWN
+        self.candidate_count = 0
+        # What the last candle changed (scalars before it, return added and dropped),
+        # so a still-forming candle can be replaced
+        self.previous = None
+
+    def checkpoint(self):
+        """Remember the state before a candle is applied"""
+        self.previous = {key: getattr(self, key) for key in self._SCALARS}
+        self.previous.update(added=None, dropped=None)
+
+    def push(self, ret: float):
+        """Add a return to the window (after ``checkpoint``), dropping the oldest one when it is full"""
+        dropped = None
+        if len(self.returns) == self.returns.maxlen:
+            dropped = self.returns[0]
+            self.sum -= dropped
+            self.sum_sq -= dropped * dropped
+        self.returns.append(ret)
+        self.sum += ret
+        self.sum_sq += ret * ret
+        self.previous.update(added=ret, dropped=dropped)
+
+    def undo(self):
+        """Revert the last candle from its checkpoint"""
+        previous, self.previous = self.previous, None
+        if previous["added"] is not None:
+            self.returns.pop()
+            self.sum -= previous["added"]
+            self.sum_sq -= previous["added"] * previous["added"]
+        if previous["dropped"] is not None:
+            self.returns.appendleft(previous["dropped"])
+            self.sum += previous["dropped"]
+            self.sum_sq += previous["dropped"] * previous["dropped"]
+        for key in self._SCALARS:
+            setattr(self, key, previous[key])
+
+    def to_dict(self) -> Dict:
+        return {
+            "returns": list(self.returns),
+            "baseline_var": self.baseline_var,
+            "last_price": self.last_price,
+            "last_open_time": self.last_open_time,
+            "regime": self.regime,
+            "candidate": self.candidate,
+            "candidate_count": self.candidate_count,
+            "previous": self.previous,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, window: int) -> "_CoinState":
+        state = cls(window)
+        for value in data.get("returns", [])[-window:]:
+            state.returns.append(value)
+            state.sum += value
+            state.sum_sq += value * value
+        state.baseline_var = data.get("baseline_var")
+        state.last_price = data.get("last_price")
+        state.last_open_time = data.get("last_open_time")
+        state.regime = data.get("regime", UNKNOWN)
+        state.candidate = data.get("candidate", UNKNOWN)
+        state.candidate_count = data.get("candidate_count", 0)
+        state.previous = data.get("previous")
+        return state
+
+
+class RegimeDetector:
+    """Per-coin regime classifier with O(1) updates and persisted state"""
+
+    def __init__(self, window: int = 24, baseline_alpha: float = 0.02, trend_threshold: float = 2.0,
+                 high_vol_ratio: float = 1.5, confirm_bars: int = 2):
+        self.window = window
+        self.baseline_alpha = baseline_alpha
+        self.trend_threshold = trend_threshold
+        self.high_vol_ratio = high_vol_ratio
+        self.confirm_bars = confirm_bars
+        self._states: Dict[str, _CoinState] = {}
+
+    def _state(self, coin: str) -> _CoinState:
+        if coin not in self._states:
+            self._states[coin] = _CoinState(self.window)
+        return self._states[coin]
+
+    def _classify(self, state: _CoinState) -> str:
+        n = len(state.returns)
+        if n < self.window:
+            return UNKNOWN
+
+        mean = state.sum / n
+        var = max(state.sum_sq / n - mean * mean, 0.0)
+        std = math.sqrt(var)
+
+        if state.baseline_var and std > self.high_vol_ratio * math.sqrt(state.baseline_var):
+            return HIGH_VOL
+
+        # t-statistic of the mean return decides trend vs range
+        if std > 0:
+            t_stat = mean / (std / math.sqrt(n))
+        else:
+            t_stat = math.copysign(math.inf, mean) if mean else 0.0
+        if t_stat > self.trend_threshold:
+            return TREND_UP
+        if t_stat < -self.trend_threshold:
+            return TREND_DOWN
+        return RANGE
+
+    def update(self, coin: str, price: float) -> Optional[RegimeChange]:
+        """Feed one closing price; returns a RegimeChange when the regime switches"""
+        state = self._state(coin)
+        state.checkpoint()
+        if state.last_price is None or state.last_price <= 0 or price <= 0:
+            state.last_price = price
+            return None
+
+        ret = math.log(price / state.last_price)
+        state.last_price = price
+        state.push(ret)
+
+        sq = ret * ret
+        if state.baseline_var is None:
+            state.baseline_var = sq
+        else:
+            state.baseline_var += self.baseline_alpha * (sq - state.baseline_var)
+
+        # A new regime has to hold for confirm_bars candles before it counts
+        regime = self._classify(state)
+        if regime == state.regime:
+            state.candidate, state.candidate_count = regime, 0
+            return None
+        if regime == state.candidate:
+            state.candidate_count += 1
+        else:
+            state.candidate, state.candidate_count = regime, 1
+        if state.candidate_count < self.confirm_bars:
+            return None
+
+        change = RegimeChange(coin, state.regime, regime, price)
+        state.regime = regime
+        state.candidate_count = 0
+        return change
+
+    def update_history(self, coin: str, history: List[tuple]) -> List[RegimeChange]:
+        """Feed candles not seen in earlier runs from a (timestamp, price, ...) history
+
+        A candle with the same open time as the last one fed replaces it,
+        since the latest kline from the exchange is still forming.
+        """
+        state = self._state(coin)
+        changes = []
+        for entry in history:
+            open_time = to_open_time(entry[0])
+            reported = None
+            if state.last_open_time is not None:
+                if open_time < state.last_open_time:
+                    continue
+                if open_time == state.last_open_time:
+                    if state.previous is None:
+                        continue
+                    reported = state.regime
+                    state.undo()
+            change = self.update(coin, entry[1])
+            state.last_open_time = open_time
+            if change and change.current != reported:
+                changes.append(change)
+        return changes
+
+    def update_market_data(self, market_data: Dict[str, List[tuple]]) -> List[RegimeChange]:
+        """Update every coin from a {coin: history} mapping"""
+        changes = []
+        for coin, history in market_data.items():
+            changes.extend(self.update_history(coin, history))
+        return changes
+
+    def regime(self, coin: str) -> str:
+        """Current confirmed regime for a coin"""
+        return self._states[coin].regime if coin in self._states else UNKNOWN
+
+    def regimes(self) -> Dict[str, str]:
+        """Current confirmed regime for every tracked coin"""
+        return {coin: state.regime for coin, state in self._states.items()}
+
+    def save(self, path: Optional[Path] = None):
+        """Persist detector state as JSON"""
+        path = Path(path) if path is not None else REGIME_STATE_FILE
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"window": self.window,
+                       "coins": {coin: state.to_dict() for coin, state in self._states.items()}}, f, indent=2)
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None, **kwargs) -> "RegimeDetector":
+        """Load detector state, starting fresh if no state file exists"""
+        path = Path(path) if path is not None else REGIME_STATE_FILE
+        detector = cls(**kwargs)
+        if path.exists():
+            with open(path, "r") as f:
+                data = json.load(f)
+            for coin, state in data.get("coins", {}).items():
+                detector._states[coin] = _CoinState.from_dict(state, detector.window)
+        return detector
@@ -0,0 +1,111 @@
+"""
+Content-addressed cache of LLM responses
+
+Responses are stored in a small SQLite file keyed by a SHA-256 hash of the
+request (model, messages and parameters). Replaying the same history, as a
+re-run backtest does, is then answered locally in milliseconds and gives
+the same decisions every time. The cache is LRU-bounded and entries can
+optionally expire after a TTL.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .config import LLM_CACHE_FILE, LLM_CACHE_MAX_ENTRIES
+
+
+class CacheMiss(KeyError):
+    """Raised by a replay-only cache when a request was never recorded"""
+
+
+class ResponseCache:
+    """Disk-backed, LRU-bounded LLM response cache"""
+
+    def __init__(self, path: Optional[Path] = None, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 ttl_seconds: Optional[float] = None, replay_only: bool = False):
+        self.path = Path(path) if path is not None else LLM_CACHE_FILE
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.replay_only = replay_only
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, content TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection, commit on success and always close it"""
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict], params: Optional[Dict] = None) -> str:
+        """Hash a request into a cache key; identical requests share a key"""
+        payload = json.dumps({"model": model, "messages": messages, "params": params or {}},
+                             sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached content for a key, or None on a miss
+
+        A replay-only cache raises CacheMiss instead of returning None, so a
+        missing recording can never fall through to a paid API call.
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+
+        if row is None:
+            self.misses += 1
+            if self.replay_only:
+                raise CacheMiss(key)
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, content: str, model: Optional[str] = None):
+        """Store a response and evict the least recently used entries over the limit"""
+        if self.replay_only:
+            return
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO responses (key, model, content, created, accessed) "
+                         "VALUES (?, ?, ?, ?, ?)", (key, model, content, now, now))
+            conn.execute("DELETE FROM responses WHERE key IN ("
+                         "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                         (self.max_entries,))
+
+    def __len__(self) -> int:
+        with self._lock, self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters for this process"""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
@@ -0,0 +1,386 @@
+"""
+Local OpenAI-compatible stand-in server
+
+Serves ``POST /v1/chat/completions`` on localhost with replies that are
+scripted, derived from simple rules on the prompt, or replayed from a
+ResponseCache. Latency and errors can be injected, so the full decision
+pipeline - real HTTP, the real openai client, retries and timeouts - can
+be exercised and load-tested offline without paying for API calls.
+
+    with StandInServer(RuleResponder(), latency=0.2) as server:
+        set_client(server.client())
+        decisions = get_ai_decision_with_volume(market_data, balance)
+
+Also runnable on its own:
+``python -m traderagent.standin_server --mode rule --port 8000`` and then
+``OPENAI_BASE_URL=http://127.0.0.1:8000/v1 python main.py --paper``.
+"""
+
+import argparse
+import json
+import random
+import re
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .response_cache import ResponseCache
+from .prompt_budget import estimate_tokens
+
+# Replies are built from the model, the messages and the request parameters that key
+# the response cache (see request_params); a responder returns None when it has no answer
+Responder = Callable[[str, List[Dict], Optional[Dict]], Optional[str]]
+
+_TREND_HEADER = re.compile(r"^(\w+) price trend \(", re.MULTILINE)
+_LAST_LINE = re.compile(r"^Last \$([\d,.]+) \| Returns (.+)$", re.MULTILINE)
+_RETURN = re.compile(r"(\w+) ([+-]\d+\.\d+)%")
+
+
+def _prompt_text(messages: List[Dict]) -> str:
+    return "\n".join(str(message.get("content", "")) for message in messages)
+
+
+def request_params(body: Dict) -> Optional[Dict]:
+    """The parameters of a request body that request_completion puts in its cache key"""
+    if body.get("stream"):
+        return {"stream": True}
+    params = {"response_format": body["response_format"]} if body.get("response_format") else {}
+    if body.get("temperature") is not None:
+        params["temperature"] = body["temperature"]
+    return params or None
+
+
+class ScriptedResponder:
+    """Return a fixed list of replies in order, cycling when exhausted"""
+
+    def __init__(self, replies: Sequence[str]):
+        if not replies:
+            raise ValueError("ScriptedResponder needs at least one reply")
+        self.replies = list(replies)
+        self._index = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, model: str, messages: List[Dict], params: Optional[Dict] = None) -> Optional[str]:
+        with self._lock:
+            reply = self.replies[self._index % len(self.replies)]
+            self._index += 1
+        return reply
+
+
+class RuleResponder:
+    """Derive decisions from the per-coin summaries in the prompt
+
+    Reads each "{COIN} price trend" block and follows the return over the
+    longest horizon shown: long above ``threshold``, short below minus
+    ``threshold``, HOLD otherwise. Deterministic for a given prompt.
+    """
+
+    def __init__(self, threshold: float = 0.01, percent: float = 0.25,
+                 stop_loss_pct: float = 0.03, take_profit_pct: float = 0.06):
+        self.threshold = threshold
+        self.percent = percent
+        self.stop_loss_pct = stop_loss_pct
+        self.take_profit_pct = take_profit_pct
+
+    def decide(self, last_price: float, change: float) -> str:
+        if change > self.threshold:
+            return (f"BUY_LONG {self.percent:.0%} "
+                    f"{last_price * (1 - self.stop_loss_pct):.2f} {last_price * (1 + self.take_profit_pct):.2f}")
+        if change < -self.threshold:
+            return (f"SELL_SHORT {self.percent:.0%} "
+                    f"{last_price * (1 + self.stop_loss_pct):.2f} {last_price * (1 - self.take_profit_pct):.2f}")
+        return "HOLD"
+
+    def __call__(self, model: str, messages: List[Dict], params: Optional[Dict] = None) -> Optional[str]:
+        prompt = _prompt_text(messages)
+        headers = list(_TREND_HEADER.finditer(prompt))
+        lines = []
+        for index, header in enumerate(headers):
+            end = headers[index + 1].start() if index + 1 < len(headers) else len(prompt)
+            match = _LAST_LINE.search(prompt, header.end(), end)
+            if not match:
+                continue
+            returns = _RETURN.findall(match.group(2))
+            change = float(returns[-1][1]) / 100 if returns else 0.0
+            lines.append(f"{header.group(1)}: {self.decide(float(match.group(1).replace(',', '')), change)}")
+        return "\n".join(lines) if lines else None
+
+
+class ReplayResponder:
+    """Answer from recorded responses in a ResponseCache (same key as request_completion)"""
+
+    def __init__(self, cache: ResponseCache, fallback: Optional[Responder] = None):
+        self.cache = cache
+        self.fallback = fallback
+
+    def __call__(self, model: str, messages: List[Dict], params: Optional[Dict] = None) -> Optional[str]:
+        reply = self.cache.get(ResponseCache.make_key(model, messages, params))
+        if reply is None and self.fallback is not None:
+            reply = self.fallback(model, messages, params)
+        return reply
+
+
+class StandInServer:
+    """Threaded chat-completions server with latency and error injection
+
+    ``latency`` seconds (plus up to ``jitter`` more) are slept before every
+    reply. A fraction ``error_rate`` of requests fail with ``error_status``;
+    429 replies carry a ``Retry-After`` header. ``seed`` makes the injected
+    jitter and errors reproducible. Requests with ``stream: true`` get the
+    reply as server-sent events, one line per chunk, ``stream_delay``
+    seconds apart.
+    """
+
+    def __init__(self, responder: Responder, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 500, retry_after: float = 1.0, seed: Optional[int] = None,
+                 stream_delay: float = 0.0):
+        self.responder = responder
+        self.stream_delay = stream_delay
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.requests = 0
+        self.errors = 0
+        self.prompts: List[List[Dict]] = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def client(self, **kwargs):
+        """An openai.OpenAI client pointed at this server"""
+        import openai
+        return openai.OpenAI(base_url=self.base_url, api_key="stand-in", **kwargs)
+
+    def async_client(self, **kwargs):
+        """An openai.AsyncOpenAI client pointed at this server"""
+        import openai
+        return openai.AsyncOpenAI(base_url=self.base_url, api_key="stand-in", **kwargs)
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "errors": self.errors}
+
+    def _plan(self):
+        """Decide delay and failure for one request (under the lock, so seeded runs repeat)"""
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.error_rate > 0 and self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        return delay, fail
+
+    def _complete(self, body: Dict):
+        """Return (status, payload, headers) for a chat completion request"""
+        model = body.get("model", "stand-in")
+        messages = body.get("messages", [])
+        with self._lock:
+            self.prompts.append(messages)
+
+        reply = self.responder(model, messages, request_params(body))
+        if reply is None:
+            return 404, {"error": {"message": "No stand-in reply for this request", "type": "not_found"}}, {}
+
+        prompt_tokens = estimate_tokens(_prompt_text(messages))
+        completion_tokens = estimate_tokens(reply)
+        return 200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }, {}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive like the real API, so clients reuse pooled connections
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass  # Keep test and benchmark output quiet
+
+            def _send(self, status, payload, headers):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send(400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}}, {})
+                    return
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}", "type": "not_found"}}, {})
+                    return
+
+                delay, fail = server._plan()
+                if delay:
+                    time.sleep(delay)
+                if fail:
+                    headers = {"Retry-After": str(server.retry_after)} if server.error_status == 429 else {}
+                    self._send(server.error_status,
+                               {"error": {"message": "Injected stand-in error", "type": "server_error"}}, headers)
+                    return
+                status, payload, headers = server._complete(body)
+                if status == 200 and body.get("stream"):
+                    self._stream(payload)
+                else:
+                    self._send(status, payload, headers)
+
+            def _stream(self, payload):
+                """Send a completion as chat.completion.chunk events, one line per chunk"""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")  # No length: the stream ends when the connection does
+                self.close_connection = True
+                self.end_headers()
+                content = payload["choices"][0]["message"]["content"]
+                pieces = content.splitlines(keepends=True) or [""]
+                for index, piece in enumerate(pieces):
+                    if index and server.stream_delay:
+                        time.sleep(server.stream_delay)
+                    delta = {"content": piece}
+                    if index == 0:
+                        delta["role"] = "assistant"
+                    self._event({"id": payload["id"], "object": "chat.completion.chunk",
+                                 "created": payload["created"], "model": payload["model"],
+                                 "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+                self._event({"id": payload["id"], "object": "chat.completion.chunk",
+                             "created": payload["created"], "model": payload["model"],
+                             "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def _event(self, data):
+                self.wfile.write(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+        return Handler
+
+
+def measure_throughput(call: Callable[[], object], requests: int = 50, concurrency: int = 4) -> Dict[str, float]:
+    """Run ``call`` ``requests`` times on ``concurrency`` threads and report latency/throughput
+
+    Failed calls are counted, not raised, so error injection can be measured.
+    """
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+
+    def timed():
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            call()
+        except Exception:
+            with lock:
+                failures += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(requests):
+            pool.submit(timed)
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "requests": requests,
+        "failures": failures,
+        "elapsed_seconds": elapsed,
+        "throughput_per_second": requests / elapsed if elapsed > 0 else 0.0,
+        "latency_mean": statistics.fmean(ordered) if ordered else 0.0,
+        "latency_p50": ordered[len(ordered) // 2] if ordered else 0.0,
+        "latency_p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0,
+    }
+
+
+def build_responder(mode: str, replies: Optional[Sequence[str]] = None) -> Responder:
+    """Create a responder by mode name: "scripted", "rule" or "replay" (falls back to rules)"""
+    if mode == "scripted":
+        return ScriptedResponder(replies or ["HOLD"])
+    if mode == "rule":
+        return RuleResponder()
+    if mode == "replay":
+        return ReplayResponder(ResponseCache(), fallback=RuleResponder())
+    raise ValueError(f"Unknown stand-in mode '{mode}'. Choose from: scripted, rule, replay")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in server")
+    parser.add_argument("--mode", choices=["scripted", "rule", "replay"], default="rule")
+    parser.add_argument("--reply", action="append", help="Scripted reply (repeatable)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each reply")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, up to N seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status for injected errors")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = StandInServer(build_responder(args.mode, args.reply), host=args.host, port=args.port,
+                           latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                           error_status=args.error_status, seed=args.seed)
+    print(f"🧪 Stand-in server ({args.mode}) listening on {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n🛑 Stopped after {server.requests} requests ({server.errors} injected errors)")
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Compact statistical summaries of price history for prompts
+
+Turns a (timestamp, price, ...) series of any length into a fixed-size
+block: returns over several horizons, indicator values, volatility, key
+levels and a downsampled sparkline. Prompt size no longer grows with the
+history window.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .config import DEFAULT_INTERVAL
+from .feature_store import LOOKBACK, compute_features
+
+# Return horizons, in candles
+HORIZONS = (1, 4, 24, 72)
+SPARKLINE_POINTS = 12
+SPARKLINE_BLOCKS = "▁▂▃▄▅▆▇█"
+
+INDICATOR_FORMATS = [
+    ("SMA12", "sma_12", "{:.2f}"),
+    ("SMA26", "sma_26", "{:.2f}"),
+    ("RSI14", "rsi_14", "{:.1f}"),
+    ("Volume ratio", "volume_ratio", "{:.2f}"),
+]
+
+_UNIT_MINUTES = {"m": 1, "h": 60, "d": 1440}
+
+
+def interval_minutes(interval: str) -> int:
+    """Length of an interval such as 15m, 1h or 1d in minutes"""
+    return int(interval[:-1]) * _UNIT_MINUTES[interval[-1]]
+
+
+def horizon_label(candles: int, interval: str = DEFAULT_INTERVAL) -> str:
+    """Label a number of candles as a duration, e.g. 24 x 1h -> 1d"""
+    minutes = candles * interval_minutes(interval)
+    for unit in ("d", "h", "m"):
+        if minutes % _UNIT_MINUTES[unit] == 0:
+            return f"{minutes // _UNIT_MINUTES[unit]}{unit}"
+    return f"{candles} candles"
+
+
+def sparkline(values: Sequence[float], points: int = SPARKLINE_POINTS) -> str:
+    """Downsample a series to ``points`` bucket means and render it as blocks"""
+    values = np.asarray(values, dtype=float)
+    if not len(values):
+        return ""
+    means = np.array([bucket.mean() for bucket in np.array_split(values, min(points, len(values)))])
+    low, high = means.min(), means.max()
+    if high == low:
+        return SPARKLINE_BLOCKS[len(SPARKLINE_BLOCKS) // 2] * len(means)
+    levels = np.round((means - low) / (high - low) * (len(SPARKLINE_BLOCKS) - 1)).astype(int)
+    return "".join(SPARKLINE_BLOCKS[level] for level in levels)
+
+
+def _clean(value) -> Optional[float]:
+    """Convert numpy scalars to float and NaN to None"""
+    if value is None:
+        return None
+    value = float(value)
+    return None if value != value else value
+
+
+def summarize_series(history: List[tuple], features: Optional[Dict[str, float]] = None,
+                     interval: str = DEFAULT_INTERVAL) -> Optional[Dict]:
+    """Summarize a (timestamp, price[, volume]) history into a fixed-size dict
+
+    ``features`` is an optional feature store row for the last candle; when
+    absent the indicators are computed from the trailing candles only.
+    """
+    if not history:
+        return None
+
+    closes = np.array([entry[1] for entry in history], dtype=float)
+    last = closes[-1]
+
+    if features is None:
+        tail = history[-(LOOKBACK + 1):]
+        tail_volumes = [entry[2] if len(entry) > 2 else 0.0 for entry in tail]
+        computed = compute_features(closes[-(LOOKBACK + 1):], tail_volumes)
+        features = {column: values[-1] for column, values in computed.items()}
+
+    returns = {}
+    for horizon in HORIZONS:
+        value = last / closes[-1 - horizon] - 1 if len(closes) > horizon else None
+        returns[horizon_label(horizon, interval)] = _clean(value)
+
+    low, high = closes.min(), closes.max()
+    return {
+        "candles": len(closes),
+        "interval": interval,
+        "last_time": history[-1][0],
+        "last_price": float(last),
+        "returns": returns,
+        "low": float(low),
+        "high": float(high),
+        "range_position": float((last - low) / (high - low)) if high > low else 0.5,
+        "volatility": _clean(features.get("volatility_24")),
+        "indicators": {key: _clean(features.get(key)) for _, key, _ in INDICATOR_FORMATS},
+        "sparkline": sparkline(closes),
+    }
+
+
+def format_summary(coin: str, summary: Dict, minimal: bool = False) -> str:
+    """Render a summary as a short, fixed-size prompt block (``minimal``: header, price and returns only)"""
+    returns = ", ".join(f"{label} {value:+.2%}" if value is not None else f"{label} n/a"
+                        for label, value in summary["returns"].items())
+    lines = [
+        f"{coin} price trend ({summary['candles']} x {summary['interval']} candles to {summary['last_time']}):",
+        f"Last ${summary['last_price']:,.2f} | Returns {returns}",
+    ]
+    if minimal:
+        return "\n".join(lines)
+    lines.append(f"Range ${summary['low']:,.2f}-${summary['high']:,.2f} (position {summary['range_position']:.2f})"
+                 + (f" | Volatility {summary['volatility']:.2%} per candle" if summary["volatility"] is not None else ""))
+    indicators = ", ".join(f"{label} {fmt.format(summary['indicators'][key])}"
+                           for label, key, fmt in INDICATOR_FORMATS
+                           if summary["indicators"].get(key) is not None)
+    if indicators:
+        lines.append(f"Indicators {indicators}")
+    lines.append(f"Sparkline {summary['sparkline']}")
+    return "\n".join(lines)
@@ -0,0 +1,251 @@
+"""
+Local surrogate of the LLM strategy
+
+Backtesting the LLM over years costs one API call per bar. The surrogate
+is a multinomial logistic regression (NumPy only) trained on the
+feature → action pairs in the decision journal: each journaled coin's
+summary features plus its open positions, labelled with the action the
+LLM chose. Position size, stop loss and take profit come from the typical
+values the LLM used for that action, relative to the price. Trained, it
+plugs in as the ``surrogate`` engine and decides in microseconds.
+
+Only cycles the LLM decided are learned from: cycles of local engines and
+degraded cycles (the LLM missed the deadline) are skipped and counted.
+Training holds out the most recent journaled cycles and reports how often
+the surrogate agrees with the LLM on them, next to the agreement of always
+predicting the most common action.
+"""
+
+import argparse
+import json
+import statistics
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .config import SURROGATE_MODEL_FILE
+from .decisions import ENTRY_ACTIONS
+from .engines import LLM_ENGINES, open_positions
+from .journal import DecisionJournal, coin_features
+
+VOLUME_REGIMES = ("HIGH", "ELEVATED", "NORMAL", "LOW")
+
+# Journal modes whose decisions came from the LLM (``stream`` is the streamed single request)
+LLM_MODES = LLM_ENGINES + ("stream",)
+
+
+def is_llm_decision(record: Dict) -> bool:
+    """Whether a journal record holds LLM decisions (not a local engine's or a degraded cycle's)"""
+    return record.get("mode") in LLM_MODES and not record.get("context", {}).get("degraded", False)
+
+
+def feature_vector(features: Dict, long_open: bool, short_open: bool) -> List[float]:
+    """Flatten one coin's journal features into a fixed-order numeric vector
+
+    Missing values (short histories, no volume data) become 0.
+    """
+    values = [features["returns"][label] for label in sorted(features["returns"])]
+    values += [features["range_position"], features["volatility"]]
+    for key in sorted(features["indicators"]):
+        value = features["indicators"][key]
+        if key.startswith("sma") and value is not None:
+            value = features["last_price"] / value - 1  # Moving averages as distance from price
+        values.append(value)
+    values += [1.0 if features.get("volume") == regime else 0.0 for regime in VOLUME_REGIMES]
+    values += [1.0 if long_open else 0.0, 1.0 if short_open else 0.0]
+    return [0.0 if value is None else float(value) for value in values]
+
+
+def training_pairs(records: Iterable[Dict]) -> Tuple[np.ndarray, List[str], List[Dict]]:
+    """(X, actions, per-row info) from journal records, one row per decided coin"""
+    rows, actions, info = [], [], []
+    for record in records:
+        for coin, decision in record["decisions"].items():
+            features = record["features"].get(coin)
+            if features is None:
+                continue
+            long_amount, short_amount = open_positions(record["balance"], coin)
+            rows.append(feature_vector(features, long_amount > 0, short_amount > 0))
+            actions.append(decision[0])
+            info.append({"id": record["id"], "coin": coin, "price": features["last_price"], "decision": decision})
+    return np.array(rows, dtype=float), actions, info
+
+
+class SurrogateModel:
+    """Multinomial logistic regression with standardized inputs and L2 regularization"""
+
+    def __init__(self, l2: float = 1e-2, learning_rate: float = 0.5, epochs: int = 500):
+        self.l2 = l2
+        self.learning_rate = learning_rate
+        self.epochs = epochs
+        self.classes: List[str] = []
+        self.mean = self.scale = self.weights = None
+        self.templates: Dict[str, Dict[str, Optional[float]]] = {}
+
+    def fit(self, X: np.ndarray, actions: List[str], info: Optional[List[Dict]] = None) -> "SurrogateModel":
+        """Fit by full-batch gradient descent (deterministic); ``info`` supplies the decision templates"""
+        self.classes = sorted(set(actions))
+        y = np.array([self.classes.index(action) for action in actions])
+        self.mean = X.mean(axis=0)
+        self.scale = np.where(X.std(axis=0) > 0, X.std(axis=0), 1.0)
+        Z = np.hstack([(X - self.mean) / self.scale, np.ones((len(X), 1))])
+        targets = np.eye(len(self.classes))[y]
+
+        self.weights = np.zeros((Z.shape[1], len(self.classes)))
+        for _ in range(self.epochs):
+            gradient = Z.T @ (self._softmax(Z @ self.weights) - targets) / len(Z)
+            gradient[:-1] += self.l2 * self.weights[:-1]
+            self.weights -= self.learning_rate * gradient
+
+        if info is not None:
+            self.templates = _decision_templates(actions, info)
+        return self
+
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        Z = np.hstack([(np.atleast_2d(X) - self.mean) / self.scale, np.ones((len(np.atleast_2d(X)), 1))])
+        return self._softmax(Z @ self.weights)
+
+    def predict(self, X: np.ndarray) -> List[str]:
+        return [self.classes[index] for index in self.predict_proba(X).argmax(axis=1)]
+
+    def decision(self, action: str, price: float) -> tuple:
+        """Full decision tuple for a predicted action, sized like the LLM's typical one"""
+        template = self.templates.get(action, {})
+        percent = template.get("percent", 0.0 if action == "HOLD" else 0.25)
+        if action not in ENTRY_ACTIONS:
+            return (action, percent)
+        stop_loss = template.get("stop_loss")
+        take_profit = template.get("take_profit")
+        return (action, percent, 1.0,
+                round(price * (1 + stop_loss), 2) if stop_loss is not None else None,
+                round(price * (1 + take_profit), 2) if take_profit is not None else None)
+
+    def to_dict(self) -> Dict:
+        return {"classes": self.classes, "mean": self.mean.tolist(), "scale": self.scale.tolist(),
+                "weights": self.weights.tolist(), "templates": self.templates}
+
+    def save(self, path: Optional[Path] = None):
+        path = Path(path) if path is not None else SURROGATE_MODEL_FILE
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "SurrogateModel":
+        path = Path(path) if path is not None else SURROGATE_MODEL_FILE
+        if not path.exists():
+            raise FileNotFoundError(f"No surrogate model at {path} - train one with "
+                                    f"'python -m traderagent.surrogate' from a decision journal")
+        with open(path) as f:
+            data = json.load(f)
+        model = cls()
+        model.classes = data["classes"]
+        model.mean, model.scale, model.weights = (np.array(data[key]) for key in ("mean", "scale", "weights"))
+        model.templates = data["templates"]
+        return model
+
+
+def _decision_templates(actions: List[str], info: List[Dict]) -> Dict[str, Dict[str, Optional[float]]]:
+    """Median percent and stop/take-profit distances (relative to price) per action"""
+    templates = {}
+    for action in set(actions):
+        decisions = [(row["decision"], row["price"]) for row, label in zip(info, actions) if label == action]
+        template = {"percent": float(statistics.median([decision[1] for decision, _ in decisions]))}
+        for index, key in ((3, "stop_loss"), (4, "take_profit")):
+            distances = [decision[index] / price - 1 for decision, price in decisions
+                         if len(decision) == 5 and decision[index] is not None and price]
+            template[key] = float(statistics.median(distances)) if distances else None
+        templates[action] = template
+    return templates
+
+
+def agreement_report(model: SurrogateModel, X: np.ndarray, actions: List[str], majority: str) -> Dict:
+    """How often the surrogate picks the LLM's action on ``X`` (vs always picking ``majority``)"""
+    predicted = model.predict(X) if len(X) else []
+    per_action = {}
+    for action in sorted(set(actions)):
+        hits = [p == a for p, a in zip(predicted, actions) if a == action]
+        per_action[action] = {"count": len(hits), "agreement": sum(hits) / len(hits)}
+    return {
+        "samples": len(actions),
+        "agreement": sum(p == a for p, a in zip(predicted, actions)) / len(actions) if actions else 0.0,
+        "baseline": sum(a == majority for a in actions) / len(actions) if actions else 0.0,
+        "per_action": per_action,
+    }
+
+
+def train_surrogate(journal: DecisionJournal, holdout: float = 0.2, **model_kwargs) -> Tuple[SurrogateModel, Dict]:
+    """Fit on the older LLM-decided records and report agreement on the most recent ``holdout`` share"""
+    records, skipped = [], 0
+    for record in journal.records():
+        if not record["decisions"]:
+            continue
+        if is_llm_decision(record):
+            records.append(record)
+        else:
+            skipped += 1
+    split = max(1, int(round(len(records) * (1 - holdout)))) if len(records) > 1 else len(records)
+    X_train, y_train, info_train = training_pairs(records[:split])
+    X_test, y_test, _ = training_pairs(records[split:])
+    if not len(X_train):
+        raise ValueError("The decision journal has no decisions to train on")
+
+    model = SurrogateModel(**model_kwargs).fit(X_train, y_train, info_train)
+    majority = max(set(y_train), key=y_train.count)
+    report = {
+        "train": agreement_report(model, X_train, y_train, majority),
+        "holdout": agreement_report(model, X_test, y_test, majority),
+        "classes": model.classes,
+        "majority": majority,
+        "skipped": skipped,
+    }
+    return model, report
+
+
+class SurrogateEngine:
+    """Decision engine backed by a trained SurrogateModel"""
+
+    name = "surrogate"
+
+    def __init__(self, model: Optional[SurrogateModel] = None):
+        self.model = model if model is not None else SurrogateModel.load()
+
+    def __call__(self, price_volume_histories: Dict[str, List[tuple]], balance: Dict, **context) -> Dict[str, tuple]:
+        features = coin_features(price_volume_histories)
+        coins = list(features)
+        if not coins:
+            return {}
+        rows = []
+        for coin in coins:
+            long_amount, short_amount = open_positions(balance, coin)
+            rows.append(feature_vector(features[coin], long_amount > 0, short_amount > 0))
+        actions = self.model.predict(np.array(rows))
+        return {coin: self.model.decision(action, features[coin]["last_price"]) for coin, action in zip(coins, actions)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local surrogate model from the decision journal")
+    parser.add_argument("--journal", type=Path, default=None, help="Journal file (default: data/decision_journal.jsonl)")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of the newest cycles held out (default: 0.2)")
+    parser.add_argument("--output", type=Path, default=None, help="Model file (default: data/surrogate_model.json)")
+    args = parser.parse_args()
+
+    model, report = train_surrogate(DecisionJournal(args.journal), holdout=args.holdout)
+    model.save(args.output)
+    for split in ("train", "holdout"):
+        stats = report[split]
+        print(f"{split:8s} {stats['samples']:5d} decisions | agreement {stats['agreement']:.1%} "
+              f"(always {report['majority']}: {stats['baseline']:.1%})")
+        for action, action_stats in stats["per_action"].items():
+            print(f"  {action:12s} {action_stats['count']:5d} | {action_stats['agreement']:.1%}")
+    print(f"💾 Surrogate model saved ({', '.join(model.classes)}; {report['skipped']} non-LLM cycles skipped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Telemetry for LLM calls
+
+Every model call can be recorded as one JSON line in an append-only
+metrics file: wall time, prompt/completion tokens and their cost, requested
+and used model, retries and fallbacks, cache hits, errors and parse
+failures. ``Telemetry.aggregates`` summarizes a run (or a whole metrics
+file) to show where cycle time, tokens and money go, and optional latency
+and token budgets flag calls that exceed them.
+"""
+
+import json
+import statistics
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .config import LLM_METRICS_FILE, MODEL_PRICES
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _count(value) -> Optional[int]:
+    # Token counts from mocks or providers without usage data are not ints
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def usage_tokens(response) -> Dict[str, Optional[int]]:
+    """Prompt/completion token counts from an API response, when it reports them"""
+    usage = getattr(response, "usage", None)
+    return {
+        "prompt_tokens": _count(getattr(usage, "prompt_tokens", None)),
+        "completion_tokens": _count(getattr(usage, "completion_tokens", None)),
+    }
+
+
+def call_cost(model: Optional[str], prompt_tokens: Optional[int], completion_tokens: Optional[int],
+              prices: Dict[str, tuple] = MODEL_PRICES) -> Optional[float]:
+    """USD cost of one call, None when its tokens or the model's price are unknown
+
+    A dated model name ("gpt-4o-2024-08-06") is priced as the longest known
+    model name it starts with.
+    """
+    if prompt_tokens is None and completion_tokens is None:
+        return None
+    known = [name for name in prices if model and model.startswith(name)]
+    if not known:
+        return None
+    prompt_price, completion_price = prices[max(known, key=len)]
+    return ((prompt_tokens or 0) * prompt_price + (completion_tokens or 0) * completion_price) / 1_000_000
+
+
+class Telemetry:
+    """Records model calls to memory and an append-only JSON-lines file
+
+    ``latency_budget`` (seconds) and ``token_budget`` (total tokens) are
+    per-call limits; a call over either is marked ``over_budget`` and a
+    warning is printed.
+    """
+
+    def __init__(self, path: Optional[Path] = None, latency_budget: Optional[float] = None,
+                 token_budget: Optional[int] = None, persist: bool = True):
+        self.path = Path(path) if path is not None else LLM_METRICS_FILE
+        self.latency_budget = latency_budget
+        self.token_budget = token_budget
+        self.persist = persist
+        self.records: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, event: str = "call", **fields) -> Dict:
+        """Append one event ("call" or "parse") and return it"""
+        record = {"time": time.time(), "event": event, **fields}
+        if event == "call":
+            record.setdefault("cost_usd", call_cost(record.get("model_used") or record.get("model"),
+                                                    record.get("prompt_tokens"), record.get("completion_tokens")))
+            record["over_budget"] = self._budget_violations(record)
+            for violation in record["over_budget"]:
+                print(f"⏱️ LLM call over {violation} budget ({record.get('model_used') or record.get('model')})")
+
+        with self._lock:
+            self.records.append(record)
+            if self.persist:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+        return record
+
+    def _budget_violations(self, record: Dict) -> List[str]:
+        violations = []
+        if self.latency_budget is not None and record.get("wall_seconds", 0) > self.latency_budget:
+            violations.append("latency")
+        tokens = (record.get("prompt_tokens") or 0) + (record.get("completion_tokens") or 0)
+        if self.token_budget is not None and tokens > self.token_budget:
+            violations.append("token")
+        return violations
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "Telemetry":
+        """Read a metrics file back (read-only: nothing new is appended)"""
+        telemetry = cls(path, persist=False)
+        if telemetry.path.exists():
+            with open(telemetry.path) as f:
+                telemetry.records = [json.loads(line) for line in f if line.strip()]
+        return telemetry
+
+    def aggregates(self) -> Dict:
+        """Summary over all recorded events
+
+        ``cost_per_decision`` spreads the cost of every call over the coin
+        decisions parsed from the replies.
+        """
+        with self._lock:
+            calls = [r for r in self.records if r.get("event") == "call"]
+            parses = [r for r in self.records if r.get("event") == "parse"]
+
+        live = [r for r in calls if not r.get("cached") and not r.get("error")]
+        latencies = sorted(r["wall_seconds"] for r in live if r.get("wall_seconds") is not None)
+        by_model: Dict[str, int] = {}
+        for r in calls:
+            model = r.get("model_used") or r.get("model") or "unknown"
+            by_model[model] = by_model.get(model, 0) + 1
+        cost = sum(r.get("cost_usd") or 0.0 for r in calls)
+        decisions = sum(r.get("decisions", 0) for r in parses)
+
+        return {
+            "calls": len(calls),
+            "cached": sum(1 for r in calls if r.get("cached")),
+            "errors": sum(1 for r in calls if r.get("error")),
+            "retries": sum(r.get("retries", 0) for r in calls),
+            "fallbacks": sum(1 for r in calls if r.get("fallback")),
+            "prompt_tokens": sum(r.get("prompt_tokens") or 0 for r in calls),
+            "completion_tokens": sum(r.get("completion_tokens") or 0 for r in calls),
+            "latency_mean": statistics.fmean(latencies) if latencies else 0.0,
+            "latency_p50": _percentile(latencies, 0.5) if latencies else 0.0,
+            "latency_p95": _percentile(latencies, 0.95) if latencies else 0.0,
+            "latency_total": sum(latencies),
+            "cost_usd": cost,
+            "decisions": decisions,
+            "cost_per_decision": cost / decisions if decisions else 0.0,
+            "parse_failures": sum(r.get("failures", 0) for r in parses),
+            "over_budget": sum(1 for r in calls if r.get("over_budget")),
+            "by_model": by_model,
+        }
+
+    def summary(self) -> str:
+        """One-line human readable summary"""
+        stats = self.aggregates()
+        return (f"{stats['calls']} LLM calls ({stats['cached']} cached, {stats['errors']} errors, "
+                f"{stats['fallbacks']} fallbacks) | latency p50 {stats['latency_p50']:.2f}s "
+                f"p95 {stats['latency_p95']:.2f}s | tokens {stats['prompt_tokens']}+{stats['completion_tokens']} | "
+                f"cost ${stats['cost_usd']:.4f} (${stats['cost_per_decision']:.4f}/decision) | "
+                f"parse failures {stats['parse_failures']} | over budget {stats['over_budget']}")
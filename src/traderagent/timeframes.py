@@ -0,0 +1,101 @@
+"""
+Multi-timeframe feature bundles for TraderAgent
+
+Resamples the base candles (1h by default) into coarser timeframes and
+summarizes each one, producing a single compact structure per cycle that
+the decision layer shares across all coins. Coarser timeframes cost no
+extra network calls; finer ones (e.g. 15m) are used only when their
+histories are passed in explicitly.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from .config import DEFAULT_INTERVAL
+from .feature_store import to_open_time
+from .summarizer import interval_minutes, summarize_series
+
+DEFAULT_TIMEFRAMES = ("1h", "4h", "1d")
+
+
+def resample_candles(history: List[tuple], interval: str, base_interval: str = DEFAULT_INTERVAL) -> List[tuple]:
+    """Aggregate base candles into a coarser interval
+
+    Buckets are aligned on the target interval's open time, the close is the
+    last close in the bucket and volume is summed. The last bucket may still
+    be forming, just like the latest kline from the exchange.
+    """
+    if interval_minutes(interval) < interval_minutes(base_interval):
+        raise ValueError(f"Cannot resample {base_interval} candles into finer {interval} candles")
+    if interval == base_interval:
+        return list(history)
+
+    bucket_ms = interval_minutes(interval) * 60 * 1000
+    resampled = []
+    current_bucket = None
+    for entry in history:
+        bucket = to_open_time(entry[0]) // bucket_ms
+        volume = entry[2] if len(entry) > 2 else 0.0
+        if bucket != current_bucket:
+            resampled.append([entry[0], entry[1], volume])
+            current_bucket = bucket
+        else:
+            resampled[-1][1] = entry[1]
+            resampled[-1][2] += volume
+    return [tuple(candle) for candle in resampled]
+
+
+class FeatureBundle:
+    """Per-coin, per-timeframe summaries built once per decision cycle"""
+
+    def __init__(self, summaries: Dict[str, Dict[str, Dict]], base_interval: str = DEFAULT_INTERVAL):
+        self.summaries = summaries
+        self.base_interval = base_interval
+
+    def coins(self) -> List[str]:
+        return list(self.summaries)
+
+    def get(self, coin: str, timeframe: str) -> Optional[Dict]:
+        return self.summaries.get(coin, {}).get(timeframe)
+
+    def format_coin(self, coin: str, exclude: Iterable[str] = ()) -> str:
+        """One compact line per timeframe for a coin"""
+        lines = []
+        for timeframe, summary in self.summaries.get(coin, {}).items():
+            if timeframe in exclude or summary is None:
+                continue
+            returns = ", ".join(f"{label} {value:+.2%}" for label, value in list(summary["returns"].items())[:3]
+                                if value is not None)
+            parts = [f"{timeframe}: {summary['candles']} candles", returns or "returns n/a"]
+            indicators = summary["indicators"]
+            if indicators.get("rsi_14") is not None:
+                parts.append(f"RSI14 {indicators['rsi_14']:.1f}")
+            if indicators.get("sma_12") is not None and indicators.get("sma_26") is not None:
+                parts.append("SMA12 above SMA26" if indicators["sma_12"] > indicators["sma_26"] else "SMA12 below SMA26")
+            parts.append(f"range position {summary['range_position']:.2f}")
+            parts.append(summary["sparkline"])
+            lines.append(" | ".join(parts))
+        return "\n".join(lines)
+
+
+def build_feature_bundle(market_data: Dict[str, List[tuple]], timeframes: Iterable[str] = DEFAULT_TIMEFRAMES,
+                         base_interval: str = DEFAULT_INTERVAL,
+                         extra_histories: Optional[Dict[str, Dict[str, List[tuple]]]] = None) -> FeatureBundle:
+    """Build a FeatureBundle for every coin in ``market_data``
+
+    ``extra_histories`` maps an interval to {coin: history} for timeframes
+    that cannot be derived from the base candles (anything finer than
+    ``base_interval``). Such timeframes are skipped when not provided.
+    """
+    extra_histories = extra_histories or {}
+    summaries = {}
+    for coin, history in market_data.items():
+        summaries[coin] = {}
+        for timeframe in timeframes:
+            if timeframe in extra_histories and coin in extra_histories[timeframe]:
+                candles = extra_histories[timeframe][coin]
+            elif interval_minutes(timeframe) >= interval_minutes(base_interval):
+                candles = resample_candles(history, timeframe, base_interval)
+            else:
+                continue
+            summaries[coin][timeframe] = summarize_series(candles, interval=timeframe)
+    return FeatureBundle(summaries, base_interval)
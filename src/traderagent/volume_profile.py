@@ -0,0 +1,144 @@
+"""
+Volume-by-price profile for TraderAgent
+
+Bins traded volume by price level over a window of candles and derives the
+point of control (POC, the busiest price level) and the value area (the
+price range holding most of the volume). These act as cheap support and
+resistance context for decisions.
+"""
+
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .config import DEFAULT_PRICE_LIMIT
+
+DEFAULT_BINS = 24
+DEFAULT_VALUE_AREA = 0.70
+
+
+def _levels_from_histogram(hist: np.ndarray, edges: np.ndarray, value_area: float) -> Optional[Dict[str, float]]:
+    """Derive POC and value area from a volume histogram"""
+    total = float(hist.sum())
+    if total <= 0:
+        return None
+
+    poc = int(np.argmax(hist))
+    low, high = poc, poc
+    covered = float(hist[poc])
+
+    # Grow the value area towards whichever neighbouring bin has more volume
+    while covered < total * value_area and (low > 0 or high < len(hist) - 1):
+        below = hist[low - 1] if low > 0 else -1.0
+        above = hist[high + 1] if high < len(hist) - 1 else -1.0
+        if above >= below:
+            high += 1
+            covered += float(above)
+        else:
+            low -= 1
+            covered += float(below)
+
+    return {
+        "poc": float((edges[poc] + edges[poc + 1]) / 2),
+        "value_area_low": float(edges[low]),
+        "value_area_high": float(edges[high + 1]),
+        "total_volume": total,
+    }
+
+
+def compute_volume_profile(prices: Sequence[float], volumes: Sequence[float], bins: int = DEFAULT_BINS,
+                           value_area: float = DEFAULT_VALUE_AREA) -> Optional[Dict[str, float]]:
+    """Compute POC and value area for a window of (price, volume) candles
+
+    Returns None when there is no volume to profile.
+    """
+    prices = np.asarray(prices, dtype=float)
+    volumes = np.asarray(volumes, dtype=float)
+    if not len(prices):
+        return None
+    hist, edges = np.histogram(prices, bins=bins, weights=volumes)
+    return _levels_from_histogram(hist, edges, value_area)
+
+
+def format_volume_profile(levels: Dict[str, float], price: float) -> str:
+    """Format profile levels as one prompt line, relative to the current price"""
+    if price > levels["value_area_high"]:
+        position = "price above value area"
+    elif price < levels["value_area_low"]:
+        position = "price below value area"
+    else:
+        position = "price inside value area"
+    return (f"POC ${levels['poc']:,.2f}, value area ${levels['value_area_low']:,.2f}"
+            f"-${levels['value_area_high']:,.2f} ({position})")
+
+
+class VolumeProfile:
+    """Rolling volume profile updated one candle at a time
+
+    Bin edges stay fixed while prices remain inside them, so a new candle
+    only adds its volume to one bin and removes the oldest candle's volume
+    from another. The histogram is rebuilt (vectorized) only when a price
+    leaves the current range.
+    """
+
+    def __init__(self, window: int = DEFAULT_PRICE_LIMIT, bins: int = DEFAULT_BINS,
+                 value_area: float = DEFAULT_VALUE_AREA):
+        self.window = window
+        self.bins = bins
+        self.value_area = value_area
+        self._candles = deque()
+        self._hist = np.zeros(bins)
+        self._edges = None
+
+    def __len__(self):
+        return len(self._candles)
+
+    def _bin_index(self, price: float) -> int:
+        index = int(np.searchsorted(self._edges, price, side="right")) - 1
+        return min(max(index, 0), self.bins - 1)
+
+    def _rebuild(self):
+        prices = np.array([price for price, _, _ in self._candles])
+        volumes = np.array([volume for _, volume, _ in self._candles])
+        # Pad the range so small moves past the extremes do not force a rebuild
+        low, high = prices.min(), prices.max()
+        pad = (high - low) * 0.1 or abs(high) * 0.01 or 1.0
+        self._hist, self._edges = np.histogram(prices, bins=self.bins, range=(low - pad, high + pad),
+                                               weights=volumes)
+        self._candles = deque((price, volume, self._bin_index(price)) for price, volume, _ in self._candles)
+
+    def update(self, price: float, volume: float):
+        """Add one candle, dropping the oldest once the window is full"""
+        if len(self._candles) >= self.window:
+            _, old_volume, old_index = self._candles.popleft()
+            self._hist[old_index] -= old_volume
+
+        if self._edges is None or not (self._edges[0] <= price <= self._edges[-1]):
+            self._candles.append((price, volume, 0))
+            self._rebuild()
+            return
+
+        index = self._bin_index(price)
+        self._candles.append((price, volume, index))
+        self._hist[index] += volume
+
+    def copy(self) -> "VolumeProfile":
+        """Independent snapshot of the current window (cheap: at most ``window`` candles)"""
+        clone = VolumeProfile(self.window, self.bins, self.value_area)
+        clone._candles = deque(self._candles)
+        clone._hist = self._hist.copy()
+        clone._edges = self._edges
+        return clone
+
+    def extend(self, history: List[tuple]):
+        """Add candles from a (timestamp, price, volume) history"""
+        for entry in history:
+            self.update(entry[1], entry[2])
+
+    def levels(self) -> Optional[Dict[str, float]]:
+        """Current POC and value area, or None before any volume arrives"""
+        if self._edges is None:
+            return None
+        # Clip float drift left behind by repeated add/subtract
+        return _levels_from_histogram(np.clip(self._hist, 0, None), self._edges, self.value_area)
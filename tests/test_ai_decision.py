@@ -180,7 +180,7 @@ class TestAIDecision(BaseTestCase):
         
         # Get the prompt that was sent
         call_args = mock_openai.call_args
-        prompt = call_args[1]['messages'][0]['content']
+        prompt = "\n".join(message['content'] for message in call_args[1]['messages'])
         
         # Verify prompt contains key information
         self.assertIn("BTC price trend", prompt)
@@ -194,7 +194,30 @@ class TestAIDecision(BaseTestCase):
         self.assertIn("volume analysis", prompt)  # Test new volume guidance
         
         print("✓ Prompt content test passed")
-    
+
+    @patch.dict(os.environ, {'OPENAI_API_KEY': 'test_api_key'})
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_static_prefix_shared_between_calls(self, mock_openai):
+        """Test that instructions form an identical system prefix and data follows it"""
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "BTC: HOLD\nSOL: HOLD"
+        mock_openai.return_value = mock_response
+
+        get_ai_decision(self.price_histories, self.test_balance)
+        first = mock_openai.call_args[1]['messages']
+        moved = {coin: [(t, p * 1.1) for t, p in history] for coin, history in self.price_histories.items()}
+        get_ai_decision(moved, self.test_balance)
+        second = mock_openai.call_args[1]['messages']
+
+        self.assertEqual([m['role'] for m in first], ["system", "user"])
+        self.assertEqual(first[0], second[0])
+        self.assertNotEqual(first[1], second[1])
+        self.assertIn("Available Actions", first[0]['content'])
+        self.assertNotIn("price trend", first[0]['content'])
+        self.assertTrue(first[1]['content'].startswith("Here are the market analysis data"))
+
+        print("✓ Static prompt prefix test passed")
+
     @patch.dict(os.environ, {'OPENAI_API_KEY': 'test_api_key'})
     @patch('traderagent.ai_decision.client.chat.completions.create')
     def test_openai_error_handling(self, mock_openai):
@@ -269,6 +292,41 @@ class TestAIDecision(BaseTestCase):
             else:
                 raise
 
+class TestLazyClient(BaseTestCase):
+    """Test lazy OpenAI client creation and swapping"""
+
+    def test_package_import_defers_openai(self):
+        """Test that importing the package does not import openai or build a client"""
+        import subprocess
+        import sys
+        src_dir = os.path.join(os.path.dirname(__file__), '..', 'src')
+        code = ("import sys; sys.path.insert(0, %r); "
+                "import traderagent, traderagent.ai_decision as a; "
+                "print('openai' in sys.modules, 'client' in vars(a))" % src_dir)
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(output.stdout.strip(), "False False")
+
+        print("✓ Deferred openai import test passed")
+
+    def test_set_client_swaps_model_client(self):
+        """Test that a swapped-in client receives the model calls"""
+        from traderagent import ai_decision
+        original = ai_decision.get_client()
+        fake = MagicMock()
+        fake.chat.completions.create.return_value.choices[0].message.content = "BTC: SELL 40%"
+        try:
+            ai_decision.set_client(fake)
+            self.assertIs(ai_decision.get_client(), fake)
+            result = get_ai_decision(self.test_prices, self.test_balance)
+        finally:
+            ai_decision.set_client(original)
+
+        fake.chat.completions.create.assert_called_once()
+        self.assertEqual(result["BTC"], ("SELL", 0.4))
+        self.assertIs(ai_decision.get_client(), original)
+
+        print("✓ Client swap test passed")
+
 if __name__ == '__main__':
     # Run the tests
     unittest.main(verbosity=2)
\ No newline at end of file
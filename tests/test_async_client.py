@@ -0,0 +1,257 @@
+import unittest
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+from test_config import BaseTestCase, TestConfig
+from traderagent import ai_decision
+from traderagent.deadlines import Deadline
+from traderagent.async_client import AsyncLLMClient, RetryPolicy, is_retryable, retry_after
+from traderagent.standin_server import ScriptedResponder, StandInServer
+
+class APIStatusError(Exception):
+    """Shaped like openai.APIStatusError"""
+
+    def __init__(self, status_code, headers=None, param=None):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+        self.param = param
+
+class APIConnectionError(Exception):
+    pass
+
+class APITimeoutError(APIConnectionError):
+    """Shaped like openai.APITimeoutError (a connection error subclass)"""
+
+    def __init__(self):
+        super().__init__("Request timed out.")
+
+def reply(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+class FakeAsyncClient:
+    """AsyncOpenAI stand-in failing with the queued errors before answering"""
+
+    def __init__(self, errors=(), delay=0.01):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, **kwargs):
+        self.calls.append((model, kwargs))
+        await asyncio.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return reply(f"{model}: {messages[-1]['content']}")
+
+FAST = RetryPolicy(max_retries=3, base_delay=0.001, max_delay=0.01, seed=1)
+
+def request(content, **params):
+    return {"messages": [{"role": "user", "content": content}], **params}
+
+class TestAsyncClient(BaseTestCase):
+    """Test the retrying, deduplicating async client"""
+
+    def test_error_classification(self):
+        """Test which errors are retried and how Retry-After is read"""
+        self.assertTrue(is_retryable(APIStatusError(429)))
+        self.assertTrue(is_retryable(APIStatusError(503)))
+        self.assertTrue(is_retryable(APIConnectionError("reset")))
+        self.assertFalse(is_retryable(APITimeoutError()))
+        self.assertFalse(is_retryable(APIStatusError(400)))
+        self.assertFalse(is_retryable(APIStatusError(404)))
+        self.assertFalse(is_retryable(ValueError("bad reply")))
+
+        self.assertEqual(retry_after(APIStatusError(429, {"retry-after": "2"})), 2.0)
+        self.assertEqual(retry_after(APIStatusError(429, {"retry-after-ms": "250"})), 0.25)
+        self.assertIsNone(retry_after(APIStatusError(429)))
+
+        print("✓ Error classification test passed")
+
+    def test_retry_policy_delays(self):
+        """Test jittered exponential delays and that Retry-After overrides them"""
+        policy = RetryPolicy(max_retries=3, base_delay=1.0, max_delay=5.0, seed=7)
+        for attempt in range(6):
+            ceiling = min(5.0, 2 ** attempt)
+            self.assertTrue(ceiling / 2 <= policy.delay(attempt) <= ceiling)
+        self.assertEqual(policy.delay(0, APIStatusError(429, {"retry-after": "3"})), 3.0)
+        self.assertEqual(policy.delay(0, APIStatusError(429, {"retry-after": "60"})), 5.0)  # Capped
+        self.assertTrue(policy.should_retry(2, APIStatusError(500)))
+        self.assertFalse(policy.should_retry(3, APIStatusError(500)))
+
+        print("✓ Retry policy test passed")
+
+    def test_retries_until_success(self):
+        """Test that rate limits and server errors are retried, client errors are not"""
+        fake = FakeAsyncClient(errors=[APIStatusError(429, {"retry-after": "0.001"}), APIStatusError(502)])
+        client = AsyncLLMClient(client=fake, retry_policy=FAST)
+        self.assertEqual(client.run_many([request("hi")]), ["gpt-4o: hi"])
+        self.assertEqual(client.stats["api_calls"], 3)
+        self.assertEqual(client.stats["retries"], 2)
+
+        fake = FakeAsyncClient(errors=[APIStatusError(400)])
+        client = AsyncLLMClient(client=fake, retry_policy=FAST)
+        result = client.run_many([request("hi")])[0]
+        self.assertIsInstance(result, APIStatusError)
+        self.assertEqual(len(fake.calls), 1)
+
+        print("✓ Retry test passed")
+
+    def test_retries_stop_at_the_deadline(self):
+        """Test that timeouts are not retried and retries never outlast the cycle deadline"""
+        fake = FakeAsyncClient(errors=[APITimeoutError(), APIStatusError(502)])
+        client = AsyncLLMClient(client=fake, retry_policy=FAST, timeout=30)
+        result = client.run_many([request("hi", deadline=Deadline(10, reserve=0))])[0]
+        self.assertIsInstance(result, APITimeoutError)
+        self.assertEqual(len(fake.calls), 1)
+        self.assertLessEqual(fake.calls[0][1]["timeout"], 10)  # The attempt timeout comes from the deadline
+
+        clock = [0.0]
+        deadline = Deadline(10, reserve=0, clock=lambda: clock[0])
+        fake = FakeAsyncClient(errors=[APIStatusError(503), APIStatusError(429, {"retry-after": "8"})])
+        original_create = fake.create
+
+        async def slow_create(model, messages, **kwargs):
+            clock[0] += 4  # Each attempt uses 4 seconds of the budget
+            return await original_create(model, messages, **kwargs)
+
+        fake.chat.completions.create = slow_create
+        policy = RetryPolicy(max_retries=3, base_delay=0.001, max_delay=10, seed=1)
+        client = AsyncLLMClient(client=fake, retry_policy=policy, timeout=30)
+        result = client.run_many([request("hi", deadline=deadline)])[0]
+        self.assertIsInstance(result, APIStatusError)
+        self.assertEqual(result.status_code, 429)  # The 8s Retry-After does not fit in the 2s left
+        self.assertEqual([call[1]["timeout"] for call in fake.calls], [10, 6])
+        self.assertEqual(client.stats["retries"], 1)
+
+        print("✓ Deadline-bounded retry test passed")
+
+    def test_deduplicates_concurrent_requests(self):
+        """Test that identical concurrent requests cost one call and repeats come from the cache"""
+        fake = FakeAsyncClient()
+        client = AsyncLLMClient(client=fake, retry_policy=FAST)
+        results = client.run_many([request("BTC"), request("BTC"), request("SOL"), request("BTC", timeout=5)])
+
+        self.assertEqual(results, ["gpt-4o: BTC", "gpt-4o: BTC", "gpt-4o: SOL", "gpt-4o: BTC"])
+        self.assertEqual(len(fake.calls), 2)
+        self.assertEqual(client.stats["deduplicated"], 2)
+
+        self.assertEqual(client.run_many([request("SOL")]), ["gpt-4o: SOL"])
+        self.assertEqual(len(fake.calls), 2)
+        self.assertEqual(client.stats["cache_hits"], 1)
+
+        bounded = AsyncLLMClient(client=FakeAsyncClient(), retry_policy=FAST, max_replies=2)
+        bounded.run_many([request(str(i)) for i in range(5)])
+        self.assertEqual(len(bounded._replies), 2)
+        bounded.close()
+
+        print("✓ Deduplication test passed")
+
+    def test_bounded_concurrency(self):
+        """Test that no more than max_concurrency requests are in flight"""
+        in_flight, peak = 0, 0
+
+        async def create(model, messages, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return reply("ok")
+
+        client = AsyncLLMClient(client=SimpleNamespace(chat=SimpleNamespace(
+            completions=SimpleNamespace(create=create))), max_concurrency=3, retry_policy=FAST)
+        client.run_many([request(str(i)) for i in range(10)])
+        self.assertEqual(peak, 3)
+
+        print("✓ Bounded concurrency test passed")
+
+    def test_fallbacks(self):
+        """Test model fallback on 404 and dropping an unsupported response_format"""
+        fake = FakeAsyncClient(errors=[APIStatusError(404)])
+        client = AsyncLLMClient(client=fake, retry_policy=FAST)
+        self.assertEqual(client.run_many([request("hi", response_format={"type": "json_object"})]), ["gpt-4: hi"])
+        self.assertNotIn("response_format", fake.calls[-1][1])
+
+        fake = FakeAsyncClient(errors=[APIStatusError(400, param="response_format")])
+        client = AsyncLLMClient(client=fake, retry_policy=FAST)
+        self.assertEqual(client.run_many([request("hi", response_format={"type": "json_object"})]), ["gpt-4o: hi"])
+        self.assertEqual(fake.calls[-1], ("gpt-4o", {}))
+
+        print("✓ Fallback test passed")
+
+    def test_standin_server_with_rate_limits(self):
+        """Test many concurrent requests over HTTP against a server that rate-limits a third of them"""
+        server = StandInServer(ScriptedResponder(["BTC: HOLD", "BTC: CLOSE_LONG 100%"]), error_rate=0.3,
+                               error_status=429, retry_after=0.01, seed=3).start()
+        try:
+            client = AsyncLLMClient(client=server.async_client(max_retries=0), max_concurrency=4,
+                                    retry_policy=RetryPolicy(max_retries=8, base_delay=0.01, seed=3))
+            prompts = [f"BTC: price {100 + i}" for i in range(12)]
+            results = client.run_many([request(prompt) for prompt in prompts + prompts])
+        finally:
+            server.stop()
+
+        self.assertFalse([r for r in results if isinstance(r, BaseException)])
+        self.assertEqual(results[:12], results[12:])
+        self.assertEqual(server.requests, 12 + server.errors)
+        self.assertEqual(client.stats["retries"], server.errors)
+
+        print("✓ Stand-in server test passed")
+
+    def test_run_many_reuses_the_connection_pool(self):
+        """Test repeated synchronous batches on one real AsyncOpenAI client (its pool is bound to one loop)"""
+        with StandInServer(ScriptedResponder(["BTC: HOLD"])) as server:
+            with AsyncLLMClient(client=server.async_client(max_retries=0), retry_policy=FAST) as client:
+                first = client.run_many([request("first"), request("second")])
+                second = client.run_many([request("third")])
+
+        self.assertEqual(first + second, ["BTC: HOLD"] * 3)
+        self.assertEqual(server.requests, 3)
+
+        print("✓ Repeated run_many test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_sync_calls_retry(self, mock_openai):
+        """Test that synchronous calls retry a 429 instead of failing over"""
+        mock_openai.side_effect = [APIStatusError(429, {"retry-after": "0.001"}), reply("BTC: HOLD")]
+        calls = []
+        telemetry = SimpleNamespace(record=lambda kind, **fields: calls.append(fields))
+        with patch.object(ai_decision, "_retry_policy", FAST), patch.object(ai_decision, "_telemetry", telemetry):
+            self.assertEqual(ai_decision.request_completion("prompt"), "BTC: HOLD")
+        self.assertEqual(mock_openai.call_count, 2)
+        self.assertEqual(mock_openai.call_args.kwargs["model"], "gpt-4o")
+        self.assertEqual(calls[-1]["retries"], 1)
+
+        print("✓ Sync retry test passed")
+
+    def test_per_coin_decisions_async(self):
+        """Test the per-coin fan-out through the async client"""
+        async def create(model, messages, **kwargs):
+            coin = "BTC" if "BTC" in messages[-1]["content"] else "SOL"
+            return reply(json.dumps({"decisions": [{"coin": coin, "action": "HOLD", "percent": 0.0}]}))
+
+        client = AsyncLLMClient(client=SimpleNamespace(chat=SimpleNamespace(
+            completions=SimpleNamespace(create=create))), retry_policy=FAST)
+        history = TestConfig.create_rising_history(100.0)
+        router = SimpleNamespace(route=lambda available: ("gpt-4", None), observe=lambda *args, **kwargs: None)
+        ai_decision.set_async_client(client)
+        ai_decision.start_capture()
+        try:
+            with patch.object(ai_decision, "_model_router", router):
+                decisions = ai_decision.get_ai_decision_per_coin({"BTC": history, "SOL": history},
+                                                                 TestConfig.create_test_balance())
+        finally:
+            exchanges = ai_decision.stop_capture()
+            ai_decision.set_async_client(None)
+
+        self.assertEqual(decisions, {"BTC": ("HOLD", 0.0), "SOL": ("HOLD", 0.0)})
+        self.assertEqual(client.stats["api_calls"], 2)
+        self.assertEqual([exchange["model"] for exchange in exchanges], ["gpt-4", "gpt-4"])  # The routed model
+
+        print("✓ Async per-coin decision test passed")
+
+if __name__ == '__main__':
+    unittest.main()
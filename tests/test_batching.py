@@ -0,0 +1,137 @@
+import unittest
+import re
+from unittest.mock import patch
+import numpy as np
+from test_config import BaseTestCase, TestConfig
+from traderagent.batching import (
+    BatchedLLMEngine, render_snapshot, build_batch_prompt, parse_batch_reply
+)
+from traderagent.backtesting import run_engine_backtest
+from traderagent.feature_store import to_open_time
+from traderagent.prompt_budget import estimate_tokens
+
+def price_echo_reply(prompt, **kwargs):
+    """Fake model: BUY_LONG a snapshot whose BTC price ends in an odd dollar, HOLD otherwise"""
+    lines = []
+    for snapshot_id, block in re.findall(r"\[(S\d+)\]\n(.*?)(?=\n\[S\d+\]|\nYour current balance)", prompt, re.S):
+        price = float(re.search(r"Last \$([\d,.]+)", block).group(1).replace(",", ""))
+        lines.append(f"[{snapshot_id}]")
+        lines.append(f"BTC: BUY_LONG 10% {price - 1:.2f} {price + 1:.2f}" if int(price) % 2 else "BTC: HOLD")
+    return "\n".join(lines)
+
+class TestBatching(BaseTestCase):
+    """Test batched multi-bar LLM decisions"""
+
+    def setUp(self):
+        super().setUp()
+        self.market_data = {"BTC": TestConfig.create_price_history(60000 + np.arange(80))}
+
+    def test_snapshot_refuses_lookahead(self):
+        """Test that a history reaching the decided bar is rejected"""
+        history = self.market_data["BTC"]
+        render_snapshot({"BTC": history[:40]}, bar_time=history[40][0])
+        with self.assertRaises(ValueError):
+            render_snapshot({"BTC": history[:41]}, bar_time=history[40][0])
+
+        # Times are compared as instants, not strings, so mixed formats are still guarded
+        bar_ms = to_open_time(history[40][0])
+        render_snapshot({"BTC": history[:40]}, bar_time=bar_ms)
+        with self.assertRaises(ValueError):
+            render_snapshot({"BTC": history[:41]}, bar_time=bar_ms)
+
+        print("✓ Lookahead guard test passed")
+
+    def test_snapshot_hides_timestamps(self):
+        """Test that snapshots do not reveal when they were taken"""
+        text = render_snapshot({"BTC": self.market_data["BTC"][:40]})
+        self.assertIn("BTC price trend (40 x 1h candles):", text)
+        self.assertNotIn("2025-10-", text)
+
+        print("✓ Timestamp stripping test passed")
+
+    def test_parse_batch_reply(self):
+        """Test splitting a reply into per-snapshot decision sets"""
+        reply = "[S2]\nBTC: HOLD\nSOL: CLOSE_LONG 50%\n\n[s1]\nbtc: buy_long 20% 100 200\nnonsense"
+        parsed = parse_batch_reply(reply)
+
+        self.assertEqual(parsed["S1"], {"BTC": ("BUY_LONG", 0.2, 1.0, 100.0, 200.0)})
+        self.assertEqual(parsed["S2"], {"BTC": ("HOLD", 0.0), "SOL": ("CLOSE_LONG", 0.5)})
+        self.assertEqual(parse_batch_reply(None), {})  # A reply without content
+
+        print("✓ Batch reply parsing test passed")
+
+    def test_prompt_lists_every_snapshot(self):
+        """Test the batch prompt layout"""
+        system, prompt = build_batch_prompt({"S2": "BTC block two", "S1": "BTC block one"}, self.test_balance,
+                                            ["BTC", "SOL"])
+        self.assertIn("[S2]\nBTC block two", prompt)
+        self.assertIn("2 independent market snapshots", prompt)
+        self.assertIn("(BTC, SOL)", prompt)
+        self.assertIn("USD: $10000.00", prompt)
+        self.assertIn("[S1]\nCOIN: [ACTION] [parameters]", system)
+        self.assertIn("BUY_LONG [percent] [stop_loss] [take_profit]", system)
+
+        print("✓ Batch prompt test passed")
+
+    def test_prompt_fits_budget(self):
+        """Test that a large batch steps snapshots down in detail to fit the token budget"""
+        engine = BatchedLLMEngine(batch_size=8)
+        history = self.market_data["BTC"]
+        snapshots = {f"S{j}": engine.snapshot({"BTC": history[:j]})["texts"] for j in range(40, 48)}
+        system, full = build_batch_prompt(snapshots, self.test_balance, ["BTC"], token_budget=100000)
+        budget = estimate_tokens(system + "\n" + full) * 3 // 4
+
+        system, prompt = build_batch_prompt(snapshots, self.test_balance, ["BTC"], token_budget=budget)
+        self.assertLessEqual(estimate_tokens(system + "\n" + prompt), budget)
+        for snapshot_id in snapshots:
+            self.assertIn(f"[{snapshot_id}]\nBTC price trend", prompt)
+
+        print("✓ Batch budget test passed")
+
+    @patch('traderagent.batching.request_completion', side_effect=price_echo_reply)
+    def test_decisions_return_in_bar_order(self, mock_request):
+        """Test that shuffled snapshots are mapped back to their own bars"""
+        engine = BatchedLLMEngine(batch_size=6, seed=3)
+        history = self.market_data["BTC"]
+        snapshots = [engine.snapshot({"BTC": history[:j]}, bar_time=history[j][0]) for j in range(40, 46)]
+        decisions = engine.decide_batch(snapshots, self.test_balance)
+
+        self.assertEqual(mock_request.call_count, 1)
+        for j, decision in zip(range(40, 46), decisions):
+            last_price = history[j - 1][1]
+            expected = "BUY_LONG" if int(last_price) % 2 else "HOLD"
+            self.assertEqual(decision["BTC"][0], expected)
+            if expected == "BUY_LONG":
+                self.assertEqual(decision["BTC"][3], last_price - 1)
+
+        print("✓ Batch ordering test passed")
+
+    @patch('traderagent.batching.request_completion', return_value="[S1]\nBTC: HOLD")
+    def test_missing_sets_hold(self, mock_request):
+        """Test that bars without a decision set get no trades"""
+        engine = BatchedLLMEngine(batch_size=3)
+        history = self.market_data["BTC"]
+        snapshots = [engine.snapshot({"BTC": history[:j]}) for j in (40, 41, 42)]
+        self.assertEqual(engine.decide_batch(snapshots, self.test_balance), [{"BTC": ("HOLD", 0.0)}, {}, {}])
+
+        deadline = object()
+        engine({"BTC": history[:40]}, self.test_balance, deadline=deadline)
+        self.assertIs(mock_request.call_args.kwargs["deadline"], deadline)
+
+        print("✓ Missing decision set test passed")
+
+    @patch('traderagent.batching.request_completion', side_effect=price_echo_reply)
+    def test_backtest_round_trips_drop(self, mock_request):
+        """Test that a batched backtest makes one request per K bars"""
+        result = run_engine_backtest(BatchedLLMEngine(batch_size=8), self.market_data, self.test_balance,
+                                     warmup=30, show_progress=False)
+
+        self.assertEqual(result["bars"], 50)
+        self.assertEqual(result["engine_calls"], 7)
+        self.assertEqual(mock_request.call_count, 7)
+        self.assertEqual(result["decisions"], 50)
+
+        print("✓ Batched backtest test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,70 @@
+import unittest
+import threading
+import time
+from test_config import BaseTestCase
+from traderagent.concurrency import RateLimiter, map_bounded
+
+class TestConcurrency(BaseTestCase):
+    """Test the rate limiter and bounded worker pool"""
+
+    def test_results_keep_input_order(self):
+        """Test that results line up with inputs even when calls finish out of order"""
+        results = map_bounded(lambda n: (time.sleep(0.01 * (5 - n)), n * n)[1], list(range(5)), max_workers=5)
+        self.assertEqual([r.value for r in results], [0, 1, 4, 9, 16])
+        self.assertTrue(all(r.error is None for r in results))
+
+        print("✓ Result ordering test passed")
+
+    def test_errors_are_captured(self):
+        """Test that one failing call does not abort the rest"""
+        def call(n):
+            if n == 2:
+                raise RuntimeError("boom")
+            return n
+
+        results = map_bounded(call, [1, 2, 3], max_workers=3)
+        self.assertEqual([r.value for r in results], [1, None, 3])
+        self.assertIsInstance(results[1].error, RuntimeError)
+
+        print("✓ Error capture test passed")
+
+    def test_worker_bound(self):
+        """Test that no more than max_workers calls run at once"""
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def call(_):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+
+        started = time.perf_counter()
+        map_bounded(call, list(range(8)), max_workers=4)
+        self.assertEqual(peak, 4)
+        self.assertLess(time.perf_counter() - started, 8 * 0.02)
+
+        print("✓ Worker bound test passed")
+
+    def test_rate_limiter_spacing(self):
+        """Test that acquisitions beyond the burst are spaced at the configured rate"""
+        limiter = RateLimiter(rate=50, burst=1)
+        started = time.perf_counter()
+        for _ in range(6):
+            limiter.acquire()
+        self.assertGreaterEqual(time.perf_counter() - started, 5 / 50 * 0.9)
+
+        unlimited = RateLimiter(None)
+        started = time.perf_counter()
+        for _ in range(100):
+            unlimited.acquire()
+        self.assertLess(time.perf_counter() - started, 0.05)
+
+        print("✓ Rate limiter test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -4,7 +4,7 @@ import os
 import sys
 import tempfile
 from unittest.mock import patch, MagicMock
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 # Add src directory to Python path for testing
@@ -52,6 +52,40 @@ class TestConfig:
             "SOL": list(zip(timestamps, sol_prices))
         }
     
+    @staticmethod
+    def create_price_history(prices, volumes=100.0, start="2025-10-01 00:00", epoch_ms=False):
+        """Create hourly (timestamp, price, volume) candles, one per price
+
+        Timestamps step one hour from ``start`` as real datetimes, so long
+        histories roll over days and months. A single volume applies to every
+        candle. With ``epoch_ms`` timestamps are UTC open times in milliseconds.
+        """
+        if not hasattr(volumes, "__len__"):
+            volumes = [volumes] * len(prices)
+        first = datetime.strptime(start, "%Y-%m-%d %H:%M")
+        history = []
+        for i, (price, volume) in enumerate(zip(prices, volumes)):
+            moment = first + timedelta(hours=i)
+            if epoch_ms:
+                timestamp = int(moment.replace(tzinfo=timezone.utc).timestamp() * 1000)
+            else:
+                timestamp = moment.strftime("%Y-%m-%d %H:%M")
+            history.append((timestamp, float(price), float(volume)))
+        return history
+
+    @staticmethod
+    def create_rising_history(start_price, length=10):
+        """Create a short history rising 1% per candle with growing volume"""
+        return TestConfig.create_price_history([start_price * (1 + 0.01 * i) for i in range(length)],
+                                               [100.0 + i for i in range(length)])
+
+    @staticmethod
+    def create_trending_history(length, start_price=100.0):
+        """Create a long, noisy uptrend with cycling volume starting at the beginning of 2025"""
+        return TestConfig.create_price_history([start_price + i * 0.5 + (i % 7) for i in range(length)],
+                                               [1000.0 + (i % 5) * 100 for i in range(length)],
+                                               start="2025-01-01 00:00")
+
     @staticmethod
     def create_temp_balance_file(balance_data):
         """Create a temporary balance file for testing"""
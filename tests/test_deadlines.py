@@ -0,0 +1,130 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from test_config import BaseTestCase
+from traderagent.deadlines import Deadline, DeadlineExceeded, ModelRouter, degraded_decisions, is_timeout
+from traderagent.ai_decision import request_completion, set_model_router
+from traderagent.data_fetcher import get_price_and_volume_history
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def reply(content):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    return response
+
+class TestDeadlines(BaseTestCase):
+    """Test cycle deadlines, call timeouts and model routing"""
+
+    def tearDown(self):
+        set_model_router(None)
+        super().tearDown()
+
+    def test_deadline_bounds_timeouts(self):
+        """Test that call timeouts shrink as the deadline approaches and stop at the reserve"""
+        clock = FakeClock()
+        deadline = Deadline(120, reserve=20, clock=clock)
+
+        self.assertEqual(deadline.timeout(60), 60)
+        clock.now += 70
+        self.assertEqual(deadline.timeout(60), 30)
+        self.assertFalse(deadline.expired())
+
+        clock.now += 30
+        self.assertTrue(deadline.expired())
+        self.assertEqual(deadline.remaining(), 20)
+        with self.assertRaises(DeadlineExceeded):
+            deadline.timeout(60)
+        self.assertTrue(is_timeout(DeadlineExceeded("late")))
+
+        print("✓ Deadline timeout test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_model_call_gets_timeout(self, mock_openai):
+        """Test that the deadline reaches the API call, and an expired one blocks it"""
+        clock = FakeClock()
+        deadline = Deadline(50, reserve=10, clock=clock)
+        mock_openai.return_value = reply("BTC: HOLD")
+
+        request_completion("prompt", deadline=deadline)
+        self.assertEqual(mock_openai.call_args[1]['timeout'], 40)
+
+        clock.now += 45
+        with self.assertRaises(DeadlineExceeded):
+            request_completion("prompt", deadline=deadline)
+        self.assertEqual(mock_openai.call_count, 1)
+
+        print("✓ Model call timeout test passed")
+
+    def test_router_ranks_by_rolling_latency(self):
+        """Test that the router measures unknown models, then prefers the faster one"""
+        router = ModelRouter(["gpt-4o", "gpt-4"], window=3)
+        self.assertEqual(router.route(), ("gpt-4o", "gpt-4"))
+
+        router.seed([
+            {"event": "call", "model_used": "gpt-4o", "wall_seconds": 12.0},
+            {"event": "call", "model_used": "gpt-4o", "wall_seconds": 0.0, "cached": True},
+            {"event": "parse", "failures": 0},
+        ])
+        self.assertEqual(router.ranked(), ["gpt-4", "gpt-4o"])  # gpt-4 not measured yet
+
+        for seconds in (3.0, 4.0, 5.0):
+            router.observe("gpt-4", seconds)
+        self.assertEqual(router.latency("gpt-4"), 4.0)
+        self.assertEqual(router.route(), ("gpt-4", "gpt-4o"))
+        self.assertEqual(router.route(available=6.0), ("gpt-4", None))  # gpt-4o would not finish in time
+
+        for _ in range(3):
+            router.observe("gpt-4", 1.0, ok=False)  # Failures count as full timeouts
+        self.assertEqual(router.ranked(), ["gpt-4o", "gpt-4"])
+
+        print("✓ Model router test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_timeout_fails_over_to_next_model(self, mock_openai):
+        """Test that a routed call fails over when the first model times out"""
+        router = ModelRouter(["gpt-4o", "gpt-4"])
+        set_model_router(router)
+
+        class APITimeoutError(Exception):
+            pass
+
+        mock_openai.side_effect = [APITimeoutError("Request timed out."), reply("BTC: HOLD")]
+        self.assertEqual(request_completion("prompt", response_format={"type": "json_object"}), "BTC: HOLD")
+
+        self.assertEqual(mock_openai.call_args[1]['model'], "gpt-4")
+        self.assertNotIn('response_format', mock_openai.call_args[1])
+        self.assertEqual(router.ranked(), ["gpt-4", "gpt-4o"])
+
+        print("✓ Timeout failover test passed")
+
+    def test_degraded_decisions(self):
+        """Test the local engine and HOLD fallbacks"""
+        histories = {"BTC": [(f"2025-10-01 {i:02d}:00", 100.0 + i, 10.0) for i in range(40)]}
+
+        self.assertEqual(degraded_decisions(histories, self.test_balance, engine_name=None), {"BTC": ("HOLD", 0.0)})
+        decisions = degraded_decisions(histories, self.test_balance, engine_name="ma_crossover")
+        self.assertEqual(set(decisions), {"BTC"})
+
+        print("✓ Degraded decisions test passed")
+
+    @patch('traderagent.data_fetcher.requests.get')
+    def test_fetch_respects_deadline(self, mock_get):
+        """Test that fetching stops making requests once the deadline has passed"""
+        clock = FakeClock()
+        deadline = Deadline(10, reserve=0, clock=clock)
+        clock.now += 11
+
+        history = get_price_and_volume_history("BTCUSDT", limit=5, deadline=deadline)
+
+        mock_get.assert_not_called()
+        self.assertEqual(len(history), 5)
+
+        print("✓ Fetch deadline test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
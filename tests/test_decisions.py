@@ -0,0 +1,106 @@
+import unittest
+import json
+from unittest.mock import patch, MagicMock
+from test_config import BaseTestCase
+from traderagent.decisions import (
+    Decision, DecisionParseError, RESPONSE_FORMAT, parse_reply, parse_structured, parse_text, to_tuples
+)
+from traderagent.ai_decision import get_ai_decision
+
+def structured_reply(*entries):
+    return json.dumps({"decisions": list(entries)})
+
+class TestDecisionParsing(BaseTestCase):
+    """Test typed decisions and structured/text reply parsing"""
+
+    def test_structured_reply(self):
+        """Test that a JSON reply becomes typed decisions in one pass"""
+        parsed = parse_structured(structured_reply(
+            {"coin": "btc", "action": "BUY_LONG", "percent": 50, "stop_loss": 58000, "take_profit": 70000},
+            {"coin": "SOL", "action": "CLOSE_SHORT", "percent": 100, "stop_loss": None, "take_profit": None},
+            {"coin": "ETH", "action": "HOLD", "percent": 0, "stop_loss": None, "take_profit": None},
+        ))
+
+        self.assertTrue(parsed.structured)
+        self.assertEqual(parsed.errors, [])
+        self.assertEqual(parsed.decisions["BTC"], Decision("BTC", "BUY_LONG", 0.5, 1.0, 58000.0, 70000.0))
+        self.assertEqual(to_tuples(parsed.decisions), {
+            "BTC": ("BUY_LONG", 0.5, 1.0, 58000.0, 70000.0),
+            "SOL": ("CLOSE_SHORT", 1.0),
+            "ETH": ("HOLD", 0.0),
+        })
+
+        print("✓ Structured reply test passed")
+
+    def test_invalid_entries_are_reported(self):
+        """Test that bad entries are skipped with a reason while good ones survive"""
+        parsed = parse_structured(structured_reply(
+            {"coin": "BTC", "action": "MOON", "percent": 50, "stop_loss": None, "take_profit": None},
+            {"coin": "SOL", "action": "BUY_LONG", "percent": 150, "stop_loss": None, "take_profit": None},
+            {"coin": "ETH", "action": "SELL_SHORT", "percent": "ten", "stop_loss": None, "take_profit": None},
+            {"action": "HOLD"},
+            {"coin": "ADA", "action": "SELL_SHORT", "percent": 10, "stop_loss": 1.2, "take_profit": None},
+        ))
+
+        self.assertEqual(list(parsed.decisions), ["ADA"])
+        self.assertEqual(len(parsed.errors), 4)
+
+        print("✓ Invalid entry reporting test passed")
+
+    def test_malformed_json_falls_back_to_text(self):
+        """Test the text fallback for non-JSON or broken JSON replies"""
+        with self.assertRaises(DecisionParseError):
+            parse_structured('{"decisions": ')
+        with self.assertRaises(DecisionParseError):
+            parse_structured('{"actions": []}')
+
+        parsed = parse_reply("BTC: BUY_LONG 25% 58000 NULL\nSOL: HOLD\nnot a decision")
+        self.assertFalse(parsed.structured)
+        self.assertEqual(to_tuples(parsed.decisions), {"BTC": ("BUY_LONG", 0.25, 1.0, 58000.0, None),
+                                                       "SOL": ("HOLD", 0.0)})
+
+        self.assertEqual(parse_reply('{"decisions": [').decisions, {})
+
+        print("✓ Text fallback test passed")
+
+    def test_text_parser_reports_malformed_lines(self):
+        """Test that malformed text lines are counted, not silently dropped"""
+        parsed = parse_text("BTC: BUY_LONG lots\nSOL: CLOSE_LONG 50%")
+        self.assertEqual(to_tuples(parsed.decisions), {"SOL": ("CLOSE_LONG", 0.5)})
+        self.assertEqual(len(parsed.errors), 1)
+
+        print("✓ Text parser error reporting test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_decision_requests_structured_output(self, mock_openai):
+        """Test that the model is asked for schema-constrained JSON"""
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = structured_reply(
+            {"coin": "BTC", "action": "SELL_SHORT", "percent": 20, "stop_loss": 63000, "take_profit": 55000})
+        mock_openai.return_value = mock_response
+
+        result = get_ai_decision(self.test_prices, self.test_balance)
+
+        self.assertEqual(mock_openai.call_args[1]['response_format'], RESPONSE_FORMAT)
+        self.assertIn('{"decisions": [', mock_openai.call_args[1]['messages'][0]['content'])  # System preamble
+        self.assertEqual(result, {"BTC": ("SELL_SHORT", 0.2, 1.0, 63000.0, 55000.0)})
+
+        print("✓ Structured request test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_unsupported_response_format_retries_as_text(self, mock_openai):
+        """Test that a model without structured output support still gets answered"""
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "BTC: CLOSE_LONG 100%"
+        mock_openai.side_effect = [Exception("Invalid parameter: 'response_format' is not supported"), mock_response]
+
+        result = get_ai_decision(self.test_prices, self.test_balance)
+
+        self.assertEqual(mock_openai.call_count, 2)
+        self.assertNotIn('response_format', mock_openai.call_args[1])
+        self.assertEqual(result, {"BTC": ("CLOSE_LONG", 1.0)})
+
+        print("✓ Unsupported response format test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
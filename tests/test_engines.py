@@ -0,0 +1,186 @@
+import unittest
+import copy
+import time
+from unittest.mock import patch
+import numpy as np
+from test_config import BaseTestCase, TestConfig
+from traderagent.engines import (
+    ENGINES, LLM_ENGINES, TRAINED_ENGINES, get_engine, MovingAverageCrossoverEngine, BreakoutEngine, VolumeMomentumEngine
+)
+from traderagent.backtesting import run_engine_backtest, compare_engines, execute_decisions, prefetch_decisions
+from traderagent.advanced_trader import AdvancedTrader
+
+class TestDecisionEngines(BaseTestCase):
+    """Test the local rule-based decision engines"""
+
+    def test_ma_crossover_signals(self):
+        """Test that a fresh upward cross goes long and a downward cross goes short"""
+        engine = MovingAverageCrossoverEngine(fast=3, slow=6)
+        up_cross = [100] * 10 + [110]
+        down_cross = [100] * 10 + [90]
+
+        self.assertEqual(engine.signal(TestConfig.create_price_history(up_cross)), 1)
+        self.assertEqual(engine.signal(TestConfig.create_price_history(down_cross)), -1)
+        self.assertEqual(engine.signal(TestConfig.create_price_history([100] * 11)), 0)
+        self.assertEqual(engine.signal(TestConfig.create_price_history([100] * 3)), 0)
+
+        print("✓ MA crossover signal test passed")
+
+    def test_breakout_signals(self):
+        """Test breakouts above the prior high and below the prior low"""
+        engine = BreakoutEngine(lookback=5)
+        self.assertEqual(engine.signal(TestConfig.create_price_history([100, 101, 102, 101, 100, 105])), 1)
+        self.assertEqual(engine.signal(TestConfig.create_price_history([100, 101, 102, 101, 100, 95])), -1)
+        self.assertEqual(engine.signal(TestConfig.create_price_history([100, 101, 102, 101, 100, 101])), 0)
+
+        print("✓ Breakout signal test passed")
+
+    def test_volume_momentum_needs_volume(self):
+        """Test that momentum is only followed when volume confirms it"""
+        engine = VolumeMomentumEngine(lookback=5, min_return=0.01, min_volume_ratio=1.2)
+        prices = list(np.linspace(100, 110, 25))
+        quiet = [100.0] * 25
+        busy = [100.0] * 20 + [300.0] * 5
+
+        self.assertEqual(engine.signal(TestConfig.create_price_history(prices, busy)), 1)
+        self.assertEqual(engine.signal(TestConfig.create_price_history(prices[::-1], busy)), -1)
+        self.assertEqual(engine.signal(TestConfig.create_price_history(prices, quiet)), 0)
+        self.assertEqual(engine.signal(TestConfig.create_price_history(prices, [0.0] * 25)), 0)
+
+        print("✓ Volume momentum signal test passed")
+
+    def test_decision_tuple_format(self):
+        """Test that entries use the same 5-tuple format as the LLM parser"""
+        engine = BreakoutEngine(lookback=5, percent=0.2, stop_loss_pct=0.05, take_profit_pct=0.1)
+        decisions = engine({"BTC": TestConfig.create_price_history([100, 101, 102, 101, 100, 200]),
+                            "SOL": TestConfig.create_price_history([100, 101, 102, 101, 100, 50])},
+                           self.test_balance)
+
+        self.assertEqual(decisions["BTC"], ("BUY_LONG", 0.2, 1.0, 190.0, 220.0))
+        self.assertEqual(decisions["SOL"], ("SELL_SHORT", 0.2, 1.0, 52.5, 45.0))
+
+        print("✓ Decision tuple format test passed")
+
+    def test_opposite_position_closed_first(self):
+        """Test that an open position against the signal is closed, and a matching one held"""
+        engine = BreakoutEngine(lookback=5)
+        breakout_up = TestConfig.create_price_history([100, 101, 102, 101, 100, 200])
+
+        self.test_balance["positions"]["BTC"]["short"]["amount"] = 0.5
+        self.assertEqual(engine.decide_coin("BTC", breakout_up, self.test_balance), ("CLOSE_SHORT", 1.0))
+
+        self.test_balance["positions"]["BTC"]["short"]["amount"] = 0.0
+        self.test_balance["positions"]["BTC"]["long"]["amount"] = 0.5
+        self.assertEqual(engine.decide_coin("BTC", breakout_up, self.test_balance), ("HOLD", 0.0))
+
+        print("✓ Close opposite position test passed")
+
+    def test_get_engine(self):
+        """Test engine lookup by name"""
+        self.assertIn("llm", ENGINES)
+        self.assertIsInstance(get_engine("breakout"), BreakoutEngine)
+        with self.assertRaises(ValueError):
+            get_engine("does_not_exist")
+
+        print("✓ Engine lookup test passed")
+
+class TestEngineBacktest(BaseTestCase):
+    """Test the engine-agnostic backtest runner"""
+
+    def setUp(self):
+        super().setUp()
+        rng = np.random.default_rng(3)
+        btc = 60000 * np.exp(np.cumsum(rng.normal(0, 0.01, 120)))
+        sol = 150 * np.exp(np.cumsum(rng.normal(0, 0.02, 120)))
+        volumes = rng.uniform(50, 150, 120)
+        self.market_data = {"BTC": TestConfig.create_price_history(btc, volumes),
+                            "SOL": TestConfig.create_price_history(sol, volumes)}
+
+    def test_engine_only_sees_past_candles(self):
+        """Test that the engine never sees the candle it trades on"""
+        seen = []
+
+        def engine(histories, balance, **context):
+            seen.append((len(histories["BTC"]), context.get("bar")))
+            return {}
+
+        result = run_engine_backtest(engine, self.market_data, self.test_balance, warmup=30,
+                                     context_fn=lambda i, sliced: {"bar": i}, show_progress=False)
+
+        self.assertEqual(result["bars"], 90)
+        self.assertEqual(seen[0], (30, 30))
+        self.assertEqual(seen[-1], (119, 119))
+        self.assertEqual(result["trades"], 0)
+
+        print("✓ No-lookahead backtest test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_compare_engines_without_api(self, mock_openai):
+        """Test that local engines run head-to-head without any API call"""
+        engines = {name: get_engine(name) for name in ENGINES if name not in LLM_ENGINES + TRAINED_ENGINES}
+        results = compare_engines(engines, self.market_data, self.test_balance)
+
+        self.assertEqual(set(results), set(engines))
+        self.assertEqual(self.test_balance["history"], [])  # Starting balance untouched
+        for stats in results.values():
+            self.assertEqual(stats["bars"], 90)
+            self.assertNotIn("balance", stats)
+        self.assertGreater(sum(stats["trades"] for stats in results.values()), 0)
+        mock_openai.assert_not_called()
+
+        print("✓ Engine comparison test passed")
+
+    def test_prefetch_matches_sequential(self):
+        """Test that prefetched decisions replay to the same result as a sequential run"""
+        engine = get_engine("breakout")
+        frozen = copy.deepcopy(self.test_balance)
+        sequential = run_engine_backtest(lambda h, b, **c: engine(h, frozen), self.market_data,
+                                         copy.deepcopy(self.test_balance), show_progress=False)
+        prefetched = run_engine_backtest(engine, self.market_data, copy.deepcopy(self.test_balance),
+                                         show_progress=False, prefetch_workers=4)
+
+        self.assertEqual(prefetched["engine_calls"], 90)
+        self.assertEqual(prefetched["failed_calls"], 0)
+        for key in ("trades", "decisions", "realized_pnl", "unrealized_pnl"):
+            self.assertEqual(prefetched[key], sequential[key])
+
+        print("✓ Prefetch replay test passed")
+
+    def test_prefetch_overlaps_latency_and_isolates_failures(self):
+        """Test that slow requests overlap and a failed bar holds"""
+        seen_bars = []
+
+        def slow_engine(histories, balance, **context):
+            seen_bars.append(len(histories["BTC"]))
+            time.sleep(0.01)
+            if len(histories["BTC"]) == 50:
+                raise RuntimeError("timeout")
+            return {"BTC": ("HOLD", 0.0)}
+
+        started = time.perf_counter()
+        result = prefetch_decisions(slow_engine, self.market_data, self.test_balance, max_workers=8)
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 90 * 0.01 / 2)
+        self.assertEqual(sorted(seen_bars), list(range(30, 120)))
+        self.assertEqual(result["failed_calls"], 1)
+        self.assertEqual(result["decisions"][50 - 30], {})
+        self.assertEqual(result["decisions"][51 - 30], {"BTC": ("HOLD", 0.0)})
+
+        print("✓ Prefetch concurrency test passed")
+
+    def test_execute_decisions(self):
+        """Test that decision tuples of both shapes execute against the balance"""
+        trader = AdvancedTrader(paper_trading=True)
+        executed = execute_decisions(trader, self.test_balance,
+                                     {"BTC": ("BUY_LONG", 0.1, 1.0, None, None), "SOL": ("HOLD", 0.0),
+                                      "ETH": ("BUY_LONG", 0.1, 1.0, None, None)},
+                                     {"BTC": 60000.0, "SOL": 150.0})
+
+        self.assertTrue(executed)
+        self.assertGreater(self.test_balance["positions"]["BTC"]["long"]["amount"], 0)
+
+        print("✓ Execute decisions test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
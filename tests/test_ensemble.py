@@ -0,0 +1,145 @@
+import unittest
+import json
+import time
+from unittest.mock import patch, MagicMock
+from test_config import BaseTestCase, TestConfig
+from traderagent.decisions import Decision
+from traderagent.ensemble import EnsembleEngine, EnsembleMember, vote
+from traderagent.ai_decision import start_capture, stop_capture
+from traderagent.engines import LLM_ENGINES, get_engine
+
+def reply(content):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    return response
+
+MEMBERS = [EnsembleMember("gpt-4o"), EnsembleMember("gpt-4o", temperature=0.7),
+           EnsembleMember("gpt-4", structured=False)]
+
+class TestEnsemble(BaseTestCase):
+    """Test ensemble decisions and voting"""
+
+    def setUp(self):
+        super().setUp()
+        self.market_data = {"BTC": TestConfig.create_rising_history(100.0),
+                            "SOL": TestConfig.create_rising_history(20.0)}
+
+    def test_majority_vote(self):
+        """Test majority voting, medians of the winning side and ties"""
+        result = vote({
+            "a": {"BTC": Decision("BTC", "BUY_LONG", 0.2, 1.0, 90.0, 120.0), "SOL": Decision("SOL", "HOLD", 0.0)},
+            "b": {"BTC": Decision("BTC", "BUY_LONG", 0.4, 1.0, 94.0, None), "SOL": Decision("SOL", "SELL_SHORT", 0.1)},
+            "c": {"BTC": Decision("BTC", "SELL_SHORT", 0.5, 1.0, 110.0, 80.0)},
+        })
+
+        self.assertEqual(result["decisions"]["BTC"], ("BUY_LONG", 0.3, 1.0, 92.0, 120.0))
+        self.assertAlmostEqual(result["agreement"]["BTC"], 2 / 3)
+        self.assertEqual(result["decisions"]["SOL"], ("HOLD", 0.0))  # 1-1 tie
+        self.assertEqual(result["agreement"]["SOL"], 0.0)
+
+        print("✓ Majority vote test passed")
+
+    def test_weighted_vote(self):
+        """Test that member weights can outvote a plain majority"""
+        ballots = {
+            "strong": {"BTC": Decision("BTC", "CLOSE_LONG", 1.0)},
+            "weak1": {"BTC": Decision("BTC", "HOLD", 0.0)},
+            "weak2": {"BTC": Decision("BTC", "HOLD", 0.0)},
+        }
+        self.assertEqual(vote(ballots)["decisions"]["BTC"], ("HOLD", 0.0))
+        weighted = vote(ballots, {"strong": 3.0, "weak1": 1.0, "weak2": 1.0})
+        self.assertEqual(weighted["decisions"]["BTC"], ("CLOSE_LONG", 1.0))
+        self.assertEqual(weighted["agreement"]["BTC"], 0.6)
+
+        print("✓ Weighted vote test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_members_run_concurrently(self, mock_openai):
+        """Test that members are asked in parallel with their own settings and agreement is reported"""
+        def create(model, messages, **kwargs):
+            time.sleep(0.1)
+            if 'response_format' not in kwargs:
+                return reply("BTC: SELL_SHORT 10% 110 90\nSOL: HOLD")
+            return reply(json.dumps({"decisions": [
+                {"coin": "BTC", "action": "BUY_LONG", "percent": 20, "stop_loss": 95, "take_profit": 130},
+                {"coin": "SOL", "action": "HOLD", "percent": 0, "stop_loss": None, "take_profit": None}]}))
+
+        mock_openai.side_effect = create
+        engine = EnsembleEngine(MEMBERS, budget_seconds=5)
+        started = time.perf_counter()
+        decisions = engine(self.market_data, self.test_balance)
+
+        self.assertLess(time.perf_counter() - started, 0.25)
+        self.assertEqual(decisions["BTC"], ("BUY_LONG", 0.2, 1.0, 95.0, 130.0))
+        temperatures = sorted(str(call[1].get('temperature')) for call in mock_openai.call_args_list)
+        self.assertEqual(temperatures, ["0.7", "None", "None"])
+
+        report = engine.last_report
+        self.assertEqual(report["responded"], 3)
+        self.assertEqual(report["unanimous"], 1)  # SOL
+        self.assertEqual(report["member_agreement"]["gpt-4/default/text"], 0.5)
+
+        print("✓ Concurrent ensemble test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_latency_budget(self, mock_openai):
+        """Test that slow members are left out instead of delaying the vote"""
+        def create(model, messages, **kwargs):
+            if kwargs.get('temperature') == 0.7:
+                time.sleep(1.0)
+            return reply("BTC: CLOSE_LONG 50%\nSOL: HOLD")
+
+        mock_openai.side_effect = create
+        engine = EnsembleEngine(MEMBERS, budget_seconds=0.4)
+        started = time.perf_counter()
+        start_capture()
+        decisions = engine(self.market_data, self.test_balance)
+        elapsed = time.perf_counter() - started
+        time.sleep(0.8)  # Let the late member finish
+        exchanges = stop_capture()
+
+        self.assertLess(elapsed, 0.9)
+        self.assertEqual(decisions["BTC"], ("CLOSE_LONG", 0.5))
+        self.assertEqual(engine.last_report["responded"], 2)
+        self.assertEqual(engine.last_report["late"], ["gpt-4o/t=0.7/json"])
+        self.assertEqual(len(exchanges), 2)  # The late reply is discarded, not journaled
+        for call in mock_openai.call_args_list:
+            self.assertLessEqual(call[1]["timeout"], 0.4)  # Every request is bounded by the budget
+
+        mock_openai.side_effect = Exception("service unavailable")
+        with self.assertRaises(TimeoutError):
+            engine(self.market_data, self.test_balance)
+
+        print("✓ Latency budget test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_journal_records_the_answering_model(self, mock_openai):
+        """Test that a member that fell back is journaled with the model that actually answered"""
+        def create(model, messages, **kwargs):
+            if model == "gpt-4o":
+                raise Exception("The model gpt-4o does not exist")
+            return reply("BTC: HOLD\nSOL: HOLD")
+
+        mock_openai.side_effect = create
+        engine = EnsembleEngine([EnsembleMember("gpt-4o", structured=False)], budget_seconds=5)
+        start_capture()
+        try:
+            engine(self.market_data, self.test_balance)
+        finally:
+            exchanges = stop_capture()
+
+        self.assertEqual([exchange["model"] for exchange in exchanges], ["gpt-4"])
+
+        print("✓ Answering model journal test passed")
+
+    def test_registered_engine(self):
+        """Test the ensemble through the engine registry"""
+        self.assertIn("llm_ensemble", LLM_ENGINES)
+        self.assertIsInstance(get_engine("llm_ensemble"), EnsembleEngine)
+        with self.assertRaises(ValueError):
+            EnsembleEngine(voting="ranked")
+
+        print("✓ Ensemble registry test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
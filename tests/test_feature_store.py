@@ -0,0 +1,152 @@
+import unittest
+import os
+import shutil
+import tempfile
+from unittest.mock import patch, MagicMock
+import numpy as np
+from test_config import BaseTestCase, TestConfig
+from traderagent.feature_store import (
+    FeatureStore, compute_features, FEATURE_COLUMNS, LOOKBACK
+)
+from traderagent.ai_decision import get_ai_decision_with_volume
+
+def make_history(length, start_price=100.0, start_volume=1000.0):
+    """Create a deterministic wavy hourly (open_time, price, volume) history"""
+    prices = [start_price * (1 + 0.01 * np.sin(i / 3.0)) + i * 0.1 for i in range(length)]
+    volumes = [start_volume * (1 + 0.5 * np.cos(i / 5.0)) for i in range(length)]
+    return TestConfig.create_price_history(prices, volumes, epoch_ms=True)
+
+class TestFeatureStore(BaseTestCase):
+    """Test the persistent per-candle feature store"""
+
+    def setUp(self):
+        super().setUp()
+        self.store_dir = tempfile.mkdtemp()
+        self.history = make_history(60)
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.store_dir, ignore_errors=True)
+
+    def test_compute_features_values(self):
+        """Test feature values against straightforward calculations"""
+        closes = [h[1] for h in self.history]
+        volumes = [h[2] for h in self.history]
+        features = compute_features(closes, volumes)
+
+        for column in FEATURE_COLUMNS:
+            self.assertEqual(len(features[column]), len(closes))
+
+        self.assertTrue(np.isnan(features["sma_12"][10]))
+        self.assertAlmostEqual(features["sma_12"][11], np.mean(closes[:12]))
+        self.assertAlmostEqual(features["sma_26"][-1], np.mean(closes[-26:]))
+        self.assertAlmostEqual(features["return_1"][5], closes[5] / closes[4] - 1)
+        self.assertAlmostEqual(features["volume_ratio"][-1],
+                               np.mean(volumes[-5:]) / np.mean(volumes[-20:-5]))
+        self.assertTrue(0 <= features["rsi_14"][-1] <= 100)
+
+        print("✓ Feature computation test passed")
+
+    def test_incremental_update_matches_full_compute(self):
+        """Test that candle-by-candle updates give the same columns as one pass"""
+        full = FeatureStore(root=self.store_dir)
+        full.update("BTCUSDT", self.history, persist=False)
+
+        incremental = FeatureStore(root=self.store_dir + "_inc")
+        incremental.update("BTCUSDT", self.history[:LOOKBACK + 3], persist=False)
+        for candle in self.history[LOOKBACK + 3:]:
+            self.assertEqual(incremental.update("BTCUSDT", [candle], persist=False), 1)
+
+        full_columns = full.get_columns("BTCUSDT")
+        incremental_columns = incremental.get_columns("BTCUSDT")
+        for column in FEATURE_COLUMNS:
+            np.testing.assert_allclose(incremental_columns[column], full_columns[column], equal_nan=True)
+
+        print("✓ Incremental update test passed")
+
+    def test_persistence_round_trip(self):
+        """Test that columns persist to disk and reload in a new store"""
+        store = FeatureStore(root=self.store_dir)
+        written = store.update("SOLUSDT", self.history)
+        self.assertEqual(written, len(self.history))
+        self.assertTrue(os.path.exists(os.path.join(self.store_dir, "SOLUSDT_1h_v1.npz")))
+
+        reloaded = FeatureStore(root=self.store_dir)
+        self.assertEqual(reloaded.latest("SOLUSDT"), store.latest("SOLUSDT"))
+
+        # Re-sending the same candles writes only the still-forming last one
+        self.assertEqual(reloaded.update("SOLUSDT", self.history), 1)
+
+        # A different feature version never reads the old columns
+        other_version = FeatureStore(root=self.store_dir, feature_version=2)
+        self.assertIsNone(other_version.latest("SOLUSDT"))
+
+        print("✓ Persistence round trip test passed")
+
+    def test_forming_candle_is_replaced(self):
+        """Test that an updated close for the latest open_time replaces the row"""
+        store = FeatureStore(root=self.store_dir)
+        store.update("BTCUSDT", self.history, persist=False)
+
+        open_time, price, volume = self.history[-1]
+        store.update("BTCUSDT", [(open_time, price * 1.05, volume)], persist=False)
+
+        columns = store.get_columns("BTCUSDT")
+        self.assertEqual(len(columns["open_time"]), len(self.history))
+        self.assertAlmostEqual(columns["close"][-1], price * 1.05)
+
+        print("✓ Forming candle replacement test passed")
+
+    def test_rejects_fallback_data(self):
+        """Test that generated fallback data (one timestamp for every candle) is never stored"""
+        store = FeatureStore(root=self.store_dir)
+        fallback = [("2025-10-01 12:34", 100.0 + i, 1000.0) for i in range(30)]
+        self.assertEqual(store.update("BTCUSDT", fallback, persist=False), 0)
+        self.assertIsNone(store.latest("BTCUSDT"))
+
+        store.update("BTCUSDT", self.history, persist=False)
+        misaligned = [(self.history[-1][0] + 90 * 60 * 1000, 1.0, 1.0)]
+        self.assertEqual(store.update("BTCUSDT", misaligned, persist=False), 0)
+        shuffled = [self.history[-1], self.history[-2]]
+        self.assertEqual(store.update("BTCUSDT", shuffled, persist=False), 0)
+        self.assertEqual(len(store.get_columns("BTCUSDT")["open_time"]), len(self.history))
+
+        print("✓ Fallback data rejection test passed")
+
+    def test_get_row_and_until(self):
+        """Test point lookups and prefix slicing used by backtests"""
+        store = FeatureStore(root=self.store_dir)
+        store.update("BTCUSDT", self.history, persist=False)
+
+        row = store.get_row("BTCUSDT", self.history[40][0])
+        self.assertEqual(row["open_time"], self.history[40][0])
+        self.assertAlmostEqual(row["close"], self.history[40][1])
+        self.assertIsNone(store.get_row("BTCUSDT", self.history[0][0] - 1))
+
+        prefix = store.get_columns("BTCUSDT", until=self.history[40][0])
+        self.assertEqual(len(prefix["open_time"]), 41)
+
+        print("✓ Row lookup test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_prompt_reads_store_indicators(self, mock_openai):
+        """Test that prompt building reads precomputed indicators"""
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "BTC: HOLD"
+        mock_openai.return_value = mock_response
+
+        store = FeatureStore(root=self.store_dir)
+        history = [(f"2025-10-{1 + i // 24:02d} {i % 24:02d}:00", 60000.0 + i * 10, 100.0 + i)
+                   for i in range(30)]
+        store.update_market_data({"BTC": history}, persist=False)
+
+        get_ai_decision_with_volume({"BTC": history}, self.test_balance, feature_store=store)
+
+        prompt = mock_openai.call_args[1]['messages'][-1]['content']
+        row = store.get_row("BTCUSDT", history[-1][0])
+        self.assertIn(f"SMA12 {row['sma_12']:.2f}", prompt)
+
+        print("✓ Prompt indicator test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
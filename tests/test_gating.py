@@ -0,0 +1,115 @@
+import unittest
+import tempfile
+from pathlib import Path
+from unittest.mock import MagicMock
+from test_config import BaseTestCase, TestConfig
+from traderagent.gating import DecisionGate, GatedEngine, fingerprint, snapshot
+
+def make_history(last_price, volume=100.0, bars=30):
+    """Flat history ending at last_price with constant volume"""
+    return TestConfig.create_price_history([100.0] * (bars - 1) + [last_price], volume)
+
+class TestDecisionGate(BaseTestCase):
+    """Test change-gated decision calls"""
+
+    def setUp(self):
+        super().setUp()
+        self.engine = MagicMock(side_effect=lambda histories, balance, **context:
+                                {coin: ("BUY_LONG", 0.1, 1.0, None, None) for coin in histories})
+        self.gated = GatedEngine(self.engine, DecisionGate(price_threshold=0.01, max_skips=3))
+
+    def test_unchanged_inputs_skip_the_engine(self):
+        """Test that the engine is called once, then skipped while nothing moves"""
+        market = {"BTC": make_history(100.0), "SOL": make_history(100.0)}
+
+        first = self.gated(market, self.test_balance)
+        second = self.gated({"BTC": make_history(100.5), "SOL": make_history(99.5)}, self.test_balance)
+
+        self.assertEqual(self.engine.call_count, 1)
+        self.assertEqual(first["BTC"][0], "BUY_LONG")
+        self.assertEqual(second, {"BTC": ("HOLD", 0.0), "SOL": ("HOLD", 0.0)})
+        self.assertEqual(self.gated.gate.skipped, 2)
+
+        print("✓ Unchanged inputs test passed")
+
+    def test_only_changed_coins_are_sent(self):
+        """Test that price moves, volume regime changes and position changes re-open the gate"""
+        self.gated({"BTC": make_history(100.0), "SOL": make_history(100.0), "ETH": make_history(100.0)},
+                   self.test_balance)
+
+        spiked = make_history(100.0)
+        spiked[-5:] = [(t, p, 1000.0) for t, p, _ in spiked[-5:]]
+        balance = {**self.test_balance, "positions": {"ETH": {"long": {"amount": 0.5, "avg_price": 100.0},
+                                                              "short": {"amount": 0, "avg_price": 0}}}}
+        decisions = self.gated({"BTC": make_history(101.5), "SOL": spiked, "ETH": make_history(100.0)}, balance)
+
+        sent = self.engine.call_args[0][0]
+        self.assertEqual(set(sent), {"BTC", "SOL", "ETH"})
+        self.assertEqual(decisions["BTC"][0], "BUY_LONG")
+
+        self.gated({"BTC": make_history(101.6), "SOL": spiked, "ETH": make_history(104.0)}, balance)
+        self.assertEqual(set(self.engine.call_args[0][0]), {"ETH"})
+
+        print("✓ Changed coins test passed")
+
+    def test_own_trades_do_not_reopen_the_gate(self):
+        """Test that anchoring to the post-trade balance keeps a traded coin gated"""
+        gate = DecisionGate(price_threshold=0.01)
+        market = {"BTC": make_history(100.0)}
+        selected, snapshots = gate.select(market, self.test_balance)
+        traded = {**self.test_balance, "positions": {"BTC": {"long": {"amount": 0.5, "avg_price": 100.0},
+                                                              "short": {"amount": 0, "avg_price": 0}}}}
+        gate.commit(snapshots, selected, traded)
+
+        self.assertEqual(gate.select(market, traded)[0], [])
+        self.assertEqual(gate.select(market, self.test_balance)[0], ["BTC"])  # Closed since: a real change
+
+        print("✓ Post-trade anchor test passed")
+
+    def test_coins_without_a_decision_are_retried(self):
+        """Test that a coin the engine returned nothing for is not anchored"""
+        self.engine.side_effect = lambda histories, balance, **context: {"BTC": ("HOLD", 0.0)}
+        market = {"BTC": make_history(100.0), "SOL": make_history(100.0)}
+        self.gated(market, self.test_balance)
+        self.gated(market, self.test_balance)
+
+        self.assertEqual(set(self.engine.call_args[0][0]), {"SOL"})
+
+        print("✓ Missing decision retry test passed")
+
+    def test_stale_coins_are_refreshed(self):
+        """Test that a coin is re-decided after max_skips quiet cycles"""
+        market = {"BTC": make_history(100.0)}
+        for _ in range(5):
+            self.gated(market, self.test_balance)
+
+        self.assertEqual(self.engine.call_count, 2)  # Initial call + refresh after 3 skips
+
+        print("✓ Stale refresh test passed")
+
+    def test_state_persists(self):
+        """Test that anchors survive a save/load round trip"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "gate.json"
+            self.gated({"BTC": make_history(100.0)}, self.test_balance)
+            self.gated.gate.save(path)
+
+            gate = DecisionGate.load(path, price_threshold=0.01)
+            selected, _ = gate.select({"BTC": make_history(100.2)}, self.test_balance)
+            self.assertEqual(selected, [])
+
+        print("✓ Gate persistence test passed")
+
+    def test_fingerprint_quantizes_price(self):
+        """Test that small price noise keeps the fingerprint while positions change it"""
+        base = snapshot("BTC", make_history(100.0), self.test_balance)
+        noisy = snapshot("BTC", make_history(100.01), self.test_balance)
+        moved = dict(base, positions=[0.1, 0.0])
+
+        self.assertEqual(fingerprint(base), fingerprint(noisy))
+        self.assertNotEqual(fingerprint(base), fingerprint(moved))
+
+        print("✓ Fingerprint test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
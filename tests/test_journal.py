@@ -0,0 +1,115 @@
+import unittest
+import copy
+import json
+import tempfile
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+from test_config import BaseTestCase, TestConfig
+from traderagent.ai_decision import get_ai_decision_with_volume, start_capture, stop_capture
+from traderagent.advanced_trader import AdvancedTrader
+from traderagent.backtesting import execute_decisions
+from traderagent.journal import DecisionJournal, replay, replay_record
+
+def structured_reply(percent):
+    response = MagicMock()
+    response.choices[0].message.content = json.dumps({"decisions": [
+        {"coin": "BTC", "action": "BUY_LONG", "percent": percent, "stop_loss": 95, "take_profit": 130},
+        {"coin": "SOL", "action": "HOLD", "percent": 0, "stop_loss": None, "take_profit": None}]})
+    return response
+
+class TestDecisionJournal(BaseTestCase):
+    """Test the decision journal and offline replay"""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.journal = DecisionJournal(Path(self.tmp.name) / "journal.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        super().tearDown()
+
+    def run_cycle(self, end_hour, percent):
+        """One live-style cycle: decide with capture, execute, journal"""
+        histories = {"BTC": TestConfig.create_rising_history(100.0, end_hour),
+                     "SOL": TestConfig.create_rising_history(20.0, end_hour)}
+        balance = copy.deepcopy(self.test_balance)
+        balance_before = copy.deepcopy(balance)
+        with patch('traderagent.ai_decision.client.chat.completions.create', return_value=structured_reply(percent)):
+            start_capture()
+            decisions = get_ai_decision_with_volume(histories, balance)
+            exchanges = stop_capture()
+        execute_decisions(AdvancedTrader(paper_trading=True), balance,
+                          decisions, {coin: history[-1][1] for coin, history in histories.items()})
+        return self.journal.append("llm", histories, balance_before, balance, decisions, exchanges, 0.5,
+                                   context={"structured": True})
+
+    def test_record_contents(self):
+        """Test that a cycle record carries inputs, prompt, reply, decisions and trades"""
+        record = self.run_cycle(10, 25)
+
+        self.assertEqual(record["id"], 0)
+        self.assertEqual(record["bar_time"], "2025-10-01 09:00")
+        self.assertEqual(len(record["exchanges"]), 1)
+        self.assertIn("BTC price trend", record["exchanges"][0]["prompt"])
+        self.assertEqual(record["decisions"]["BTC"], ["BUY_LONG", 0.25, 1.0, 95.0, 130.0])
+        self.assertTrue(any("BTC" in trade for trade in record["trades"]))
+        self.assertIn("rsi_14", record["features"]["BTC"]["indicators"])
+        self.assertNotIn("history", record["balance"])
+
+        print("✓ Journal record test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_replay_is_identical_without_api(self, mock_openai):
+        """Test that replay reproduces decisions and balances with no API calls"""
+        for end_hour, percent in ((10, 25), (11, 10), (12, 50)):
+            self.run_cycle(end_hour, percent)
+
+        report = replay(self.journal)
+
+        mock_openai.assert_not_called()
+        self.assertEqual(report["cycles"], 3)
+        self.assertEqual(report["decisions_matched"], 3)
+        self.assertEqual(report["states_matched"], 3)
+        self.assertEqual(report["prompt_divergences"], 0)
+        self.assertEqual(report["mismatched_ids"], [])
+
+        print("✓ Bit-for-bit replay test passed")
+
+    def test_replay_detects_drift(self):
+        """Test that changed inputs show up as prompt divergence and a different outcome"""
+        record = self.run_cycle(10, 25)
+        record["balance"]["USD"] = 5000.0
+
+        result = replay_record(record)
+
+        self.assertEqual(result["prompt_divergences"], 1)
+        self.assertTrue(result["decisions_match"])  # Same journaled reply
+        self.assertFalse(result["state_match"])  # ...but a different resulting balance
+
+        print("✓ Replay drift detection test passed")
+
+    def test_index_and_periods(self):
+        """Test period selection through the index and index rebuilding"""
+        for end_hour in (10, 11, 12, 13):
+            self.run_cycle(end_hour, 10)
+
+        period = [r["id"] for r in self.journal.records("2025-10-01 10:00", "2025-10-01 11:00")]
+        self.assertEqual(period, [1, 2])
+        self.assertEqual(self.journal.get(3)["bar_time"], "2025-10-01 12:00")
+
+        self.journal.index_path.unlink()
+        self.assertEqual(len(self.journal), 4)
+        self.assertEqual(self.journal.get(2)["id"], 2)
+
+        # A journal updated elsewhere (e.g. pulled from CI) no longer matches the local index
+        stale_index = self.journal.index_path.read_text()
+        self.run_cycle(14, 10)
+        self.journal.index_path.write_text(stale_index)
+        self.assertEqual(len(self.journal), 5)
+        self.assertEqual(self.journal.get(4)["bar_time"], "2025-10-01 13:00")
+
+        print("✓ Journal index test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,114 @@
+import unittest
+import json
+import threading
+import time
+from unittest.mock import patch, MagicMock
+from test_config import BaseTestCase, TestConfig
+from traderagent.ai_decision import get_ai_decision_per_coin
+from traderagent.engines import get_engine, LLM_ENGINES
+
+def reply(content):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    return response
+
+def coin_of(messages):
+    """The coin a per-coin prompt asks about"""
+    return messages[-1]['content'].rsplit("What is your recommended action for ", 1)[1].split("?")[0]
+
+class TestPerCoinDecisions(BaseTestCase):
+    """Test per-coin decision fan-out"""
+
+    def setUp(self):
+        super().setUp()
+        self.coins = ["BTC", "SOL", "ETH", "ADA", "DOGE", "XRP"]
+        self.market_data = {coin: TestConfig.create_rising_history(100 + 10 * i) for i, coin in enumerate(self.coins)}
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_prompts_are_per_coin(self, mock_openai):
+        """Test that each prompt carries one coin's data plus the shared portfolio"""
+        prompts = {}
+
+        def create(model, messages, **kwargs):
+            coin = coin_of(messages)
+            prompts[coin] = messages[-1]['content']
+            return reply(json.dumps({"decisions": [
+                {"coin": coin, "action": "HOLD", "percent": 0, "stop_loss": None, "take_profit": None}]}))
+
+        mock_openai.side_effect = create
+        decisions = get_ai_decision_per_coin(self.market_data, self.test_balance)
+
+        self.assertEqual(decisions, {coin: ("HOLD", 0.0) for coin in self.coins})
+        for coin, prompt in prompts.items():
+            self.assertIn(f"{coin} price trend", prompt)
+            self.assertIn("USD: $10000.00", prompt)
+            others = [other for other in self.coins if other != coin]
+            self.assertFalse(any(f"{other} price trend" in prompt for other in others))
+
+        print("✓ Per-coin prompt test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_requests_overlap_within_bound(self, mock_openai):
+        """Test that requests run concurrently but never beyond max_workers"""
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def create(model, messages, **kwargs):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+            return reply(f"{coin_of(messages)}: HOLD")
+
+        mock_openai.side_effect = create
+        started = time.perf_counter()
+        decisions = get_ai_decision_per_coin(self.market_data, self.test_balance, max_workers=3)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(len(decisions), 6)
+        self.assertEqual(peak, 3)
+        self.assertLess(elapsed, 6 * 0.05)
+
+        print("✓ Bounded concurrency test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_failures_stay_isolated(self, mock_openai):
+        """Test that one failed request or stray line affects only its own coin"""
+        def create(model, messages, **kwargs):
+            coin = coin_of(messages)
+            if coin == "SOL":
+                raise RuntimeError("connection reset")
+            if coin == "ETH":
+                return reply("garbage")
+            if coin == "ADA":
+                return reply("BTC: SELL_SHORT 100% 1 1\nADA: BUY_LONG 10% 90 130")  # Stray BTC line ignored
+            return reply(f"{coin}: HOLD")
+
+        mock_openai.side_effect = create
+        decisions = get_ai_decision_per_coin(self.market_data, self.test_balance, structured=False)
+
+        self.assertNotIn("SOL", decisions)
+        self.assertNotIn("ETH", decisions)
+        self.assertEqual(decisions["BTC"], ("HOLD", 0.0))
+        self.assertEqual(decisions["ADA"], ("BUY_LONG", 0.1, 1.0, 90.0, 130.0))
+        self.assertNotIn('response_format', mock_openai.call_args[1])
+
+        print("✓ Failure isolation test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_available_as_engine(self, mock_openai):
+        """Test the per-coin mode through the engine registry"""
+        mock_openai.side_effect = lambda model, messages, **kwargs: reply(f"{coin_of(messages)}: HOLD")
+        self.assertIn("llm_per_coin", LLM_ENGINES)
+
+        decisions = get_engine("llm_per_coin")({"BTC": self.market_data["BTC"]}, self.test_balance)
+        self.assertEqual(decisions, {"BTC": ("HOLD", 0.0)})
+
+        print("✓ Per-coin engine test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
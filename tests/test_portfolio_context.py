@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from test_config import BaseTestCase, TestConfig
+from traderagent import ai_decision
+from traderagent.ai_decision import format_portfolio, get_ai_decision_per_coin
+from traderagent.portfolio_context import PortfolioContext
+
+def reply(content):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    return response
+
+class TestPortfolioContext(BaseTestCase):
+    """Test the cached positions and margin prompt block"""
+
+    def setUp(self):
+        super().setUp()
+        self.balance = TestConfig.create_test_balance()
+        self.balance["margin"] = {"available": 9000.0, "used": 1000.0}
+        self.balance["realized_pnl"] = 12.5
+        self.balance["positions"]["BTC"]["long"].update(amount=0.015, avg_price=60000.0)
+
+    def test_render(self):
+        """Test the rendered block"""
+        self.assertEqual(PortfolioContext().text(self.balance), """Your current balance and holdings:
+USD: $10000.00
+Realized P&L: $12.50
+Margin Available: $9000.00, Used: $1000.00
+
+Current Positions:
+BTC LONG: 0.015000 @ 60000.00""")
+        self.assertTrue(PortfolioContext.render({"USD": 5.0}).endswith("Current Positions: None"))
+
+        print("✓ Portfolio render test passed")
+
+    def test_reused_until_balance_changes(self):
+        """Test that the block is rendered once per balance state, in-place changes included"""
+        context = PortfolioContext()
+        first = context.text(self.balance)
+        self.assertIs(context.text(self.balance), first)
+        self.assertEqual(context.text(dict(self.balance)), first)  # Same state, different dict
+        self.assertEqual((context.renders, context.hits), (1, 2))
+
+        self.balance["positions"]["SOL"]["short"].update(amount=2.0, avg_price=150.0)
+        self.assertIn("SOL SHORT: 2.000000 @ 150.00", context.text(self.balance))
+        self.balance["margin"]["used"] = 1500.0
+        self.assertIn("Used: $1500.00", context.text(self.balance))
+        self.assertEqual(context.renders, 3)
+
+        context.invalidate()
+        context.text(self.balance)
+        self.assertEqual(context.renders, 4)
+
+        print("✓ Portfolio reuse test passed")
+
+    def test_bounded_entries(self):
+        """Test that only the most recent balance states are kept"""
+        context = PortfolioContext(max_entries=2)
+        for usd in (1.0, 2.0, 3.0):
+            context.text({"USD": usd})
+        context.text({"USD": 3.0})
+        context.text({"USD": 1.0})
+        self.assertEqual(context.renders, 4)
+
+        print("✓ Bounded entries test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_rendered_once_per_cycle(self, mock_openai):
+        """Test that per-coin prompts share one rendering of the portfolio"""
+        mock_openai.side_effect = lambda model, messages, **kwargs: reply(
+            "BTC: HOLD" if "for BTC" in messages[-1]["content"] else "SOL: HOLD")
+        history = [(f"2025-10-01 {i:02d}:00", 100.0 + i, 10.0) for i in range(10)]
+
+        with patch.object(ai_decision, "_portfolio_context", PortfolioContext()) as context:
+            get_ai_decision_per_coin({"BTC": history, "SOL": history}, self.balance, structured=False)
+            format_portfolio(self.balance)
+            self.assertEqual(context.renders, 1)
+
+        print("✓ Once-per-cycle render test passed")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import json
+import tempfile
+from pathlib import Path
+from test_config import BaseTestCase
+from traderagent.journal import DecisionJournal
+from traderagent.prompt_bench import (
+    compare, journal_corpus, load_baseline, run_benchmark, save_baseline, slowdowns, synthetic_corpus
+)
+
+class TestPromptBench(BaseTestCase):
+    """Test the offline prompt/response benchmark"""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.corpus = synthetic_corpus()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        super().tearDown()
+
+    def test_corpus_is_deterministic(self):
+        """Test that the synthetic corpus is identical on every call"""
+        self.assertEqual(synthetic_corpus(), self.corpus)
+        self.assertNotEqual(synthetic_corpus(seed=1)[0]["histories"], self.corpus[0]["histories"])
+        self.assertIn("many_coins", [snapshot["name"] for snapshot in self.corpus])
+
+        print("✓ Deterministic corpus test passed")
+
+    def test_benchmark_report(self):
+        """Test that every variant is measured and the stand-in replies parse"""
+        report = run_benchmark(self.corpus[:2], repeat=1)
+
+        self.assertEqual(set(report["summary"]), {"text", "json", "per_coin"})
+        self.assertEqual(len(report["cases"]), 6)
+        for stats in report["summary"].values():
+            self.assertEqual(stats["parse_failure_rate"], 0.0)
+            self.assertGreater(stats["prompt_tokens_mean"], 100)
+            self.assertGreater(stats["build_ms_mean"], 0.0)
+        per_coin = next(case for case in report["cases"] if case["variant"] == "per_coin")
+        self.assertEqual(per_coin["prompts"], 2)
+
+        print("✓ Benchmark report test passed")
+
+    def test_regressions_against_baseline(self):
+        """Test that token growth and parse failures are flagged, timing noise is not"""
+        report = run_benchmark(self.corpus[:1], variants=["text"], repeat=1)
+        path = Path(self.tmp.name) / "baseline.json"
+        save_baseline(report, path)
+        baseline = load_baseline(path)
+        self.assertEqual(compare(report, baseline), [])
+
+        bloated = json.loads(json.dumps(report))
+        bloated["summary"]["text"]["prompt_tokens_mean"] *= 1.2
+        bloated["summary"]["text"]["build_ms_mean"] *= 1.5
+        bloated["summary"]["text"]["parse_failure_rate"] = 0.5
+        regressions = compare(bloated, baseline)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(any("prompt_tokens_mean" in r for r in regressions))
+        self.assertTrue(any("parse failures" in r for r in regressions))
+
+        noisy = json.loads(json.dumps(report))
+        noisy["summary"]["text"]["parse_ms_mean"] = baseline["summary"]["text"]["parse_ms_mean"] * 3
+        self.assertEqual(compare(noisy, baseline), [])
+        self.assertEqual(slowdowns(noisy, baseline), [])  # Under the 1 ms floor
+        noisy["summary"]["text"]["build_ms_mean"] = baseline["summary"]["text"]["build_ms_mean"] * 3 + 5
+        self.assertEqual(len(slowdowns(noisy, baseline)), 1)
+        self.assertIsNone(load_baseline(Path(self.tmp.name) / "missing.json"))
+
+        print("✓ Baseline comparison test passed")
+
+    def test_journal_corpus(self):
+        """Test benchmarking journaled cycles against their recorded replies"""
+        journal = DecisionJournal(Path(self.tmp.name) / "journal.jsonl")
+        snapshot = self.corpus[0]
+        exchanges = [{"model": "gpt-4o", "messages_hash": "stale", "prompt": "", "raw": "BTC: HOLD\nSOL: HOLD",
+                      "cached": False}]
+        journal.append("llm", snapshot["histories"], snapshot["balance"], snapshot["balance"],
+                       {"BTC": ("HOLD", 0.0), "SOL": ("HOLD", 0.0)}, exchanges, 1.0,
+                       context={"structured": False})
+        journal.append("surrogate", snapshot["histories"], snapshot["balance"], snapshot["balance"], {}, [], 0.1)
+
+        corpus = journal_corpus(journal)
+        self.assertEqual([(s["name"], s["variant"]) for s in corpus], [("journal#0", "text")])
+
+        report = run_benchmark(corpus, repeat=1)
+        self.assertEqual(list(report["summary"]), ["text"])
+        self.assertEqual(report["summary"]["text"]["parse_failure_rate"], 0.0)
+        self.assertEqual(report["summary"]["text"]["prompt_divergences"], 1)  # Prompt changed since recording
+
+        print("✓ Journal corpus test passed")
+
+if __name__ == '__main__':
+    unittest.main()
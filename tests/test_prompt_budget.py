@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from test_config import BaseTestCase, TestConfig
+from traderagent.prompt_budget import DETAIL_LEVELS, estimate_tokens, fit_to_budget
+from traderagent.ai_decision import build_budgeted_prompt, format_coin_block, get_ai_decision_with_volume
+from traderagent.timeframes import build_feature_bundle
+
+COINS = ["BTC", "SOL", "ETH", "ADA", "XRP", "DOGE", "DOT", "LINK", "AVAX", "ATOM", "LTC", "UNI"]
+
+def reply(content):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    return response
+
+class TestPromptBudget(BaseTestCase):
+    """Test token-budgeted decision prompts"""
+
+    def setUp(self):
+        super().setUp()
+        self.market_data = {coin: TestConfig.create_trending_history(300, 10.0 * (i + 1))
+                            for i, coin in enumerate(COINS)}
+        self.bundle = build_feature_bundle(self.market_data)
+        self.balance = TestConfig.create_test_balance()
+
+    def test_estimate_tokens(self):
+        """Test the local token estimate"""
+        self.assertEqual(estimate_tokens(""), 1)
+        self.assertEqual(estimate_tokens("abcdefgh"), 2)
+        self.assertEqual(estimate_tokens("abcdefghi"), 3)
+        self.assertEqual(estimate_tokens("▁▂▃▄"), 4)  # Non-ASCII characters count one each
+
+        print("✓ Token estimate test passed")
+
+    def test_detail_levels_shrink(self):
+        """Test that every detail level renders a smaller block that still names the coin"""
+        sizes = []
+        for level in range(len(DETAIL_LEVELS)):
+            block = format_coin_block("BTC", self.market_data["BTC"], feature_bundle=self.bundle, detail=level)
+            self.assertTrue(block.startswith("BTC price trend"))
+            sizes.append(estimate_tokens(block))
+        self.assertEqual(sizes, sorted(sizes, reverse=True))
+        self.assertEqual(len(set(sizes)), len(DETAIL_LEVELS))
+
+        print("✓ Detail level test passed")
+
+    def test_fit_steps_down_largest_first(self):
+        """Test that the largest block loses detail first and the result fits"""
+        sizes = {"A": [400, 200, 100, 40], "B": [160, 120, 60, 40]}
+        levels, blocks = fit_to_budget(["A", "B"], lambda coin, level: "x" * sizes[coin][level],
+                                       lambda blocks: "".join(blocks), 60)
+        self.assertEqual(levels, {"A": 2, "B": 1})
+        self.assertLessEqual(estimate_tokens("".join(blocks)), 60)
+
+        # Over budget even at minimal detail: the minimal prompt is still returned
+        levels, blocks = fit_to_budget(["A", "B"], lambda coin, level: "x" * sizes[coin][level],
+                                       lambda blocks: "".join(blocks), 10)
+        self.assertEqual(levels, {"A": 3, "B": 3})
+        self.assertEqual(blocks, ["x" * 40, "x" * 40])
+
+        print("✓ Budget fitting test passed")
+
+    def test_many_coins_within_budget(self):
+        """Test that a prompt for many coins fits the budget and still covers every coin"""
+        system, full = build_budgeted_prompt(self.market_data, self.balance, token_budget=100000,
+                                             feature_bundle=self.bundle)
+        full_tokens = estimate_tokens(system + "\n" + full)
+
+        for budget in (full_tokens // 2, 1000):
+            system, prompt = build_budgeted_prompt(self.market_data, self.balance, token_budget=budget,
+                                                   feature_bundle=self.bundle)
+            self.assertLessEqual(estimate_tokens(system + "\n" + prompt), budget)
+            for coin in COINS:
+                self.assertIn(f"{coin} price trend", prompt)
+            self.assertIn(", ".join(COINS), prompt)
+
+        self.assertNotIn("BTC and SOL", system)
+
+        system, prompt = build_budgeted_prompt(self.market_data, self.balance, token_budget=10,
+                                               feature_bundle=self.bundle)
+        for coin in COINS:
+            self.assertIn(f"{coin} price trend", prompt)
+
+        print("✓ Many-coin budget test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_decision_prompt_respects_budget(self, mock_openai):
+        """Test that the decision request sends a prompt within the token budget"""
+        mock_openai.return_value = reply("\n".join(f"{coin}: HOLD" for coin in COINS))
+
+        decisions = get_ai_decision_with_volume(self.market_data, self.balance, feature_bundle=self.bundle,
+                                                structured=False, token_budget=1500)
+
+        messages = mock_openai.call_args[1]['messages']
+        self.assertLessEqual(estimate_tokens(messages[0]['content'] + "\n" + messages[1]['content']), 1500)
+        self.assertEqual(set(decisions), set(COINS))
+
+        print("✓ Decision prompt budget test passed")
+
+if __name__ == '__main__':
+    unittest.main()
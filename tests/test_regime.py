@@ -0,0 +1,128 @@
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+from test_config import BaseTestCase
+from traderagent.regime import (
+    RegimeDetector, RegimeChange, TREND_UP, TREND_DOWN, RANGE, HIGH_VOL, UNKNOWN
+)
+
+def feed(detector, coin, prices):
+    """Feed prices one by one and collect regime changes"""
+    changes = []
+    for price in prices:
+        change = detector.update(coin, price)
+        if change:
+            changes.append(change)
+    return changes
+
+class TestRegimeDetector(BaseTestCase):
+    """Test market regime classification and persistence"""
+
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.temp_dir, "regime_state.json")
+        self.rng = np.random.default_rng(11)
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_warmup_is_unknown(self):
+        """Test that no regime is reported before the window fills"""
+        detector = RegimeDetector(window=24)
+        self.assertEqual(feed(detector, "BTC", np.linspace(100, 110, 10)), [])
+        self.assertEqual(detector.regime("BTC"), UNKNOWN)
+
+        print("✓ Regime warmup test passed")
+
+    def test_trend_up_and_down(self):
+        """Test that steady drifts classify as trends"""
+        detector = RegimeDetector(window=24)
+        up = 100 * np.exp(np.cumsum(0.01 + self.rng.normal(0, 0.002, 40)))
+        feed(detector, "BTC", up)
+        self.assertEqual(detector.regime("BTC"), TREND_UP)
+
+        down = up[-1] * np.exp(np.cumsum(-0.01 + self.rng.normal(0, 0.002, 40)))
+        changes = feed(detector, "BTC", down)
+        self.assertEqual(detector.regime("BTC"), TREND_DOWN)
+        self.assertEqual(changes[-1].current, TREND_DOWN)
+
+        print("✓ Trend classification test passed")
+
+    def test_range_and_high_vol(self):
+        """Test that noise is a range and a volatility burst is high-vol"""
+        detector = RegimeDetector(window=24)
+        # Alternate up/down moves so the mean return stays near zero
+        calm = 100 * np.exp(np.cumsum(np.tile([0.002, -0.002], 150)))
+        feed(detector, "SOL", calm)
+        self.assertEqual(detector.regime("SOL"), RANGE)
+
+        wild = calm[-1] * np.exp(np.cumsum(np.tile([0.03, -0.03], 10)))
+        changes = feed(detector, "SOL", wild)
+        self.assertEqual(detector.regime("SOL"), HIGH_VOL)
+        self.assertIsInstance(changes[-1], RegimeChange)
+        self.assertEqual(changes[-1].previous, RANGE)
+
+        print("✓ Range and high-vol classification test passed")
+
+    def test_confirmation_filters_single_bar_flips(self):
+        """Test that a one-candle blip does not emit a regime change"""
+        detector = RegimeDetector(window=24, confirm_bars=3)
+        calm = 100 * np.exp(np.cumsum(np.tile([0.002, -0.002], 100)))
+        feed(detector, "BTC", calm)
+        self.assertEqual(detector.regime("BTC"), RANGE)
+
+        changes = feed(detector, "BTC", [calm[-1] * 1.05, calm[-1]])
+        self.assertEqual(changes, [])
+
+        print("✓ Regime confirmation test passed")
+
+    def test_state_persists_between_runs(self):
+        """Test that saved state resumes without re-counting old candles"""
+        history = [(f"2025-10-{1 + i // 24:02d} {i % 24:02d}:00", 100 * 1.01 ** i) for i in range(48)]
+
+        first_run = RegimeDetector.load(self.state_file)
+        first_changes = first_run.update_market_data({"BTC": history})
+        first_run.save(self.state_file)
+        self.assertEqual(first_changes[-1].current, TREND_UP)
+
+        second_run = RegimeDetector.load(self.state_file)
+        self.assertEqual(second_run.regime("BTC"), TREND_UP)
+
+        # Same candles again: nothing new, so no regime-change event
+        self.assertEqual(second_run.update_market_data({"BTC": history}), [])
+
+        print("✓ Regime persistence test passed")
+
+    def test_forming_candle_is_replaced(self):
+        """Test that a re-fetched last candle replaces its earlier close instead of being skipped"""
+        history = [(f"2025-10-{1 + i // 24:02d} {i % 24:02d}:00", 100 * 1.01 ** i) for i in range(30)]
+        forming = history[:-1] + [(history[-1][0], history[-1][1] * 0.9)]
+
+        replaced = RegimeDetector()
+        replaced.update_history("BTC", forming)
+        replaced.save(self.state_file)
+        replaced = RegimeDetector.load(self.state_file)
+        replaced.update_history("BTC", history)
+
+        direct = RegimeDetector()
+        direct.update_history("BTC", history)
+        replaced_state, direct_state = replaced._states["BTC"], direct._states["BTC"]
+        self.assertEqual(list(replaced_state.returns), list(direct_state.returns))
+        self.assertAlmostEqual(replaced_state.sum, direct_state.sum)
+        self.assertEqual(replaced_state.last_price, history[-1][1])
+        self.assertEqual(replaced.regime("BTC"), direct.regime("BTC"))
+
+        in_memory = RegimeDetector()
+        in_memory.update_history("BTC", forming)
+        in_memory.update_history("BTC", history)
+        self.assertEqual(list(in_memory._states["BTC"].returns), list(direct_state.returns))
+        self.assertAlmostEqual(in_memory._states["BTC"].sum_sq, direct_state.sum_sq)
+
+        print("✓ Forming candle replacement test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,138 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from unittest.mock import patch, MagicMock
+from test_config import BaseTestCase
+from traderagent.response_cache import ResponseCache, CacheMiss
+from traderagent import ai_decision
+from traderagent.ai_decision import get_ai_decision, set_response_cache
+
+class TestResponseCache(BaseTestCase):
+    """Test the content-addressed LLM response cache"""
+
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.temp_dir, "llm_cache.sqlite")
+
+    def tearDown(self):
+        super().tearDown()
+        set_response_cache(None)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_key_is_content_addressed(self):
+        """Test that keys depend only on model, messages and parameters"""
+        messages = [{"role": "user", "content": "BTC?"}]
+        key = ResponseCache.make_key("gpt-4o", messages)
+
+        self.assertEqual(key, ResponseCache.make_key("gpt-4o", [{"content": "BTC?", "role": "user"}]))
+        self.assertNotEqual(key, ResponseCache.make_key("gpt-4", messages))
+        self.assertNotEqual(key, ResponseCache.make_key("gpt-4o", messages, {"temperature": 0}))
+
+        print("✓ Content-addressed key test passed")
+
+    def test_put_get_and_persistence(self):
+        """Test round trip through disk"""
+        cache = ResponseCache(self.cache_file)
+        self.assertIsNone(cache.get("missing"))
+        cache.put("k1", "BTC: HOLD", model="gpt-4o")
+
+        reopened = ResponseCache(self.cache_file)
+        self.assertEqual(reopened.get("k1"), "BTC: HOLD")
+        self.assertEqual(reopened.stats(), {"hits": 1, "misses": 0, "entries": 1})
+
+        print("✓ Cache persistence test passed")
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = ResponseCache(self.cache_file, max_entries=2)
+        cache.put("a", "A")
+        time.sleep(0.01)
+        cache.put("b", "B")
+        time.sleep(0.01)
+        cache.get("a")  # "a" is now more recent than "b"
+        time.sleep(0.01)
+        cache.put("c", "C")
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get("a"), "A")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "C")
+
+        print("✓ LRU eviction test passed")
+
+    def test_ttl_expiry(self):
+        """Test that expired entries are treated as misses"""
+        cache = ResponseCache(self.cache_file, ttl_seconds=0.05)
+        cache.put("k", "BTC: HOLD")
+        self.assertEqual(cache.get("k"), "BTC: HOLD")
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual(len(cache), 0)
+
+        print("✓ TTL expiry test passed")
+
+    def test_replay_only_never_misses_silently(self):
+        """Test that a replay-only cache raises on unknown requests and stores nothing"""
+        ResponseCache(self.cache_file).put("known", "SOL: HOLD")
+        replay = ResponseCache(self.cache_file, replay_only=True)
+
+        self.assertEqual(replay.get("known"), "SOL: HOLD")
+        with self.assertRaises(CacheMiss):
+            replay.get("unknown")
+        replay.put("new", "BTC: HOLD")
+        self.assertEqual(len(replay), 1)
+
+        print("✓ Replay-only cache test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_repeated_decision_uses_cache(self, mock_openai):
+        """Test that an identical decision request is served without an API call"""
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "BTC: BUY 30%\nSOL: HOLD"
+        mock_openai.return_value = mock_response
+        set_response_cache(ResponseCache(self.cache_file))
+
+        first = get_ai_decision(self.test_prices, self.test_balance)
+        second = get_ai_decision(self.test_prices, self.test_balance)
+
+        self.assertEqual(mock_openai.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(second["BTC"], ("BUY", 0.3))
+
+        print("✓ Cached decision test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_empty_reply_not_cached(self, mock_openai):
+        """Test that a reply without content is not stored (the column is NOT NULL)"""
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = None
+        mock_openai.return_value = mock_response
+        cache = ResponseCache(self.cache_file)
+        set_response_cache(cache)
+
+        self.assertIsNone(ai_decision.request_completion("prompt"))
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(ai_decision.request_completion("prompt"))
+        self.assertEqual(mock_openai.call_count, 2)
+
+        print("✓ Empty reply test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_no_cache_by_default(self, mock_openai):
+        """Test that model calls are not cached unless a cache is set"""
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "BTC: HOLD"
+        mock_openai.return_value = mock_response
+
+        self.assertIsNone(ai_decision._response_cache)
+        get_ai_decision(self.test_prices, self.test_balance)
+        get_ai_decision(self.test_prices, self.test_balance)
+        self.assertEqual(mock_openai.call_count, 2)
+
+        print("✓ No default cache test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,136 @@
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+import openai
+from test_config import BaseTestCase, TestConfig
+from traderagent.standin_server import (
+    StandInServer, ScriptedResponder, RuleResponder, ReplayResponder, measure_throughput
+)
+from traderagent.response_cache import ResponseCache
+from traderagent import ai_decision
+from traderagent.decisions import RESPONSE_FORMAT
+from traderagent.ai_decision import get_ai_decision_with_volume, request_completion, set_client, set_response_cache
+
+class TestStandInServer(BaseTestCase):
+    """Test the local OpenAI-compatible stand-in server"""
+
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        self._saved_client = vars(ai_decision).get("client")
+
+    def tearDown(self):
+        super().tearDown()
+        if self._saved_client is not None:
+            set_client(self._saved_client)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_scripted_replies_over_http(self):
+        """Test that the real openai client gets scripted replies in order"""
+        with StandInServer(ScriptedResponder(["BTC: HOLD", "BTC: BUY 10%"])) as server:
+            client = server.client(max_retries=0)
+            replies = [client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+                       for _ in range(3)]
+
+        self.assertEqual([r.choices[0].message.content for r in replies], ["BTC: HOLD", "BTC: BUY 10%", "BTC: HOLD"])
+        self.assertEqual(replies[0].model, "gpt-4o")
+        self.assertGreater(replies[0].usage.total_tokens, 0)
+        self.assertEqual(server.stats(), {"requests": 3, "errors": 0})
+
+        print("✓ Scripted stand-in test passed")
+
+    def test_rule_decisions_end_to_end(self):
+        """Test the full decision pipeline against rule-derived replies"""
+        market_data = {"BTC": TestConfig.create_price_history(np.linspace(60000, 66000, 48)),
+                       "SOL": TestConfig.create_price_history(np.linspace(160, 140, 48))}
+
+        with StandInServer(RuleResponder()) as server:
+            set_client(server.client(max_retries=0))
+            decisions = get_ai_decision_with_volume(market_data, self.test_balance)
+
+        self.assertEqual(decisions["BTC"][0], "BUY_LONG")
+        self.assertEqual(decisions["SOL"][0], "SELL_SHORT")
+        self.assertAlmostEqual(decisions["BTC"][3], 66000 * 0.97, places=2)
+        self.assertEqual(server.requests, 1)
+
+        print("✓ Rule stand-in decision test passed")
+
+    def test_replay_from_cache(self):
+        """Test that recorded responses are replayed by request key"""
+        cache = ResponseCache(os.path.join(self.temp_dir, "cache.sqlite"))
+        messages = [{"role": "user", "content": "recorded prompt"}]
+        cache.put(ResponseCache.make_key("gpt-4o", messages), "SOL: CLOSE_LONG 100%")
+
+        with StandInServer(ReplayResponder(cache)) as server:
+            client = server.client(max_retries=0)
+            reply = client.chat.completions.create(model="gpt-4o", messages=messages)
+            self.assertEqual(reply.choices[0].message.content, "SOL: CLOSE_LONG 100%")
+            with self.assertRaises(openai.NotFoundError):
+                client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "new"}])
+
+        print("✓ Replay stand-in test passed")
+
+    def test_replay_structured_request(self):
+        """Test that a structured request recorded by request_completion replays under the same key"""
+        cache = ResponseCache(os.path.join(self.temp_dir, "cache.sqlite"))
+        reply = '{"decisions": [{"coin": "BTC", "action": "HOLD", "percent": 0}]}'
+
+        with StandInServer(ScriptedResponder([reply])) as server:
+            set_client(server.client(max_retries=0))
+            set_response_cache(cache)
+            try:
+                request_completion("recorded prompt", response_format=RESPONSE_FORMAT, temperature=0.2)
+            finally:
+                set_response_cache(None)
+
+        with StandInServer(ReplayResponder(cache)) as server:
+            set_client(server.client(max_retries=0))
+            self.assertEqual(request_completion("recorded prompt", response_format=RESPONSE_FORMAT,
+                                                temperature=0.2), reply)
+            with self.assertRaises(openai.NotFoundError):
+                request_completion("recorded prompt", response_format=RESPONSE_FORMAT)
+            with self.assertRaises(openai.NotFoundError):
+                request_completion("recorded prompt", temperature=0.2)
+
+        print("✓ Structured replay test passed")
+
+    def test_error_injection(self):
+        """Test injected rate-limit errors and that seeded runs are reproducible"""
+        outcomes = []
+        for _ in range(2):
+            with StandInServer(ScriptedResponder(["BTC: HOLD"]), error_rate=0.5, error_status=429,
+                               retry_after=0, seed=7) as server:
+                client = server.client(max_retries=0)
+                run = []
+                for _ in range(10):
+                    try:
+                        client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "x"}])
+                        run.append(True)
+                    except openai.RateLimitError:
+                        run.append(False)
+                outcomes.append(run)
+
+        self.assertEqual(outcomes[0], outcomes[1])
+        self.assertIn(True, outcomes[0])
+        self.assertIn(False, outcomes[0])
+
+        print("✓ Error injection test passed")
+
+    def test_latency_and_throughput(self):
+        """Test that injected latency overlaps across concurrent requests"""
+        with StandInServer(ScriptedResponder(["BTC: HOLD"]), latency=0.05) as server:
+            client = server.client(max_retries=0)
+            report = measure_throughput(
+                lambda: client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "x"}]),
+                requests=8, concurrency=4)
+
+        self.assertEqual(report["failures"], 0)
+        self.assertGreaterEqual(report["latency_p50"], 0.05)
+        self.assertLess(report["elapsed_seconds"], 8 * 0.05)
+
+        print("✓ Latency and throughput test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
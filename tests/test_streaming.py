@@ -0,0 +1,127 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from unittest.mock import patch, MagicMock
+from test_config import BaseTestCase
+from traderagent.decisions import iter_lines
+from traderagent.standin_server import StandInServer, ScriptedResponder
+from traderagent.response_cache import ResponseCache
+from traderagent import ai_decision
+from traderagent.ai_decision import stream_ai_decision, set_client, set_response_cache
+
+def chunk(text):
+    """Fake streamed chunk carrying ``text``"""
+    item = MagicMock()
+    item.choices[0].delta.content = text
+    return item
+
+class TestStreaming(BaseTestCase):
+    """Test streamed replies with per-coin early execution"""
+
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.market_data = {coin: [(t, p, 100.0) for t, p in history] for coin, history in self.test_prices.items()}
+        self._saved_client = vars(ai_decision).get("client")
+
+    def tearDown(self):
+        super().tearDown()
+        set_response_cache(None)
+        if self._saved_client is not None:
+            set_client(self._saved_client)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_iter_lines(self):
+        """Test that lines are released as soon as they end, whatever the chunking"""
+        self.assertEqual(list(iter_lines(["BTC: HO", "LD\nSOL", ": BUY 10%\n", "", "ETH: HOLD"])),
+                         ["BTC: HOLD", "SOL: BUY 10%", "ETH: HOLD"])
+        self.assertEqual(list(iter_lines([])), [])
+
+        print("✓ Line reassembly test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_decisions_arrive_per_line(self, mock_openai):
+        """Test that each coin is handed over before the rest of the reply is read"""
+        events = []
+
+        def stream():
+            for text in ["BTC: BUY_LONG 20% 58", "000 70000\n", "garbage line\n", "SOL: CLOSE_SHORT 50%"]:
+                events.append(("chunk", text))
+                yield chunk(text)
+
+        mock_openai.return_value = stream()
+        decisions = stream_ai_decision(self.market_data, self.test_balance,
+                                       on_decision=lambda coin, decision: events.append(("decision", coin)))
+
+        self.assertTrue(mock_openai.call_args[1]['stream'])
+        self.assertEqual(events.index(("decision", "BTC")), 2)  # Right after its line completed
+        self.assertEqual(events[-1], ("decision", "SOL"))
+        self.assertEqual(decisions, {"BTC": ("BUY_LONG", 0.2, 1.0, 58000.0, 70000.0), "SOL": ("CLOSE_SHORT", 0.5)})
+
+        print("✓ Per-line decision test passed")
+
+    def test_time_to_first_order_over_http(self):
+        """Test early execution against a real streaming HTTP endpoint"""
+        reply = "BTC: BUY_LONG 10% 58000 70000\nSOL: HOLD\nETH: HOLD\nADA: HOLD"
+        arrivals = {}
+
+        with StandInServer(ScriptedResponder([reply]), stream_delay=0.1) as server:
+            set_client(server.client(max_retries=0))
+            started = time.perf_counter()
+            decisions = stream_ai_decision(self.market_data, self.test_balance,
+                                           on_decision=lambda coin, _: arrivals.setdefault(coin, time.perf_counter()))
+            finished = time.perf_counter()
+
+        self.assertEqual(list(decisions), ["BTC", "SOL", "ETH", "ADA"])
+        self.assertLess(arrivals["BTC"] - started, 0.1)
+        self.assertGreaterEqual(finished - started, 0.3)
+
+        print("✓ Streaming time-to-first-order test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_streamed_reply_is_cached(self, mock_openai):
+        """Test that a completed stream is cached and replayed whole"""
+        set_response_cache(ResponseCache(os.path.join(self.temp_dir, "cache.sqlite")))
+        mock_openai.return_value = iter([chunk("BTC: HOLD\n"), chunk("SOL: HOLD")])
+
+        first = stream_ai_decision(self.market_data, self.test_balance)
+        second = stream_ai_decision(self.market_data, self.test_balance)
+
+        self.assertEqual(mock_openai.call_count, 1)
+        self.assertEqual(first, second)
+
+        print("✓ Streamed reply caching test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_failed_stream_falls_back_to_request(self, mock_openai):
+        """Test that a stream failing before its first chunk is retried without streaming"""
+        def create(model, messages, stream=False, **kwargs):
+            if stream:
+                raise RuntimeError("stream refused")
+            response = MagicMock()
+            response.choices[0].message.content = "BTC: CLOSE_LONG 50%\nSOL: HOLD"
+            return response
+        mock_openai.side_effect = create
+        seen = []
+
+        decisions = stream_ai_decision(self.market_data, self.test_balance,
+                                       on_decision=lambda coin, decision: seen.append(coin))
+
+        self.assertEqual(decisions, {"BTC": ("CLOSE_LONG", 0.5), "SOL": ("HOLD", 0.0)})
+        self.assertEqual(seen, ["BTC", "SOL"])
+        self.assertEqual(mock_openai.call_count, 2)
+
+        def broken_stream():
+            yield chunk("BTC: HOLD\n")
+            raise RuntimeError("connection dropped")
+        mock_openai.side_effect = None
+        mock_openai.return_value = broken_stream()
+        with self.assertRaises(RuntimeError):
+            stream_ai_decision(self.market_data, self.test_balance)
+
+        print("✓ Stream fallback test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
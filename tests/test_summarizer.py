@@ -0,0 +1,83 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from test_config import BaseTestCase, TestConfig
+from traderagent.summarizer import (
+    summarize_series, format_summary, sparkline, horizon_label, SPARKLINE_POINTS
+)
+from traderagent.ai_decision import get_ai_decision_with_volume
+
+class TestSummarizer(BaseTestCase):
+    """Test compact price history summaries"""
+
+    def test_horizon_labels(self):
+        """Test candle counts are labelled as durations"""
+        self.assertEqual(horizon_label(1, "1h"), "1h")
+        self.assertEqual(horizon_label(24, "1h"), "1d")
+        self.assertEqual(horizon_label(72, "1h"), "3d")
+        self.assertEqual(horizon_label(4, "15m"), "1h")
+
+        print("✓ Horizon label test passed")
+
+    def test_sparkline(self):
+        """Test sparkline downsampling and shape"""
+        line = sparkline(list(range(100)))
+        self.assertEqual(len(line), SPARKLINE_POINTS)
+        self.assertEqual(line[0], "▁")
+        self.assertEqual(line[-1], "█")
+        self.assertEqual(len(sparkline([5.0, 5.0, 5.0])), 3)
+        self.assertEqual(sparkline([]), "")
+
+        print("✓ Sparkline test passed")
+
+    def test_summary_values(self):
+        """Test returns and key levels in the summary"""
+        history = TestConfig.create_trending_history(100)
+        summary = summarize_series(history)
+        closes = [h[1] for h in history]
+
+        self.assertEqual(summary["candles"], 100)
+        self.assertEqual(summary["last_price"], closes[-1])
+        self.assertAlmostEqual(summary["returns"]["1h"], closes[-1] / closes[-2] - 1)
+        self.assertAlmostEqual(summary["returns"]["1d"], closes[-1] / closes[-25] - 1)
+        self.assertEqual(summary["low"], min(closes))
+        self.assertEqual(summary["high"], max(closes))
+        self.assertIsNotNone(summary["indicators"]["rsi_14"])
+
+        short = summarize_series(TestConfig.create_trending_history(3))
+        self.assertIsNone(short["returns"]["3d"])
+        self.assertIsNone(short["indicators"]["sma_12"])
+        self.assertIsNone(summarize_series([]))
+
+        print("✓ Summary values test passed")
+
+    def test_summary_size_is_bounded(self):
+        """Test that the rendered block does not grow with history length"""
+        short_block = format_summary("BTC", summarize_series(TestConfig.create_trending_history(72)))
+        long_block = format_summary("BTC", summarize_series(TestConfig.create_trending_history(2000)))
+
+        self.assertEqual(short_block.count("\n"), long_block.count("\n"))
+        self.assertLess(abs(len(long_block) - len(short_block)), 20)
+        self.assertIn("BTC price trend", short_block)
+        self.assertIn("Sparkline", short_block)
+
+        print("✓ Bounded summary size test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_prompt_size_independent_of_history(self, mock_openai):
+        """Test that the decision prompt no longer inlines every candle"""
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "BTC: HOLD"
+        mock_openai.return_value = mock_response
+
+        prompts = []
+        for length in (72, 1000):
+            get_ai_decision_with_volume({"BTC": TestConfig.create_trending_history(length)}, self.test_balance)
+            prompts.append(mock_openai.call_args[1]['messages'][-1]['content'])
+
+        self.assertLess(abs(len(prompts[1]) - len(prompts[0])), 50)
+        self.assertNotIn("[('2025", prompts[0])
+
+        print("✓ Prompt size test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
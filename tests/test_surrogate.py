@@ -0,0 +1,115 @@
+import unittest
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from test_config import BaseTestCase
+from traderagent.journal import DecisionJournal
+from traderagent.surrogate import SurrogateEngine, SurrogateModel, train_surrogate, training_pairs
+from traderagent.engines import TRAINED_ENGINES
+
+def random_history(rng, start_hour, bars=80):
+    prices = 100 * np.cumprod(1 + rng.normal(0, 0.01, bars))
+    return [(f"2025-{1 + (start_hour + i) // 720:02d}-{1 + (start_hour + i) // 24 % 30:02d} {(start_hour + i) % 24:02d}:00",
+             float(price), float(rng.uniform(50, 150))) for i, price in enumerate(prices)]
+
+def llm_stand_in(history):
+    """The 'LLM' being distilled: follows the last 4 candles' momentum"""
+    change = history[-1][1] / history[-5][1] - 1
+    if change > 0.01:
+        return ("BUY_LONG", 0.2, 1.0, round(history[-1][1] * 0.97, 2), round(history[-1][1] * 1.06, 2))
+    if change < -0.01:
+        return ("SELL_SHORT", 0.2, 1.0, round(history[-1][1] * 1.03, 2), round(history[-1][1] * 0.94, 2))
+    return ("HOLD", 0.0)
+
+class TestSurrogate(BaseTestCase):
+    """Test the surrogate model distilled from journaled decisions"""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.journal = DecisionJournal(Path(self.tmp.name) / "journal.jsonl")
+        rng = np.random.default_rng(7)
+        for cycle in range(120):
+            histories = {"BTC": random_history(rng, cycle), "SOL": random_history(rng, cycle)}
+            decisions = {coin: llm_stand_in(history) for coin, history in histories.items()}
+            self.journal.append("llm", histories, self.test_balance, self.test_balance, decisions, [], 1.0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        super().tearDown()
+
+    def test_training_pairs(self):
+        """Test that every journaled coin decision becomes one labelled row"""
+        X, actions, info = training_pairs(self.journal.records())
+
+        self.assertEqual(X.shape[0], 240)
+        self.assertEqual(len(actions), 240)
+        self.assertTrue(np.isfinite(X).all())
+        self.assertEqual(set(actions), {"BUY_LONG", "SELL_SHORT", "HOLD"})
+
+        print("✓ Training pairs test passed")
+
+    def test_agreement_beats_baseline(self):
+        """Test that the surrogate agrees with held-out decisions better than the majority class"""
+        model, report = train_surrogate(self.journal, holdout=0.25)
+
+        holdout = report["holdout"]
+        self.assertEqual(holdout["samples"], 60)
+        self.assertGreater(holdout["agreement"], 0.8)
+        self.assertGreater(holdout["agreement"], holdout["baseline"])
+        self.assertAlmostEqual(model.templates["BUY_LONG"]["stop_loss"], -0.03, places=3)
+
+        print("✓ Surrogate agreement test passed")
+
+    def test_trains_only_on_llm_decisions(self):
+        """Test that local-engine and degraded cycles in the journal are skipped and counted"""
+        _, clean = train_surrogate(self.journal, holdout=0.25)
+        rng = np.random.default_rng(8)
+        for cycle in range(30):
+            histories = {"BTC": random_history(rng, cycle)}
+            flipped = {"BTC": ("SELL_SHORT", 0.5, 1.0, 1.0, 0.5)}
+            self.journal.append("ma_crossover", histories, self.test_balance, self.test_balance, flipped, [], 0.1)
+            self.journal.append("ma_crossover", histories, self.test_balance, self.test_balance, flipped, [], 0.1,
+                                context={"degraded": True})
+        self.journal.append("stream", histories, self.test_balance, self.test_balance,
+                            {"BTC": llm_stand_in(histories["BTC"])}, [], 1.0)
+
+        model, report = train_surrogate(self.journal, holdout=0.25)
+        self.assertEqual(report["skipped"], 60)
+        self.assertEqual(clean["skipped"], 0)
+        self.assertEqual(report["train"]["samples"] + report["holdout"]["samples"], 241)
+        self.assertAlmostEqual(model.templates["SELL_SHORT"]["stop_loss"], 0.03, places=3)
+
+        print("✓ LLM-only training test passed")
+
+    def test_engine_round_trip(self):
+        """Test that a saved model loads as a fast decision engine"""
+        model, _ = train_surrogate(self.journal)
+        path = Path(self.tmp.name) / "surrogate.json"
+        model.save(path)
+        engine = SurrogateEngine(SurrogateModel.load(path))
+
+        record = next(self.journal.records())
+        histories = {coin: [tuple(entry) for entry in history] for coin, history in record["histories"].items()}
+        started = time.perf_counter()
+        decisions = engine(histories, self.test_balance)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(set(decisions), {"BTC", "SOL"})
+        for decision in decisions.values():
+            self.assertIn(len(decision), (2, 5))
+        self.assertLess(elapsed, 0.1)
+
+        print("✓ Surrogate engine test passed")
+
+    def test_untrained_engine(self):
+        """Test that the registry reports a missing model clearly"""
+        self.assertIn("surrogate", TRAINED_ENGINES)
+        with self.assertRaises(FileNotFoundError):
+            SurrogateModel.load(Path(self.tmp.name) / "missing.json")
+
+        print("✓ Untrained surrogate test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
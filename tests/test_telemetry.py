@@ -0,0 +1,154 @@
+import unittest
+import json
+import tempfile
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+from test_config import BaseTestCase
+from traderagent.telemetry import Telemetry, call_cost
+from traderagent.ai_decision import (
+    get_ai_decision, request_completion, set_telemetry, stream_ai_decision, stream_completion
+)
+
+def reply(content, prompt_tokens=120, completion_tokens=30):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    response.usage.prompt_tokens = prompt_tokens
+    response.usage.completion_tokens = completion_tokens
+    return response
+
+class TestTelemetry(BaseTestCase):
+    """Test LLM call telemetry"""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "llm_metrics.jsonl"
+        self.telemetry = Telemetry(self.path)
+        set_telemetry(self.telemetry)
+
+    def tearDown(self):
+        set_telemetry(None)
+        self.tmp.cleanup()
+        super().tearDown()
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_call_is_recorded(self, mock_openai):
+        """Test that a decision call records model, tokens, time and parse outcome"""
+        mock_openai.return_value = reply("BTC: HOLD\nBTC: BUY_LONG lots")
+
+        get_ai_decision(self.test_prices, self.test_balance)
+
+        call, parse = self.telemetry.records
+        self.assertEqual(call["event"], "call")
+        self.assertEqual((call["model"], call["model_used"], call["fallback"]), ("gpt-4o", "gpt-4o", False))
+        self.assertEqual((call["prompt_tokens"], call["completion_tokens"]), (120, 30))
+        self.assertAlmostEqual(call["cost_usd"], (120 * 2.50 + 30 * 10.00) / 1_000_000)
+        self.assertGreaterEqual(call["wall_seconds"], 0)
+        self.assertEqual((parse["event"], parse["failures"]), ("parse", 1))
+
+        print("✓ Call recording test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_fallback_and_errors(self, mock_openai):
+        """Test that fallbacks count as retries and failed calls are recorded before re-raising"""
+        mock_openai.side_effect = [Exception("The model gpt-4o does not exist"), reply("BTC: HOLD")]
+        request_completion("prompt")
+
+        mock_openai.side_effect = Exception("connection reset")
+        with self.assertRaises(Exception):
+            request_completion("prompt")
+
+        stats = self.telemetry.aggregates()
+        self.assertEqual(stats["calls"], 2)
+        self.assertEqual((stats["fallbacks"], stats["retries"], stats["errors"]), (1, 2, 1))
+        self.assertEqual(stats["by_model"], {"gpt-4": 1, "gpt-4o": 1})
+
+        print("✓ Fallback and error test passed")
+
+    def test_metrics_file_is_append_only(self):
+        """Test that records persist across recorders and aggregate from the file"""
+        self.telemetry.record("call", model="gpt-4o", wall_seconds=1.0, prompt_tokens=100, completion_tokens=10)
+        Telemetry(self.path).record("call", model="gpt-4o", wall_seconds=3.0, prompt_tokens=200, completion_tokens=20)
+
+        lines = self.path.read_text().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0])["wall_seconds"], 1.0)
+
+        stats = Telemetry.load(self.path).aggregates()
+        self.assertEqual((stats["prompt_tokens"], stats["completion_tokens"]), (300, 30))
+        self.assertEqual(stats["latency_total"], 4.0)
+        self.assertEqual(stats["latency_p95"], 3.0)
+
+        print("✓ Append-only metrics file test passed")
+
+    def test_cost_per_decision(self):
+        """Test that call costs are priced per model and spread over the parsed decisions"""
+        self.assertAlmostEqual(call_cost("gpt-4o-2024-08-06", 1_000_000, 0), 2.50)  # Dated names match by prefix
+        self.assertAlmostEqual(call_cost("gpt-4o-mini", 0, 1_000_000), 0.60)
+        self.assertIsNone(call_cost("unknown-model", 100, 10))
+        self.assertIsNone(call_cost("gpt-4o", None, None))
+
+        telemetry = Telemetry(self.path, persist=False)
+        telemetry.record("call", model="gpt-4", prompt_tokens=1000, completion_tokens=500)
+        telemetry.record("call", model="gpt-4o", cached=True)
+        telemetry.record("parse", structured=True, decisions=2, failures=0)
+        stats = telemetry.aggregates()
+        self.assertAlmostEqual(stats["cost_usd"], 0.06)
+        self.assertEqual(stats["decisions"], 2)
+        self.assertAlmostEqual(stats["cost_per_decision"], 0.03)
+
+        print("✓ Cost per decision test passed")
+
+    def test_budgets(self):
+        """Test that calls over the latency or token budget are flagged"""
+        telemetry = Telemetry(self.path, latency_budget=2.0, token_budget=500, persist=False)
+        fast = telemetry.record("call", wall_seconds=0.5, prompt_tokens=100, completion_tokens=10)
+        slow = telemetry.record("call", wall_seconds=2.5, prompt_tokens=450, completion_tokens=100)
+
+        self.assertEqual(fast["over_budget"], [])
+        self.assertEqual(slow["over_budget"], ["latency", "token"])
+        self.assertEqual(telemetry.aggregates()["over_budget"], 1)
+        self.assertFalse(self.path.exists())
+
+        print("✓ Budget test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_streamed_call(self, mock_openai):
+        """Test that streamed calls record time to first token"""
+        chunks = []
+        for text in ["BTC: ", "HOLD\n"]:
+            chunk = MagicMock()
+            chunk.choices[0].delta.content = text
+            chunks.append(chunk)
+        mock_openai.return_value = iter(chunks)
+
+        self.assertEqual("".join(stream_completion("prompt")), "BTC: HOLD\n")
+
+        call = self.telemetry.records[0]
+        self.assertTrue(call["stream"])
+        self.assertLessEqual(call["first_token_seconds"], call["wall_seconds"])
+
+        print("✓ Streamed call test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_streamed_decision_parse_is_recorded(self, mock_openai):
+        """Test that malformed lines and coins missing from a streamed reply count as parse failures"""
+        chunks = []
+        for text in ["BTC: HOLD\n", "BTC: BUY_LONG lots\n"]:
+            chunk = MagicMock()
+            chunk.choices[0].delta.content = text
+            chunks.append(chunk)
+        mock_openai.return_value = iter(chunks)
+        market_data = {coin: [(t, p, 100.0) for t, p in history] for coin, history in self.test_prices.items()}
+
+        decisions = stream_ai_decision(market_data, self.test_balance)
+
+        parse = self.telemetry.records[-1]
+        self.assertEqual(set(decisions), {"BTC"})
+        self.assertEqual(parse["event"], "parse")
+        self.assertEqual((parse["decisions"], parse["failures"]), (1, 2))  # The malformed line and SOL
+
+        print("✓ Streamed parse recording test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
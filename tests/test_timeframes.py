@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from test_config import BaseTestCase, TestConfig
+from traderagent.timeframes import resample_candles, build_feature_bundle, FeatureBundle
+from traderagent.ai_decision import get_ai_decision_with_volume
+
+def make_history(length):
+    """Create an hourly (open_time, price, volume) history starting on a UTC day boundary"""
+    return TestConfig.create_price_history([100.0 + i for i in range(length)], 10.0, epoch_ms=True)
+
+class TestTimeframes(BaseTestCase):
+    """Test resampling and multi-timeframe feature bundles"""
+
+    def test_resample_to_4h(self):
+        """Test 4h buckets take the last close and summed volume"""
+        history = make_history(10)
+        candles = resample_candles(history, "4h")
+
+        self.assertEqual(len(candles), 3)
+        self.assertEqual(candles[0], (history[0][0], history[3][1], 40.0))
+        self.assertEqual(candles[1][1], history[7][1])
+        # The last bucket is still forming
+        self.assertEqual(candles[2], (history[8][0], history[9][1], 20.0))
+
+        print("✓ 4h resampling test passed")
+
+    def test_resample_rules(self):
+        """Test same-interval passthrough and refusal to upsample"""
+        history = make_history(5)
+        self.assertEqual(resample_candles(history, "1h"), history)
+        with self.assertRaises(ValueError):
+            resample_candles(history, "15m")
+
+        print("✓ Resampling rules test passed")
+
+    def test_bundle_contents(self):
+        """Test the bundle summarizes each coin on each timeframe"""
+        market_data = {"BTC": make_history(72), "SOL": make_history(72)}
+        bundle = build_feature_bundle(market_data, timeframes=("15m", "1h", "4h", "1d"))
+
+        self.assertIsInstance(bundle, FeatureBundle)
+        self.assertEqual(bundle.coins(), ["BTC", "SOL"])
+        self.assertEqual(bundle.get("BTC", "1h")["candles"], 72)
+        self.assertEqual(bundle.get("BTC", "4h")["candles"], 18)
+        self.assertEqual(bundle.get("BTC", "1d")["candles"], 3)
+        # Finer than the base interval and not supplied: skipped
+        self.assertIsNone(bundle.get("BTC", "15m"))
+
+        lines = bundle.format_coin("BTC", exclude=("1h",)).splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("4h: 18 candles"))
+        self.assertTrue(lines[1].startswith("1d: 3 candles"))
+
+        print("✓ Bundle contents test passed")
+
+    def test_bundle_uses_supplied_fine_history(self):
+        """Test that explicitly fetched finer histories are included"""
+        history = make_history(24)
+        fine = [(history[0][0] + i * 15 * 60 * 1000, 100.0 + i * 0.1, 1.0) for i in range(16)]
+        bundle = build_feature_bundle({"BTC": history}, timeframes=("15m", "1h"),
+                                      extra_histories={"15m": {"BTC": fine}})
+
+        self.assertEqual(bundle.get("BTC", "15m")["candles"], 16)
+        self.assertIn("1h", bundle.get("BTC", "15m")["returns"])
+
+        print("✓ Fine history bundle test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_prompt_includes_other_timeframes(self, mock_openai):
+        """Test that the decision prompt shows the higher timeframes"""
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "BTC: HOLD"
+        mock_openai.return_value = mock_response
+
+        market_data = {"BTC": make_history(72)}
+        bundle = build_feature_bundle(market_data)
+        get_ai_decision_with_volume(market_data, self.test_balance, feature_bundle=bundle)
+
+        prompt = mock_openai.call_args[1]['messages'][-1]['content']
+        self.assertIn("BTC other timeframes:", prompt)
+        self.assertIn("4h: 18 candles", prompt)
+
+        print("✓ Prompt timeframe test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -133,7 +133,7 @@ class TestVolumeAnalysis(unittest.TestCase):
         
         # Verify that the prompt included volume information
         call_args = mock_client.chat.completions.create.call_args[1]
-        prompt_content = call_args["messages"][0]["content"]
+        prompt_content = call_args["messages"][-1]["content"]
         self.assertIn("volume analysis", prompt_content)
         self.assertIn("Recent volumes", prompt_content)
 
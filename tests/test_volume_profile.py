@@ -0,0 +1,105 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import numpy as np
+from test_config import BaseTestCase
+from traderagent.volume_profile import VolumeProfile, compute_volume_profile, format_volume_profile
+from traderagent.ai_decision import get_ai_decision_with_volume
+
+class TestVolumeProfile(BaseTestCase):
+    """Test volume-by-price profile calculations"""
+
+    def test_point_of_control(self):
+        """Test that the POC lands on the price level with the most volume"""
+        prices = [100, 101, 102, 110, 110.5, 111, 120]
+        volumes = [10, 10, 10, 500, 400, 300, 5]
+        levels = compute_volume_profile(prices, volumes, bins=10)
+
+        self.assertTrue(110 <= levels["poc"] <= 112)
+        self.assertLessEqual(levels["value_area_low"], 110)
+        self.assertGreaterEqual(levels["value_area_high"], 111)
+        self.assertEqual(levels["total_volume"], sum(volumes))
+
+        print("✓ Point of control test passed")
+
+    def test_value_area_covers_target_volume(self):
+        """Test that the value area holds at least 70% of the volume"""
+        rng = np.random.default_rng(7)
+        prices = rng.normal(100, 5, 500)
+        volumes = rng.uniform(1, 10, 500)
+        levels = compute_volume_profile(prices, volumes)
+
+        inside = (prices >= levels["value_area_low"]) & (prices <= levels["value_area_high"])
+        self.assertGreaterEqual(volumes[inside].sum(), 0.7 * volumes.sum())
+
+        print("✓ Value area coverage test passed")
+
+    def test_no_volume(self):
+        """Test that empty or zero-volume windows have no profile"""
+        self.assertIsNone(compute_volume_profile([], []))
+        self.assertIsNone(compute_volume_profile([100, 101], [0, 0]))
+        self.assertIsNone(VolumeProfile().levels())
+
+        print("✓ No volume test passed")
+
+    def test_incremental_matches_window(self):
+        """Test that the rolling profile tracks only the last ``window`` candles"""
+        rng = np.random.default_rng(3)
+        prices = 100 + np.cumsum(rng.normal(0, 1, 200))
+        volumes = rng.uniform(1, 10, 200)
+
+        profile = VolumeProfile(window=50)
+        for price, volume in zip(prices, volumes):
+            profile.update(price, volume)
+
+        self.assertEqual(len(profile), 50)
+        levels = profile.levels()
+        self.assertAlmostEqual(levels["total_volume"], volumes[-50:].sum())
+
+        inside = (prices[-50:] >= levels["value_area_low"]) & (prices[-50:] <= levels["value_area_high"])
+        self.assertGreaterEqual(volumes[-50:][inside].sum(), 0.7 * volumes[-50:].sum() - 1e-9)
+
+        print("✓ Incremental profile test passed")
+
+    def test_copy_is_independent(self):
+        """Test that a copy keeps its levels while the original rolls on"""
+        profile = VolumeProfile(window=20)
+        profile.extend([("t", 100.0 + i % 5, 10.0) for i in range(20)])
+        snapshot = profile.copy()
+        before = snapshot.levels()
+
+        for i in range(20):
+            profile.update(200.0 + i, 50.0)
+
+        self.assertEqual(snapshot.levels(), before)
+        self.assertNotEqual(profile.levels(), before)
+
+        print("✓ Volume profile copy test passed")
+
+    def test_format_volume_profile(self):
+        """Test the prompt line wording relative to the current price"""
+        levels = {"poc": 105.0, "value_area_low": 100.0, "value_area_high": 110.0, "total_volume": 1.0}
+        self.assertIn("price above value area", format_volume_profile(levels, 120))
+        self.assertIn("price inside value area", format_volume_profile(levels, 105))
+        self.assertIn("POC $105.00", format_volume_profile(levels, 90))
+
+        print("✓ Volume profile formatting test passed")
+
+    @patch('traderagent.ai_decision.client.chat.completions.create')
+    def test_prompt_includes_volume_profile(self, mock_openai):
+        """Test that the decision prompt carries volume profile levels"""
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "BTC: HOLD"
+        mock_openai.return_value = mock_response
+
+        history = [("2024-01-01 10:00", 50000.0, 1000.0),
+                   ("2024-01-01 11:00", 50500.0, 1200.0),
+                   ("2024-01-01 12:00", 51000.0, 800.0)]
+        get_ai_decision_with_volume({"BTC": history}, self.test_balance)
+
+        prompt = mock_openai.call_args[1]['messages'][-1]['content']
+        self.assertIn("BTC volume profile: POC", prompt)
+
+        print("✓ Prompt volume profile test passed")
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)